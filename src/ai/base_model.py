@@ -0,0 +1,94 @@
+from abc import ABC, abstractmethod
+import numpy as np
+from typing import Dict, List, Tuple, Union
+from ai.feature_encoding import PreferenceEncoder
+from ai.layout import (
+    Layout, SCALAR_COUNT, DESK_X, DESK_ORIENTATION, STORAGE_X, CLEARANCE, WALKWAYS
+)
+
+class BaseLayoutModel(ABC):
+    """Abstract base class for layout generation models.
+    
+    Holds the TensorFlow-free conversions between preferences, layouts and
+    model parameter vectors so inference-only models can share them.
+    """
+    
+    encoder = PreferenceEncoder("generator")
+    PARAMETER_COUNT = 50
+    
+    @abstractmethod
+    def generate_layout(self, preferences: Dict) -> Dict:
+        """Generate a layout based on user preferences."""
+        pass
+    
+    def _preprocess_preferences(self, preferences: Dict) -> np.ndarray:
+        """Convert user preferences to model input format."""
+        return self.encoder.encode([preferences])
+    
+    def _params_to_layout(self, params: np.ndarray) -> Dict:
+        """Convert model output parameters to a layout specification."""
+        p = params.tolist()
+        return {
+            "desk": {
+                "position": (p[0], p[1]),
+                "dimensions": (p[2], p[3]),
+                "orientation": p[4] * 360  # Convert to degrees
+            },
+            "storage": {
+                "position": (p[10], p[11]),
+                "dimensions": (p[12], p[13])
+            },
+            "equipment_zones": {
+                "monitor_positions": [(p[i], p[i + 1]) for i in range(20, 28, 2)]
+            },
+            "spacing": {
+                "clearance": p[30] * 2,  # Convert to meters
+                "walkways": p[31] * 2
+            }
+        }
+    
+    def _layout_to_params(self, layout: Union[Dict, Layout]) -> np.ndarray:
+        """Convert a layout specification to model output parameters.
+        
+        Writes each component into the same slots _params_to_layout reads
+        them from, so the result matches the model's 50 outputs.
+        """
+        values = Layout.coerce(layout).values
+        params = np.zeros(self.PARAMETER_COUNT)
+        
+        # Desk parameters
+        params[0:4] = values[DESK_X:DESK_ORIENTATION]
+        params[4] = values[DESK_ORIENTATION] / 360
+        
+        # Storage parameters
+        params[10:14] = values[STORAGE_X:CLEARANCE]
+        
+        # Equipment parameters (the model has slots for four monitors)
+        monitors = values[SCALAR_COUNT:SCALAR_COUNT + 8]
+        params[20:20 + len(monitors)] = monitors
+        
+        # Spacing parameters
+        params[30] = values[CLEARANCE] / 2
+        params[31] = values[WALKWAYS] / 2
+        
+        return params
+
+class TrainableLayoutModel(BaseLayoutModel):
+    """Layout model that can be trained on historical layouts."""
+    
+    # Bump when _layout_to_params changes, to invalidate cached targets
+    TARGET_VERSION = "layout-params-1"
+    
+    @abstractmethod
+    def train(self, training_data: List[Dict]) -> None:
+        """Train the model using historical data."""
+        pass
+    
+    def training_arrays(self, training_data: List[Dict]) -> Tuple[np.ndarray, np.ndarray]:
+        """Encode training items into feature and target matrices."""
+        X = self.encoder.encode([data['preferences'] for data in training_data])
+        y = np.array([
+            self._layout_to_params(data['layout'])
+            for data in training_data
+        ])
+        return X, y
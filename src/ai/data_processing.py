@@ -1,32 +1,218 @@
+import hashlib
+import io
+import os
+import re
 import numpy as np
-from typing import Dict, List, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain, islice
+from typing import Dict, Iterator, List, Optional, TextIO, Tuple
 from pathlib import Path
 import json
+from ai.training_schema import TrainingDataValidator
 from utils.logger import setup_logger
 
 logger = setup_logger()
 
+READ_SIZE = 1 << 16  # characters
+SHARD_SIZE = 1 << 26  # bytes of training data per parallel validation task
+HASH_BLOCK_SIZE = 1 << 20
+
+# Likely start of a top-level item in a JSON array of objects; a guess only,
+# validate_training_data checks it against the previous shard
+ITEM_BOUNDARY = re.compile(rb',\s*\{')
+
+def _new_stats() -> Dict:
+    return {"valid": 0, "rejected": 0, "errors": {}}
+
+def _merge_stats(total: Dict, stats: Dict) -> None:
+    total["valid"] += stats["valid"]
+    total["rejected"] += stats["rejected"]
+    for field, count in stats["errors"].items():
+        total["errors"][field] = total["errors"].get(field, 0) + count
+
+def _is_json_array(data_path: Path) -> bool:
+    """Whether a training file holds one JSON array rather than JSON Lines."""
+    if data_path.suffix == '.jsonl':
+        return False
+    with open(data_path, 'r') as f:
+        while chunk := f.read(READ_SIZE):
+            if chunk.strip():
+                return chunk.lstrip().startswith('[')
+    return False
+
+def _iter_json_line_range(data_path: Path, start: int, end: int) -> Iterator:
+    """Decode the JSON lines that begin within bytes [start, end) of a file."""
+    with open(data_path, 'rb') as f:
+        position = start
+        if start:
+            # Finish the line that straddles start; it belongs to the previous range
+            f.seek(start - 1)
+            position = start - 1 + len(f.readline())
+        
+        while position < end:
+            line = f.readline()
+            if not line:
+                break
+            position += len(line)
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                yield None
+
+def _iter_json_array_items(f: TextIO, buffer: str, pos: int, read_size: int,
+                           offset: int) -> Iterator[Tuple[int, object]]:
+    """Yield (byte offset, item) for the JSON array items from buffer[pos] on.
+    
+    ``pos`` is just past the opening '[' or at the start of an item, and
+    ``offset`` is the byte offset of buffer[0] in the file. Only the
+    unparsed tail of the file is buffered; an item that does not fit is
+    retried with twice as much text until it decodes.
+    """
+    decoder = json.JSONDecoder()
+    expect_item = True
+    # Byte offset of buffer[mark]; advanced lazily so each char is encoded once
+    mark = 0
+    
+    while True:
+        while pos < len(buffer) and buffer[pos].isspace():
+            pos += 1
+        if pos == len(buffer):
+            chunk = f.read(read_size)
+            if not chunk:
+                raise ValueError("Unterminated JSON array")
+            offset += len(buffer[mark:pos].encode())
+            buffer, pos, mark = buffer[pos:] + chunk, 0, 0
+            continue
+        
+        if buffer[pos] == ']':
+            return
+        if not expect_item:
+            if buffer[pos] != ',':
+                raise ValueError(f"Expected ',' or ']' in JSON array, got {buffer[pos]!r}")
+            pos += 1
+            expect_item = True
+            continue
+        
+        try:
+            item, end = decoder.raw_decode(buffer, pos)
+            complete = end < len(buffer)
+        except json.JSONDecodeError:
+            end, complete = None, False
+        
+        if not complete:
+            # The item may continue past the buffered text
+            chunk = f.read(max(read_size, len(buffer) - pos))
+            if chunk:
+                offset += len(buffer[mark:pos].encode())
+                buffer, pos, mark = buffer[pos:] + chunk, 0, 0
+                continue
+            if end is None:
+                decoder.raw_decode(buffer, pos)  # Raise the decode error
+        
+        offset += len(buffer[mark:pos].encode())
+        mark = pos
+        yield offset, item
+        pos = end
+        expect_item = False
+
+def _find_array_item(data_path: Path, start: int) -> Optional[int]:
+    """Guess the byte offset of the first array item starting at or after start."""
+    with open(data_path, 'rb') as f:
+        # Include the byte before start, which may be the item's ','
+        block_start = max(start - 1, 0)
+        f.seek(block_start)
+        buffer = b""
+        while chunk := f.read(READ_SIZE):
+            buffer += chunk
+            for match in ITEM_BOUNDARY.finditer(buffer):
+                if block_start + match.end() - 1 >= start:
+                    return block_start + match.end() - 1
+            # Keep an unfinished ', ... {' for the next block
+            keep = max(buffer.rfind(b','), 0)
+            block_start += keep
+            buffer = buffer[keep:]
+    return None
+
+def _iter_json_array_range(data_path: Path, first: Optional[int], end: int,
+                           bounds: Dict) -> Iterator:
+    """Yield the items of a JSON array file that start before byte ``end``.
+    
+    Parsing begins at the item at offset ``first``, or after the '[' when
+    it is None. ``bounds`` receives the offsets of the first item yielded
+    and of the first item left unparsed (None when the array ended), and
+    the number of items yielded.
+    """
+    with open(data_path, 'rb') as raw:
+        f = io.TextIOWrapper(raw, encoding='utf-8')
+        raw.seek(first or 0)
+        buffer = f.read(READ_SIZE)
+        pos = buffer.index('[') + 1 if first is None else 0
+        for offset, item in _iter_json_array_items(f, buffer, pos, READ_SIZE, first or 0):
+            if offset >= end:
+                bounds["next"] = offset
+                return
+            if bounds["first"] is None:
+                bounds["first"] = offset
+            bounds["count"] += 1
+            yield item
+
+def validate_training_shard(shard: Tuple) -> Tuple[Optional[Dict], Optional[int], Optional[int]]:
+    """Validate the training items starting within bytes [start, end) of a file.
+    
+    ``shard`` is (path, start, end, is_array, first). For JSON arrays
+    ``first`` is the offset of the shard's first item; when None it is
+    found from the '[' (start 0) or guessed with ITEM_BOUNDARY, moving on
+    to the next candidate if the guess does not parse. Module-level so it
+    can run in a worker process. Returns the shard's load_stats, the offset
+    of the first item validated, and the offset of the first item left to
+    the next shard (None when the array ended); only counts cross the
+    process boundary. A guess that fails after its first item returns
+    (None, None, None).
+    """
+    data_path, start, end, is_array, first = shard
+    if not is_array:
+        processor = DataProcessor(data_path.parent)
+        for _ in processor._validate_items(_iter_json_line_range(data_path, start, end)):
+            pass
+        return processor.load_stats, start, end
+    
+    guessed = first is None and start > 0
+    while True:
+        if guessed:
+            first = _find_array_item(data_path, start)
+            if first is None or first >= end:
+                return _new_stats(), first, first
+        
+        processor = DataProcessor(data_path.parent)
+        bounds = {"first": None, "next": None, "count": 0}
+        try:
+            for _ in processor._validate_items(
+                _iter_json_array_range(data_path, first, end, bounds)
+            ):
+                pass
+            return processor.load_stats, bounds["first"], bounds["next"]
+        except ValueError:
+            if not guessed:
+                raise
+            if bounds["count"] > 1:
+                return None, None, None
+            start = first + 1
+
 class DataProcessor:
     """Handles data processing for the workspace layout generator."""
     
     def __init__(self, data_dir: Path):
         self.data_dir = data_dir
         self.logger = setup_logger()
+        self.validator = TrainingDataValidator()
+        self.load_stats = _new_stats()
         
     def load_training_data(self) -> List[Dict]:
         """Load and preprocess training data from files."""
         try:
-            training_data = []
-            data_path = self.data_dir / "training_data.json"
-            
-            if data_path.exists():
-                with open(data_path, 'r') as f:
-                    raw_data = json.load(f)
-                
-                for item in raw_data:
-                    processed_item = self._validate_and_process_item(item)
-                    if processed_item:
-                        training_data.append(processed_item)
+            training_data = list(self.iter_training_data())
             
             logger.info(f"Loaded {len(training_data)} training examples")
             return training_data
@@ -35,78 +221,221 @@ class DataProcessor:
             logger.error(f"Error loading training data: {str(e)}")
             raise
     
-    def _validate_and_process_item(self, item: Dict) -> Dict:
-        """Validate and process a single training data item."""
-        required_fields = {
-            'preferences': ['dimensions', 'work_style', 'noise_tolerance', 'equipment'],
-            'layout': ['desk', 'storage', 'equipment_zones', 'spacing']
-        }
+    def iter_training_data(self, data_path: Optional[Path] = None,
+                           batch_size: Optional[int] = None,
+                           read_size: int = READ_SIZE) -> Iterator:
+        """Lazily parse, validate and yield training items.
         
+        Accepts a top-level JSON array, parsed incrementally, or JSON Lines
+        (one item per line). Defaults to ``training_data.json``, falling back
+        to ``training_data.jsonl``. With ``batch_size`` lists of up to that
+        many items are yielded instead of single items. Valid and rejected
+        item counts, and rejections per field, are kept in ``load_stats``.
+        """
         try:
-            # Validate structure
-            for category, fields in required_fields.items():
-                if category not in item:
-                    raise ValueError(f"Missing category: {category}")
-                
-                for field in fields:
-                    if field not in item[category]:
-                        raise ValueError(f"Missing field: {field} in {category}")
-            
-            # Process and normalize values
-            processed_item = {
-                'preferences': self._process_preferences(item['preferences']),
-                'layout': self._process_layout(item['layout'])
-            }
-            
-            return processed_item
+            if data_path is None:
+                data_path = self.data_dir / "training_data.json"
+                if not data_path.exists():
+                    data_path = self.data_dir / "training_data.jsonl"
+            
+            self.load_stats = _new_stats()
+            if not Path(data_path).exists():
+                return
+            
+            items = self._iter_processed_items(Path(data_path), read_size)
+            if batch_size is None:
+                yield from items
+            else:
+                while batch := list(islice(items, batch_size)):
+                    yield batch
+            
+            self._log_stats(data_path)
             
         except Exception as e:
-            logger.warning(f"Invalid training data item: {str(e)}")
-            return None
+            logger.error(f"Error loading training data: {str(e)}")
+            raise
     
-    def _process_preferences(self, preferences: Dict) -> Dict:
-        """Process and validate preference data."""
-        processed = preferences.copy()
-        
-        # Validate and normalize dimensions
-        for dim in ['width', 'length']:
-            value = processed['dimensions'][dim]
-            if not isinstance(value, (int, float)) or value <= 0:
-                raise ValueError(f"Invalid {dim}: {value}")
-            processed['dimensions'][dim] = float(value)
+    def load_training_arrays(self, model, data_path: Optional[Path] = None,
+                             cache_dir: Optional[Path] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Encoded (X, y) training matrices for a model, cached as .npz.
         
-        # Validate work style
-        valid_styles = {"Individual Focus", "Collaborative", "Hybrid", "Creative Studio"}
-        if processed['work_style'] not in valid_styles:
-            raise ValueError(f"Invalid work style: {processed['work_style']}")
+        ``model`` provides ``training_arrays()``, ``encoder`` and
+        ``TARGET_VERSION`` (WorkspaceLayoutGenerator, LayoutDecisionTree).
+        Entries under ``data_dir/training_cache`` are keyed on the source's
+        resolved path, the SHA-256 of its contents and the encoder and target
+        versions, so a warm load skips parsing, validation and encoding, and
+        same-named files in different directories keep separate entries;
+        pass the result to the model's ``train_arrays()``.
+        """
+        try:
+            if data_path is None:
+                data_path = self.data_dir / "training_data.json"
+                if not data_path.exists():
+                    data_path = self.data_dir / "training_data.jsonl"
+            data_path = Path(data_path)
+            cache_dir = Path(cache_dir or self.data_dir / "training_cache")
+            
+            digest = hashlib.sha256()
+            with open(data_path, 'rb') as f:
+                while block := f.read(HASH_BLOCK_SIZE):
+                    digest.update(block)
+            model_key = hashlib.sha256(
+                f"{data_path.resolve()}/{model.encoder.version}/{model.TARGET_VERSION}".encode()
+            ).hexdigest()[:12]
+            prefix = f"{data_path.name}-{model_key}-"
+            cache_path = cache_dir / f"{prefix}{digest.hexdigest()[:24]}.npz"
+            
+            if cache_path.exists():
+                with np.load(cache_path, allow_pickle=False) as cached:
+                    X, y = cached['X'], cached['y']
+                    self.load_stats = json.loads(str(cached['stats']))
+                logger.info(f"Loaded {len(X)} cached training examples from {cache_path}")
+                return X, y
+            
+            X, y = model.training_arrays(list(self.iter_training_data(data_path)))
+            
+            # Write privately and rename into place, replacing stale entries
+            cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp_path = cache_dir / f".{cache_path.stem}.{os.getpid()}.tmp.npz"
+            np.savez(tmp_path, X=X, y=y, stats=np.array(json.dumps(self.load_stats)))
+            for stale_path in cache_dir.iterdir():
+                if stale_path.name.startswith(prefix) and stale_path.suffix == ".npz":
+                    stale_path.unlink(missing_ok=True)
+            os.replace(tmp_path, cache_path)
+            
+            logger.info(f"Cached {len(X)} encoded training examples at {cache_path}")
+            return X, y
+            
+        except Exception as e:
+            logger.error(f"Error loading training arrays: {str(e)}")
+            raise
+    
+    def validate_training_data(self, data_paths: Optional[List[Path]] = None,
+                               max_workers: Optional[int] = None,
+                               shard_size: int = SHARD_SIZE) -> Dict:
+        """Validate training files in a process pool and merge the counts.
         
-        # Validate noise tolerance
-        valid_noise_levels = {"Low", "Medium", "High"}
-        if processed['noise_tolerance'] not in valid_noise_levels:
-            raise ValueError(f"Invalid noise tolerance: {processed['noise_tolerance']}")
+        Files are split into byte ranges of about ``shard_size`` so large
+        corpora spread across workers. JSON Lines shards start at line
+        breaks; JSON array shards guess their first item and are checked
+        against where the previous shard stopped, re-running any that
+        guessed wrong. Workers send back counts, not items (unpickling
+        millions of dicts would cost more than validating them); stream
+        the valid items with iter_training_data(). Returns the merged
+        ``load_stats``.
+        """
+        try:
+            if data_paths is None:
+                data_paths = [
+                    path for path in (self.data_dir / "training_data.json",
+                                      self.data_dir / "training_data.jsonl")
+                    if path.exists()
+                ][:1]
+            
+            shards = []
+            for data_path in map(Path, data_paths):
+                is_array = _is_json_array(data_path)
+                size = data_path.stat().st_size
+                shards.extend(
+                    (data_path, start, min(start + shard_size, size), is_array, None)
+                    for start in range(0, size, shard_size)
+                )
+            
+            self.load_stats = _new_stats()
+            reruns = 0
+            expected = {}  # Offset of the next array item, per file
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                for shard, result in zip(shards, executor.map(validate_training_shard, shards)):
+                    data_path, start, end, is_array, _ = shard
+                    if is_array and start > 0:
+                        following = expected[data_path]
+                        if following is None or following >= end:
+                            continue  # No item starts in this shard
+                        if result[1] != following:
+                            reruns += 1
+                            result = validate_training_shard(
+                                (data_path, start, end, True, following)
+                            )
+                    stats, _, expected[data_path] = result
+                    _merge_stats(self.load_stats, stats)
+            
+            self._log_stats(f"{len(shards)} shards ({reruns} re-run)")
+            return self.load_stats
+            
+        except Exception as e:
+            logger.error(f"Error validating training data: {str(e)}")
+            raise
+    
+    def _log_stats(self, source) -> None:
+        logger.info(
+            f"Parsed {source}: {self.load_stats['valid']} valid, "
+            f"{self.load_stats['rejected']} rejected items"
+        )
+        if self.load_stats['errors']:
+            logger.warning(
+                "Rejected training items by field: "
+                + ", ".join(f"{field}: {count}" for field, count in
+                            sorted(self.load_stats['errors'].items()))
+            )
+    
+    def _iter_processed_items(self, data_path: Path, read_size: int) -> Iterator[Dict]:
+        """Parse a training file and validate its items one at a time."""
+        with open(data_path, 'r') as f:
+            start = f.read(read_size)
+            is_array = data_path.suffix != '.jsonl' and start.lstrip().startswith('[')
+            raw_items = (
+                self._iter_json_array(f, start, read_size) if is_array
+                else self._iter_json_lines(f, start)
+            )
+            yield from self._validate_items(raw_items)
+    
+    def _validate_items(self, raw_items) -> Iterator[Dict]:
+        """Yield processed valid items, counting valid and rejected ones."""
+        for item in raw_items:
+            processed_item = self._validate_and_process_item(item)
+            if processed_item:
+                self.load_stats["valid"] += 1
+                yield processed_item
+            else:
+                self.load_stats["rejected"] += 1
+    
+    @staticmethod
+    def _iter_json_array(f: TextIO, buffer: str, read_size: int) -> Iterator:
+        """Yield the elements of a top-level JSON array read in chunks."""
+        for _, item in _iter_json_array_items(f, buffer, buffer.index('[') + 1, read_size, 0):
+            yield item
+    
+    @staticmethod
+    def _iter_json_lines(f: TextIO, start: str) -> Iterator:
+        """Yield one decoded item per non-blank line; malformed lines yield None."""
+        lines = (start + f.readline()).splitlines()
+        for line in chain(lines, f):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                yield None
+    
+    def _validate_and_process_item(self, item: Dict) -> Dict:
+        """Validate and process a single training data item.
         
-        return processed
+        Failures are counted per field in ``load_stats['errors']`` rather
+        than logged one by one.
+        """
+        processed_item, field = self.validator.validate(item)
+        if field is not None:
+            errors = self.load_stats.setdefault("errors", {})
+            errors[field] = errors.get(field, 0) + 1
+        return processed_item
+    
+    def _process_preferences(self, preferences: Dict) -> Dict:
+        """Process and validate preference data."""
+        return self.validator.validate_section('preferences', preferences)
     
     def _process_layout(self, layout: Dict) -> Dict:
         """Process and validate layout data."""
-        processed = layout.copy()
-        
-        # Validate desk parameters
-        desk = processed['desk']
-        if not all(isinstance(v, (int, float)) for v in desk['position'] + desk['dimensions']):
-            raise ValueError("Invalid desk parameters")
-        
-        # Validate storage parameters
-        storage = processed['storage']
-        if not all(isinstance(v, (int, float)) for v in storage['position'] + storage['dimensions']):
-            raise ValueError("Invalid storage parameters")
-        
-        # Validate equipment zones
-        for pos in processed['equipment_zones']['monitor_positions']:
-            if not all(isinstance(v, (int, float)) for v in pos):
-                raise ValueError("Invalid monitor position")
-        
-        return processed
+        return self.validator.validate_section('layout', layout)
     
     def save_generated_layout(self, layout: Dict, output_path: Path) -> None:
         """Save a generated layout to file."""
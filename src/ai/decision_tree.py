@@ -1,6 +1,10 @@
 from sklearn.tree import DecisionTreeRegressor
+import hashlib
+import pickle
 import numpy as np
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
+from ai.feature_encoding import PreferenceEncoder
+from ai.prediction_cache import PredictionCache
 from utils.logger import setup_logger
 
 logger = setup_logger()
@@ -8,29 +12,48 @@ logger = setup_logger()
 class LayoutDecisionTree:
     """Decision tree for initial layout suggestions based on basic rules."""
     
-    def __init__(self):
+    # Bump when training_arrays changes, to invalidate cached targets
+    TARGET_VERSION = "positions-1"
+    
+    def __init__(self, prediction_cache: Optional[PredictionCache] = None):
         self.desk_position_model = DecisionTreeRegressor(max_depth=5)
         self.storage_position_model = DecisionTreeRegressor(max_depth=5)
+        self.encoder = PreferenceEncoder("decision_tree")
+        self.prediction_cache = prediction_cache
+        self._weights_version = None
         self.logger = setup_logger()
         
     def train(self, training_data: List[Dict]) -> None:
         """Train decision trees on historical layout data."""
         try:
-            X = self._extract_features(training_data)
-            
-            # Extract target variables
-            desk_positions = np.array([
-                list(data['layout']['desk']['position'])
-                for data in training_data
-            ])
-            storage_positions = np.array([
-                list(data['layout']['storage']['position'])
-                for data in training_data
-            ])
+            X, positions = self.training_arrays(training_data)
+            self.train_arrays(X, positions)
             
+        except Exception as e:
+            logger.error(f"Error training decision trees: {str(e)}")
+            raise
+    
+    def training_arrays(self, training_data: List[Dict]) -> Tuple[np.ndarray, np.ndarray]:
+        """Features and (desk_x, desk_y, storage_x, storage_y) targets."""
+        X = self._extract_features(training_data)
+        
+        # Extract target variables
+        positions = np.array([
+            list(data['layout']['desk']['position'])
+            + list(data['layout']['storage']['position'])
+            for data in training_data
+        ])
+        return X, positions
+    
+    def train_arrays(self, X: np.ndarray, positions: np.ndarray) -> None:
+        """Fit the trees on encoded matrices from training_arrays()."""
+        try:
             # Train models
-            self.desk_position_model.fit(X, desk_positions)
-            self.storage_position_model.fit(X, storage_positions)
+            self._weights_version = None
+            if self.prediction_cache is not None:
+                self.prediction_cache.clear()
+            self.desk_position_model.fit(X, positions[:, :2])
+            self.storage_position_model.fit(X, positions[:, 2:])
             
             logger.info("Decision trees trained successfully")
             
@@ -38,27 +61,26 @@ class LayoutDecisionTree:
             logger.error(f"Error training decision trees: {str(e)}")
             raise
     
+    @property
+    def weights_version(self) -> str:
+        """Digest of the fitted trees, used to key cached predictions."""
+        if self._weights_version is None:
+            digest = hashlib.sha256()
+            for model in (self.desk_position_model, self.storage_position_model):
+                digest.update(pickle.dumps(model))
+            self._weights_version = digest.hexdigest()
+        return self._weights_version
+    
+    def _predict_positions(self, features: np.ndarray) -> np.ndarray:
+        """Predict (desk_x, desk_y, storage_x, storage_y) for each feature row."""
+        return np.hstack([
+            self.desk_position_model.predict(features),
+            self.storage_position_model.predict(features)
+        ])
+    
     def _extract_features(self, training_data: List[Dict]) -> np.ndarray:
         """Extract features from training data."""
-        features = []
-        
-        for data in training_data:
-            prefs = data['preferences']
-            feature_vector = [
-                prefs['dimensions']['width'],
-                prefs['dimensions']['length'],
-                1 if prefs['work_style'] == "Individual Focus" else 0,
-                1 if prefs['work_style'] == "Collaborative" else 0,
-                1 if prefs['work_style'] == "Hybrid" else 0,
-                1 if prefs['work_style'] == "Creative Studio" else 0,
-                {"Low": 0, "Medium": 1, "High": 2}[prefs['noise_tolerance']],
-                prefs['equipment']['monitors'],
-                1 if prefs['equipment']['standing_desk'] else 0,
-                1 if prefs['equipment']['storage'] else 0
-            ]
-            features.append(feature_vector)
-        
-        return np.array(features)
+        return self.encoder.encode([data['preferences'] for data in training_data])
     
     def suggest_layout(self, preferences: Dict) -> Dict:
         """Generate initial layout suggestion based on decision trees."""
@@ -67,8 +89,13 @@ class LayoutDecisionTree:
             features = self._extract_features([{'preferences': preferences}])
             
             # Predict positions
-            desk_position = self.desk_position_model.predict(features)[0]
-            storage_position = self.storage_position_model.predict(features)[0]
+            if self.prediction_cache is not None:
+                positions = self.prediction_cache.predict(
+                    features, self.weights_version, self._predict_positions
+                )[0]
+            else:
+                positions = self._predict_positions(features)[0]
+            desk_position, storage_position = positions[:2], positions[2:]
             
             # Generate layout suggestion
             layout = {
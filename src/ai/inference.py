@@ -0,0 +1,81 @@
+import numpy as np
+from pathlib import Path
+from typing import Dict, List
+from ai.base_model import BaseLayoutModel
+from utils.logger import setup_logger
+
+logger = setup_logger()
+
+# Maximum absolute difference from the Keras model's output parameters
+OUTPUT_TOLERANCE = 1e-5
+
+class InferenceLayoutGenerator(BaseLayoutModel):
+    """NumPy-only layout generator running weights exported from Keras.
+    
+    Loads the .npz written by ``WorkspaceLayoutGenerator.export_weights`` and
+    reproduces its forward pass without importing TensorFlow. Outputs match
+    the Keras model within ``OUTPUT_TOLERANCE``.
+    """
+    
+    ACTIVATIONS = {
+        "relu": lambda x: np.maximum(x, 0),
+        "sigmoid": lambda x: 1 / (1 + np.exp(-x)),
+        "linear": lambda x: x
+    }
+    
+    def __init__(self, weights_path: Path):
+        self.weights_path = Path(weights_path)
+        self.layers = self._load_weights(self.weights_path)
+    
+    def _load_weights(self, weights_path: Path) -> List[tuple]:
+        """Load (kernel, bias, activation) triples from an exported file."""
+        try:
+            with np.load(weights_path) as weights:
+                activations = [str(name) for name in weights["activations"]]
+                layers = []
+                
+                for index, activation in enumerate(activations):
+                    if activation not in self.ACTIVATIONS:
+                        raise ValueError(f"Unsupported activation: {activation}")
+                    layers.append((
+                        weights[f"kernel_{index}"].astype(np.float32),
+                        weights[f"bias_{index}"].astype(np.float32),
+                        self.ACTIVATIONS[activation]
+                    ))
+            
+            logger.info(f"Loaded {len(layers)} dense layers from {weights_path}")
+            return layers
+        
+        except Exception as e:
+            logger.error(f"Error loading exported weights: {str(e)}")
+            raise
+    
+    def predict(self, model_input: np.ndarray) -> np.ndarray:
+        """Run the forward pass for a matrix of encoded preferences."""
+        output = np.asarray(model_input, dtype=np.float32)
+        for kernel, bias, activation in self.layers:
+            output = activation(output @ kernel + bias)
+        return output
+    
+    def generate_layout(self, preferences: Dict) -> Dict:
+        """Generate a workspace layout based on user preferences."""
+        try:
+            layout_params = self.predict(self._preprocess_preferences(preferences))[0]
+            return self._params_to_layout(layout_params)
+        
+        except Exception as e:
+            logger.error(f"Error generating layout: {str(e)}")
+            raise
+    
+    def generate_layouts(self, preferences_list: List[Dict]) -> List[Dict]:
+        """Generate layouts for many users with one matrix product per layer."""
+        try:
+            if not preferences_list:
+                return []
+            
+            model_input = self.encoder.encode(preferences_list)
+            return [self._params_to_layout(params) for params in self.predict(model_input)]
+        
+        except Exception as e:
+            logger.error(f"Error generating layouts: {str(e)}")
+            raise
@@ -0,0 +1,165 @@
+import numpy as np
+from typing import Dict, Optional, Tuple, Union
+
+# Scalar fields stored at the front of Layout.values; monitor (x, y) pairs follow
+LAYOUT_FIELDS = (
+    "desk_x", "desk_y", "desk_width", "desk_depth", "desk_orientation",
+    "storage_x", "storage_y", "storage_width", "storage_depth",
+    "clearance", "walkways"
+)
+(DESK_X, DESK_Y, DESK_WIDTH, DESK_DEPTH, DESK_ORIENTATION,
+ STORAGE_X, STORAGE_Y, STORAGE_WIDTH, STORAGE_DEPTH,
+ CLEARANCE, WALKWAYS) = range(len(LAYOUT_FIELDS))
+SCALAR_COUNT = len(LAYOUT_FIELDS)
+
+LAYOUT_KEYS = {"desk", "storage", "equipment_zones", "spacing"}
+LAYOUT_DTYPE = np.float32
+
+class Layout:
+    """Compact workspace layout backed by a single flat array.
+    
+    Replaces the nested layout dict inside hot loops: copying is one array
+    copy and field updates write in place. Extra top-level keys (e.g.
+    ``room_width``) are carried through unchanged.
+    
+    Values are always float32 (LAYOUT_DTYPE). Every write, from
+    ``from_dict``, a setter or an optimizer step, rounds to the nearest
+    float32, about 7 significant digits, which keeps room-scale millimetre
+    coordinates exact to well under 0.01 mm. Rounding happens once:
+    ``to_dict`` output converts back to the same values.
+    """
+    
+    __slots__ = ("values", "extras")
+    
+    def __init__(self, values: np.ndarray, extras: Optional[Dict] = None):
+        self.values = values
+        self.extras = extras
+    
+    @classmethod
+    def from_dict(cls, layout: Dict) -> "Layout":
+        """Build a Layout from the nested dict representation."""
+        desk = layout['desk']
+        storage = layout['storage']
+        monitors = layout['equipment_zones']['monitor_positions']
+        
+        values = np.empty(SCALAR_COUNT + 2 * len(monitors), dtype=LAYOUT_DTYPE)
+        values[:SCALAR_COUNT] = (
+            *desk['position'], *desk['dimensions'], desk['orientation'],
+            *storage['position'], *storage['dimensions'],
+            layout['spacing']['clearance'], layout['spacing']['walkways']
+        )
+        for i, pos in enumerate(monitors):
+            values[SCALAR_COUNT + 2 * i:SCALAR_COUNT + 2 * i + 2] = pos
+        
+        extras = {key: value for key, value in layout.items() if key not in LAYOUT_KEYS}
+        return cls(values, extras or None)
+    
+    @classmethod
+    def coerce(cls, layout: Union[Dict, "Layout"], copy: bool = False) -> "Layout":
+        """Return a Layout for either representation (dicts are converted).
+        
+        With ``copy=True`` the result never shares state with ``layout``;
+        dicts are converted into fresh arrays either way, so only Layout
+        inputs are copied.
+        """
+        if isinstance(layout, dict):
+            return cls.from_dict(layout)
+        return layout.copy() if copy else layout
+    
+    def to_dict(self) -> Dict:
+        """Convert back to the nested dict representation."""
+        v = self.values.tolist()
+        layout = {
+            "desk": {
+                "position": (v[DESK_X], v[DESK_Y]),
+                "dimensions": (v[DESK_WIDTH], v[DESK_DEPTH]),
+                "orientation": v[DESK_ORIENTATION]
+            },
+            "storage": {
+                "position": (v[STORAGE_X], v[STORAGE_Y]),
+                "dimensions": (v[STORAGE_WIDTH], v[STORAGE_DEPTH])
+            },
+            "equipment_zones": {
+                "monitor_positions": [
+                    (v[i], v[i + 1]) for i in range(SCALAR_COUNT, len(v), 2)
+                ]
+            },
+            "spacing": {
+                "clearance": v[CLEARANCE],
+                "walkways": v[WALKWAYS]
+            }
+        }
+        if self.extras:
+            layout.update(self.extras)
+        return layout
+    
+    def copy(self) -> "Layout":
+        """Return an independent copy (one array copy plus the extras dict)."""
+        return Layout(self.values.copy(), dict(self.extras) if self.extras else None)
+    
+    def __eq__(self, other) -> bool:
+        return (
+            isinstance(other, Layout)
+            and np.array_equal(self.values, other.values)
+            and self.extras == other.extras
+        )
+    
+    def __repr__(self) -> str:
+        return f"Layout({self.to_dict()!r})"
+    
+    @property
+    def desk_position(self) -> Tuple[float, float]:
+        return (float(self.values[DESK_X]), float(self.values[DESK_Y]))
+    
+    @desk_position.setter
+    def desk_position(self, position: Tuple[float, float]) -> None:
+        self.values[DESK_X:DESK_Y + 1] = position
+    
+    @property
+    def desk_dimensions(self) -> Tuple[float, float]:
+        return (float(self.values[DESK_WIDTH]), float(self.values[DESK_DEPTH]))
+    
+    @property
+    def desk_orientation(self) -> float:
+        return float(self.values[DESK_ORIENTATION])
+    
+    @desk_orientation.setter
+    def desk_orientation(self, orientation: float) -> None:
+        self.values[DESK_ORIENTATION] = orientation
+    
+    @property
+    def storage_position(self) -> Tuple[float, float]:
+        return (float(self.values[STORAGE_X]), float(self.values[STORAGE_Y]))
+    
+    @storage_position.setter
+    def storage_position(self, position: Tuple[float, float]) -> None:
+        self.values[STORAGE_X:STORAGE_Y + 1] = position
+    
+    @property
+    def storage_dimensions(self) -> Tuple[float, float]:
+        return (float(self.values[STORAGE_WIDTH]), float(self.values[STORAGE_DEPTH]))
+    
+    @property
+    def clearance(self) -> float:
+        return float(self.values[CLEARANCE])
+    
+    @clearance.setter
+    def clearance(self, clearance: float) -> None:
+        self.values[CLEARANCE] = clearance
+    
+    @property
+    def walkways(self) -> float:
+        return float(self.values[WALKWAYS])
+    
+    @walkways.setter
+    def walkways(self, walkways: float) -> None:
+        self.values[WALKWAYS] = walkways
+    
+    @property
+    def monitor_positions(self) -> np.ndarray:
+        """(n_monitors, 2) view of the monitor positions."""
+        return self.values[SCALAR_COUNT:].reshape(-1, 2)
+
+def as_layout_dict(layout: Union[Dict, Layout]) -> Dict:
+    """Return the nested dict form of a layout at export boundaries."""
+    return layout if isinstance(layout, dict) else layout.to_dict()
@@ -0,0 +1,112 @@
+import numpy as np
+from typing import Dict, List, Tuple, Union
+from ai.feature_encoding import PreferenceEncoder
+from ai.layout import (
+    Layout, SCALAR_COUNT, DESK_X, DESK_Y, DESK_ORIENTATION,
+    STORAGE_X, STORAGE_Y, CLEARANCE, WALKWAYS
+)
+
+# Per-action additive and multiplicative updates to the Layout scalar
+# fields (0-3 move desk, 4 rotate desk, 5-6 move storage, 7 widen spacing)
+ACTION_OFFSETS = np.zeros((8, SCALAR_COUNT))
+ACTION_OFFSETS[0, DESK_X] = 50
+ACTION_OFFSETS[1, DESK_X] = -50
+ACTION_OFFSETS[2, DESK_Y] = 50
+ACTION_OFFSETS[3, DESK_Y] = -50
+ACTION_OFFSETS[4, DESK_ORIENTATION] = 45
+ACTION_OFFSETS[5, STORAGE_X] = 50
+ACTION_OFFSETS[6, STORAGE_Y] = 50
+
+ACTION_SCALES = np.ones((8, SCALAR_COUNT))
+ACTION_SCALES[7, [CLEARANCE, WALKWAYS]] = 1.1
+
+ROTATE_ACTION = 4
+
+def apply_actions(layouts: np.ndarray, actions: np.ndarray) -> np.ndarray:
+    """Apply one action per row of an (N, SCALAR_COUNT) layout tensor."""
+    new_layouts = layouts * ACTION_SCALES[actions] + ACTION_OFFSETS[actions]
+    rotated = actions == ROTATE_ACTION
+    new_layouts[rotated, DESK_ORIENTATION] %= 360
+    # Round like a Layout would, so batched and single steps agree
+    return new_layouts.astype(layouts.dtype, copy=False)
+
+def layout_states(layouts: np.ndarray, preference_features: np.ndarray) -> np.ndarray:
+    """State vectors for an (N, SCALAR_COUNT) layout tensor."""
+    return np.column_stack([
+        layouts[:, [DESK_X, DESK_Y, STORAGE_X, STORAGE_Y]],
+        layouts[:, DESK_ORIENTATION] / 360,
+        layouts[:, CLEARANCE] / 200,
+        layouts[:, WALKWAYS] / 200,
+        preference_features
+    ])
+
+def layout_rewards(layouts: np.ndarray, room_dimensions: np.ndarray) -> np.ndarray:
+    """Layout quality rewards for an (N, SCALAR_COUNT) layout tensor."""
+    desk = layouts[:, [DESK_X, DESK_Y]]
+    storage = layouts[:, [STORAGE_X, STORAGE_Y]]
+    
+    # Penalize desk-storage distances away from the optimum
+    optimal_distance = 200
+    distance = np.linalg.norm(desk - storage, axis=1)
+    rewards = -np.abs(distance - optimal_distance) / 100
+    
+    # Reward for good spacing
+    rewards += np.where(layouts[:, CLEARANCE] >= 100, 10, 0)
+    
+    # Penalize desks too close to walls
+    min_wall_distance = 50
+    near_wall = (
+        (desk.min(axis=1) < min_wall_distance)
+        | (desk[:, 0] > room_dimensions[:, 0] - min_wall_distance)
+        | (desk[:, 1] > room_dimensions[:, 1] - min_wall_distance)
+    )
+    rewards -= np.where(near_wall, 20, 0)
+    
+    return rewards
+
+def room_dimensions(preferences_list: List[Dict]) -> np.ndarray:
+    """(N, 2) array of room width and length per preferences dict."""
+    return np.array([
+        [prefs['dimensions']['width'], prefs['dimensions']['length']]
+        for prefs in preferences_list
+    ], dtype=np.float64)
+
+class VectorizedLayoutEnv:
+    """Steps N candidate layouts at once as rows of one NumPy array.
+    
+    Used by LayoutOptimizer.optimize_layouts to optimize many desks, or many
+    restarts for one user, with one Q-network query per step.
+    """
+    
+    def __init__(self, initial_layouts: List[Union[Dict, Layout]],
+                 preferences_list: List[Dict], encoder: PreferenceEncoder):
+        if len(initial_layouts) != len(preferences_list):
+            raise ValueError("Each layout needs a matching preferences dict")
+        
+        self.initial_layouts = [Layout.coerce(layout) for layout in initial_layouts]
+        self.layouts = np.stack([
+            layout.values[:SCALAR_COUNT] for layout in self.initial_layouts
+        ])
+        self.room_dimensions = room_dimensions(preferences_list)
+        self.preference_features = encoder.encode(preferences_list)
+    
+    def __len__(self) -> int:
+        return len(self.layouts)
+    
+    def states(self) -> np.ndarray:
+        """Return the (N, state_size) state matrix for the current layouts."""
+        return layout_states(self.layouts, self.preference_features)
+    
+    def step(self, actions: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Apply one action per layout; return (next_states, rewards)."""
+        self.layouts = apply_actions(self.layouts, actions)
+        return self.states(), layout_rewards(self.layouts, self.room_dimensions)
+    
+    def to_layouts(self) -> List[Layout]:
+        """Return the current tensor rows as Layout objects."""
+        layouts = []
+        for initial, row in zip(self.initial_layouts, self.layouts):
+            layout = initial.copy()
+            layout.values[:SCALAR_COUNT] = row
+            layouts.append(layout)
+        return layouts
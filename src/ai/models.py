@@ -1,29 +1,59 @@
-from abc import ABC, abstractmethod
+import hashlib
+import json
+import threading
+import time
 import numpy as np
 import tensorflow as tf
-from typing import Dict, List, Tuple
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from ai.base_model import BaseLayoutModel, TrainableLayoutModel
+from ai.prediction_cache import PredictionCache
+from config import Config
 from utils.logger import setup_logger
 
 logger = setup_logger()
 
-class BaseLayoutModel(ABC):
-    """Abstract base class for layout generation models."""
+class ThroughputLogger(tf.keras.callbacks.Callback):
+    """Keras callback reporting training samples/sec for each epoch."""
     
-    @abstractmethod
-    def generate_layout(self, preferences: Dict) -> Dict:
-        """Generate a layout based on user preferences."""
-        pass
+    def __init__(self):
+        super().__init__()
+        self.samples_per_second = []
+        self.samples_per_epoch = []
+        self._samples = 0
+        self._lock = threading.Lock()
+        self._epoch_start = 0.0
     
-    @abstractmethod
-    def train(self, training_data: List[Dict]) -> None:
-        """Train the model using historical data."""
-        pass
+    def add_samples(self, count: int) -> None:
+        """Record samples produced by the input pipeline (thread-safe)."""
+        with self._lock:
+            self._samples += count
+    
+    def on_epoch_begin(self, epoch, logs=None):
+        with self._lock:
+            self._samples = 0
+        self._epoch_start = time.perf_counter()
+    
+    def on_epoch_end(self, epoch, logs=None):
+        elapsed = time.perf_counter() - self._epoch_start
+        rate = self._samples / elapsed if elapsed > 0 else 0.0
+        self.samples_per_second.append(rate)
+        self.samples_per_epoch.append(self._samples)
+        logger.info(
+            f"Epoch {epoch + 1}: {self._samples} samples, {rate:.1f} samples/sec"
+        )
 
-class WorkspaceLayoutGenerator(BaseLayoutModel):
-    """Neural network-based workspace layout generator."""
+class WorkspaceLayoutGenerator(TrainableLayoutModel):
+    """Neural network-based workspace layout generator.
     
-    def __init__(self):
+    Pass a ``PredictionCache`` to memoize outputs for repeated preference
+    profiles; it is keyed on ``weights_version`` and invalidated by training.
+    """
+    
+    def __init__(self, prediction_cache: Optional[PredictionCache] = None):
         self.model = self._build_model()
+        self.prediction_cache = prediction_cache
+        self._weights_version = None
         
     def _build_model(self) -> tf.keras.Model:
         """Build the neural network architecture."""
@@ -44,37 +74,6 @@ class WorkspaceLayoutGenerator(BaseLayoutModel):
         
         return model
     
-    def _preprocess_preferences(self, preferences: Dict) -> np.ndarray:
-        """Convert user preferences to model input format."""
-        # Extract and normalize features
-        features = []
-        
-        # Room dimensions (normalized to 0-1 range)
-        features.extend([
-            preferences['dimensions']['width'] / 10000,
-            preferences['dimensions']['length'] / 10000
-        ])
-        
-        # Work style (one-hot encoding)
-        work_styles = ["Individual Focus", "Collaborative", "Hybrid", "Creative Studio"]
-        features.extend([
-            1 if preferences['work_style'] == style else 0
-            for style in work_styles
-        ])
-        
-        # Noise tolerance
-        noise_levels = {"Low": 0, "Medium": 0.5, "High": 1}
-        features.append(noise_levels[preferences['noise_tolerance']])
-        
-        # Equipment
-        features.extend([
-            preferences['equipment']['monitors'] / 4,  # Normalize by max monitors
-            1 if preferences['equipment']['standing_desk'] else 0,
-            1 if preferences['equipment']['storage'] else 0
-        ])
-        
-        return np.array(features).reshape(1, -1)
-    
     def generate_layout(self, preferences: Dict) -> Dict:
         """Generate a workspace layout based on user preferences."""
         try:
@@ -82,7 +81,12 @@ class WorkspaceLayoutGenerator(BaseLayoutModel):
             model_input = self._preprocess_preferences(preferences)
             
             # Generate layout parameters
-            layout_params = self.model.predict(model_input)[0]
+            if self.prediction_cache is not None:
+                layout_params = self.prediction_cache.predict(
+                    model_input, self.weights_version, self.model.predict_on_batch
+                )[0]
+            else:
+                layout_params = self.model.predict(model_input)[0]
             
             # Convert parameters to layout specification
             layout = self._params_to_layout(layout_params)
@@ -94,57 +98,62 @@ class WorkspaceLayoutGenerator(BaseLayoutModel):
             logger.error(f"Error generating layout: {str(e)}")
             raise
     
-    def _params_to_layout(self, params: np.ndarray) -> Dict:
-        """Convert model output parameters to a layout specification."""
-        # Split parameters into different components
-        desk_params = params[:10]
-        storage_params = params[10:20]
-        equipment_params = params[20:30]
-        spacing_params = params[30:40]
-        orientation_params = params[40:]
-        
-        return {
-            "desk": {
-                "position": (desk_params[0], desk_params[1]),
-                "dimensions": (desk_params[2], desk_params[3]),
-                "orientation": desk_params[4] * 360  # Convert to degrees
-            },
-            "storage": {
-                "position": (storage_params[0], storage_params[1]),
-                "dimensions": (storage_params[2], storage_params[3])
-            },
-            "equipment_zones": {
-                "monitor_positions": [
-                    (equipment_params[i], equipment_params[i+1])
-                    for i in range(0, 8, 2)
-                ]
-            },
-            "spacing": {
-                "clearance": spacing_params[0] * 2,  # Convert to meters
-                "walkways": spacing_params[1] * 2
-            }
-        }
+    def generate_layouts(self, preferences_list: List[Dict],
+                         batch_size: int = 256) -> List[Dict]:
+        """Generate layouts for many users with batched model inference."""
+        try:
+            if not preferences_list:
+                return []
+        
+            # Encode every profile into one input matrix
+            model_input = self.encoder.encode(preferences_list)
+            
+            # Run inference in batches instead of one call per profile.
+            # predict_on_batch skips the per-call setup done by predict().
+            def predict_batches(inputs: np.ndarray) -> np.ndarray:
+                return np.concatenate([
+                    self.model.predict_on_batch(inputs[start:start + batch_size])
+                    for start in range(0, len(inputs), batch_size)
+                ])
+            
+            if self.prediction_cache is not None:
+                layout_params = self.prediction_cache.predict(
+                    model_input, self.weights_version, predict_batches
+                )
+            else:
+                layout_params = predict_batches(model_input)
+            
+            layouts = [self._params_to_layout(params) for params in layout_params]
+            
+            logger.info(f"Successfully generated {len(layouts)} layouts")
+            return layouts
+        
+        except Exception as e:
+            logger.error(f"Error generating layouts: {str(e)}")
+            raise
     
     def train(self, training_data: List[Dict]) -> None:
         """Train the model using historical layout data."""
         try:
             # Prepare training data
-            X = np.array([
-                self._preprocess_preferences(data['preferences']).flatten()
-                for data in training_data
-            ])
+            X, y = self.training_arrays(training_data)
             
-            y = np.array([
-                self._layout_to_params(data['layout'])
-                for data in training_data
-            ])
+            return self.train_arrays(X, y)
             
-            # Train the model
+        except Exception as e:
+            logger.error(f"Error training model: {str(e)}")
+            raise
+    
+    def train_arrays(self, X: np.ndarray, y: np.ndarray, epochs: int = 100,
+                     batch_size: int = 32, validation_split: float = 0.2):
+        """Train on encoded matrices, e.g. from DataProcessor.load_training_arrays()."""
+        try:
+            self._invalidate_predictions()
             history = self.model.fit(
                 X, y,
-                epochs=100,
-                batch_size=32,
-                validation_split=0.2,
+                epochs=epochs,
+                batch_size=batch_size,
+                validation_split=validation_split,
                 verbose=1
             )
             
@@ -155,31 +164,164 @@ class WorkspaceLayoutGenerator(BaseLayoutModel):
             logger.error(f"Error training model: {str(e)}")
             raise
     
-    def _layout_to_params(self, layout: Dict) -> np.ndarray:
-        """Convert a layout specification to model output parameters."""
-        params = []
-        
-        # Desk parameters
-        params.extend([
-            *layout['desk']['position'],
-            *layout['desk']['dimensions'],
-            layout['desk']['orientation'] / 360
-        ])
+    @property
+    def weights_version(self) -> str:
+        """Digest of the current model weights, used to key cached predictions."""
+        if self._weights_version is None:
+            digest = hashlib.sha256()
+            for weights in self.model.get_weights():
+                digest.update(np.ascontiguousarray(weights).tobytes())
+            self._weights_version = digest.hexdigest()
+        return self._weights_version
         
-        # Storage parameters
-        params.extend([
-            *layout['storage']['position'],
-            *layout['storage']['dimensions']
-        ])
+    def _invalidate_predictions(self) -> None:
+        """Forget the weight version and cached outputs before weights change."""
+        self._weights_version = None
+        if self.prediction_cache is not None:
+            self.prediction_cache.clear()
         
-        # Equipment parameters
-        for pos in layout['equipment_zones']['monitor_positions']:
-            params.extend(pos)
+    def train_streaming(self, shard_paths: List[Path],
+                        validation_paths: Optional[List[Path]] = None,
+                        epochs: int = 100, batch_size: int = 32,
+                        patience: int = 10, shuffle_buffer: int = 1024,
+                        checkpoint_path: Optional[Path] = None):
+        """Train from sharded JSON Lines files without loading them into memory.
         
-        # Spacing parameters
-        params.extend([
-            layout['spacing']['clearance'] / 2,
-            layout['spacing']['walkways'] / 2
-        ])
+        Each line of a shard is one training item ({"preferences", "layout"}).
+        Shards are read through an interleaved, prefetching tf.data pipeline,
+        so peak memory depends on the shuffle buffer and batch size rather
+        than on corpus size.
+        """
+        try:
+            throughput = ThroughputLogger()
+            train_dataset = self._build_dataset(
+                shard_paths, batch_size, shuffle_buffer, throughput
+            )
+            validation_dataset = (
+                self._build_dataset(validation_paths, batch_size, 0)
+                if validation_paths else None
+            )
+        
+            if checkpoint_path is None:
+                checkpoint_path = Config().models_dir / "layout_generator.weights.h5"
+            monitor = 'val_loss' if validation_dataset is not None else 'loss'
+        
+            callbacks = [
+                throughput,
+                tf.keras.callbacks.EarlyStopping(
+                    monitor=monitor,
+                    patience=patience,
+                    restore_best_weights=True
+                ),
+                tf.keras.callbacks.ModelCheckpoint(
+                    str(checkpoint_path),
+                    monitor=monitor,
+                    save_best_only=True,
+                    save_weights_only=True
+                )
+            ]
+            
+            self._invalidate_predictions()
+            history = self.model.fit(
+                train_dataset,
+                validation_data=validation_dataset,
+                epochs=epochs,
+                callbacks=callbacks,
+                verbose=1
+            )
+            history.history['samples_per_sec'] = throughput.samples_per_second
+            history.history['samples'] = throughput.samples_per_epoch
+            
+            logger.info("Streaming model training completed successfully")
+            return history
+        
+        except Exception as e:
+            logger.error(f"Error training model from shards: {str(e)}")
+            raise
+    
+    def _build_dataset(self, shard_paths: List[Path], batch_size: int,
+                       shuffle_buffer: int,
+                       throughput: Optional[ThroughputLogger] = None) -> tf.data.Dataset:
+        """Build a streaming (features, targets) dataset over JSON Lines shards."""
+        if not shard_paths:
+            raise ValueError("No training shards to read")
+        
+        def encode_lines(lines: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+            items = [json.loads(line) for line in lines]
+            X = self.encoder.encode([item['preferences'] for item in items])
+            y = np.array(
+                [self._layout_to_params(item['layout']) for item in items],
+                dtype=np.float32
+            )
+            return X, y
+        
+        def parse_batch(lines):
+            X, y = tf.numpy_function(encode_lines, [lines], [tf.float32, tf.float32])
+            X.set_shape([None, self.encoder.n_features])
+            y.set_shape([None, self.PARAMETER_COUNT])
+            return X, y
+        
+        def count_batch(X, y):
+            def add_samples(count: np.ndarray) -> np.ndarray:
+                throughput.add_samples(int(count))
+                return count
+            counted = tf.numpy_function(add_samples, [tf.shape(X)[0]], tf.int32)
+            with tf.control_dependencies([counted]):
+                return tf.identity(X), y
+        
+        dataset = tf.data.Dataset.from_tensor_slices([str(path) for path in shard_paths])
+        dataset = dataset.interleave(
+            tf.data.TextLineDataset,
+            cycle_length=min(len(shard_paths), 4),
+            num_parallel_calls=tf.data.AUTOTUNE
+        )
+        dataset = dataset.filter(lambda line: tf.strings.length(tf.strings.strip(line)) > 0)
+        if shuffle_buffer:
+            dataset = dataset.shuffle(shuffle_buffer)
+        dataset = dataset.batch(batch_size)
+        dataset = dataset.map(parse_batch, num_parallel_calls=tf.data.AUTOTUNE)
+        dataset = dataset.prefetch(tf.data.AUTOTUNE)
+        
+        # Count batches as the trainer takes them, after the prefetch buffer,
+        # so batches encoded ahead of time are not credited to the wrong epoch
+        if throughput is not None:
+            dataset = dataset.map(count_batch)
+        return dataset
+    
+    def export_weights(self, output_path: Path) -> Path:
+        """Export Dense layer weights to a compact .npz for NumPy-only inference.
+        
+        Dropout layers are identity at inference time and are skipped. The
+        file can be loaded by ``ai.inference.InferenceLayoutGenerator``.
+        """
+        try:
+            arrays = {}
+            activations = []
+            
+            for layer in self.model.layers:
+                if isinstance(layer, tf.keras.layers.Dropout):
+                    continue
+                if not isinstance(layer, tf.keras.layers.Dense):
+                    raise ValueError(f"Unsupported layer for export: {layer.name}")
+                
+                kernel, bias = layer.get_weights()
+                index = len(activations)
+                arrays[f"kernel_{index}"] = kernel.astype(np.float32)
+                arrays[f"bias_{index}"] = bias.astype(np.float32)
+                activations.append(layer.activation.__name__)
+            
+            np.savez_compressed(
+                output_path, activations=np.array(activations), **arrays
+            )
+            
+            # np.savez appends .npz when the suffix is missing
+            output_path = Path(output_path)
+            if output_path.suffix != ".npz":
+                output_path = output_path.with_name(output_path.name + ".npz")
+            
+            logger.info(f"Exported {len(activations)} dense layers to {output_path}")
+            return output_path
         
-        return np.array(params)
+        except Exception as e:
+            logger.error(f"Error exporting model weights: {str(e)}")
+            raise
@@ -0,0 +1,152 @@
+import hashlib
+import numpy as np
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, Optional
+from config import Config
+from utils.logger import setup_logger
+
+logger = setup_logger()
+
+# Pruning the disk tier keeps this fraction of max_disk_entries, so the
+# directory scan runs once per many writes rather than on every put
+DISK_PRUNE_RATIO = 0.9
+
+class PredictionCache:
+    """Bounded LRU cache of model outputs keyed by encoded preferences.
+    
+    Keys hash the encoded feature vector together with the model's weight
+    version, so entries computed before ``train()`` are never returned
+    afterwards. With ``persist=True`` entries are also written as .npy files
+    under ``cache_dir`` (default ``Config().models_dir / "prediction_cache"``)
+    and survive restarts. The directory may be shared by several models and
+    processes, so training does not delete it; instead it holds at most
+    about ``max_disk_entries`` files, and the least recently used ones
+    (including entries for old weight versions) are pruned.
+    """
+    
+    def __init__(self, max_entries: int = 1024, persist: bool = False,
+                 cache_dir: Optional[Path] = None, max_disk_entries: int = 100000):
+        if max_entries <= 0 or max_disk_entries <= 0:
+            raise ValueError(f"Invalid cache size: {max_entries}, {max_disk_entries}")
+        
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.entries = OrderedDict()
+        self.cache_dir = None
+        self.disk_entries = 0
+        if persist:
+            self.cache_dir = Path(cache_dir or Config().models_dir / "prediction_cache")
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            self.disk_entries = sum(1 for _ in self.cache_dir.glob("*.npy"))
+        
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+    
+    def __len__(self) -> int:
+        return len(self.entries)
+    
+    @staticmethod
+    def make_key(features: np.ndarray, model_version: str) -> str:
+        """Canonical hash of one encoded preference vector and model version."""
+        features = np.ascontiguousarray(features, dtype=np.float32)
+        digest = hashlib.sha256(model_version.encode())
+        digest.update(str(features.shape).encode())
+        digest.update(features.tobytes())
+        return digest.hexdigest()
+    
+    def get(self, key: str) -> Optional[np.ndarray]:
+        """Return the cached output for key, or None on a miss."""
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key]
+        
+        if self.cache_dir is not None:
+            path = self.cache_dir / f"{key}.npy"
+            if path.exists():
+                try:
+                    value = np.load(path)
+                    path.touch()  # Mark as recently used for pruning
+                    self._store(key, value)
+                    self.disk_hits += 1
+                    return value
+                except (OSError, ValueError) as e:
+                    logger.warning(f"Ignoring unreadable cache entry {path}: {str(e)}")
+        
+        self.misses += 1
+        return None
+    
+    def put(self, key: str, value: np.ndarray) -> None:
+        """Store an output, evicting the least recently used entry if full."""
+        value = np.asarray(value)
+        self._store(key, value)
+        if self.cache_dir is not None:
+            path = self.cache_dir / f"{key}.npy"
+            if not path.exists():
+                self.disk_entries += 1
+            np.save(path, value)
+            if self.disk_entries > self.max_disk_entries:
+                self._prune_disk()
+    
+    def _prune_disk(self) -> None:
+        """Delete the least recently used files down to DISK_PRUNE_RATIO of the cap."""
+        files = []
+        for path in self.cache_dir.glob("*.npy"):
+            try:
+                files.append((path.stat().st_mtime_ns, path))
+            except OSError:
+                pass  # Removed by another process
+        files.sort()
+        
+        excess = len(files) - int(self.max_disk_entries * DISK_PRUNE_RATIO)
+        for _, path in files[:max(excess, 0)]:
+            path.unlink(missing_ok=True)
+        self.disk_entries = len(files) - max(excess, 0)
+        logger.info(f"Pruned {max(excess, 0)} prediction cache files from {self.cache_dir}")
+    
+    def _store(self, key: str, value: np.ndarray) -> None:
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+    
+    def predict(self, features: np.ndarray, model_version: str,
+                predict_fn: Callable[[np.ndarray], np.ndarray]) -> np.ndarray:
+        """Return outputs for each feature row, computing only the misses.
+        
+        Missing rows are passed to ``predict_fn`` in a single batch.
+        """
+        keys = [self.make_key(row, model_version) for row in features]
+        cached = [self.get(key) for key in keys]
+        missing = [i for i, value in enumerate(cached) if value is None]
+        
+        if missing:
+            outputs = predict_fn(features[missing])
+            for i, output in zip(missing, outputs):
+                cached[i] = np.array(output)
+                self.put(keys[i], cached[i])
+        
+        return np.stack(cached)
+    
+    def clear(self, disk: bool = False) -> None:
+        """Drop in-memory entries (and on-disk entries when disk=True)."""
+        self.entries.clear()
+        if disk and self.cache_dir is not None:
+            for path in self.cache_dir.glob("*.npy"):
+                path.unlink()
+            self.disk_entries = 0
+    
+    def stats(self) -> Dict:
+        """Hit/miss counters for sizing the cache."""
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "max_entries": self.max_entries,
+            "disk_entries": self.disk_entries,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0
+        }
@@ -1,6 +1,12 @@
 import numpy as np
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple, Union
 import tensorflow as tf
+from ai.feature_encoding import PreferenceEncoder
+from ai.layout import Layout, SCALAR_COUNT
+from ai.layout_env import (
+    VectorizedLayoutEnv, apply_actions, layout_rewards, layout_states, room_dimensions
+)
+from ai.replay_buffer import ReplayBuffer
 from utils.logger import setup_logger
 
 logger = setup_logger()
@@ -8,17 +14,28 @@ logger = setup_logger()
 class LayoutOptimizer:
     """Reinforcement learning-based layout optimizer."""
     
-    def __init__(self, state_size: int = 10, action_size: int = 8):
+    def __init__(self, state_size: int = 10, action_size: int = 8,
+                 use_target_network: bool = False, target_update_freq: int = 10,
+                 memory_size: int = 10000, prioritized_replay: bool = False):
         self.state_size = state_size
         self.action_size = action_size
-        self.memory = []
+        self.memory = ReplayBuffer(memory_size, state_size, prioritized=prioritized_replay)
         self.gamma = 0.95  # Discount factor
         self.epsilon = 1.0  # Exploration rate
         self.epsilon_min = 0.01
         self.epsilon_decay = 0.995
+        self.encoder = PreferenceEncoder("optimizer")
         self.model = self._build_model()
         self.logger = setup_logger()
         
+        # Optional frozen copy of the Q-network used for bootstrap targets
+        self.target_update_freq = target_update_freq
+        self.train_steps = 0
+        self.target_model = None
+        if use_target_network:
+            self.target_model = self._build_model()
+            self.update_target_network()
+        
     def _build_model(self) -> tf.keras.Model:
         """Build the deep Q-learning network."""
         model = tf.keras.Sequential([
@@ -33,30 +50,33 @@ class LayoutOptimizer:
                        iterations: int = 100) -> Dict:
         """Optimize layout using reinforcement learning."""
         try:
-            current_layout = initial_layout.copy()
-            current_state = self._get_state(current_layout, preferences)
+            # Work on a compact copy; the caller's dict is never mutated
+            current_layout = Layout.coerce(initial_layout, copy=True)
+            # Preferences are fixed for the run; encode them once
+            preference_features = self.encoder.encode([preferences])
+            current_state = self._get_state(current_layout, preferences, preference_features)
             
             for i in range(iterations):
                 # Choose action
                 if np.random.rand() <= self.epsilon:
                     action = np.random.randint(self.action_size)
                 else:
-                    action = np.argmax(self.model.predict(
-                        current_state.reshape(1, -1), verbose=0
+                    action = np.argmax(self.model.predict_on_batch(
+                        current_state.reshape(1, -1)
                     )[0])
                 
                 # Apply action and get new state
                 new_layout = self._apply_action(current_layout, action)
-                new_state = self._get_state(new_layout, preferences)
+                new_state = self._get_state(new_layout, preferences, preference_features)
                 
                 # Calculate reward
                 reward = self._calculate_reward(new_layout, preferences)
                 
                 # Store experience
-                self.memory.append((
-                    current_state, action, reward, 
+                self.memory.append(
+                    current_state, action, reward,
                     new_state, i == iterations-1
-                ))
+                )
                 
                 # Update current state and layout
                 current_state = new_state
@@ -70,134 +90,116 @@ class LayoutOptimizer:
                     self.epsilon *= self.epsilon_decay
             
             logger.info("Layout optimization completed")
-            return current_layout
+            return current_layout.to_dict()
             
         except Exception as e:
             logger.error(f"Error optimizing layout: {str(e)}")
             raise
     
-    def _get_state(self, layout: Dict, preferences: Dict) -> np.ndarray:
-        """Convert layout and preferences to state vector."""
-        state = []
-        
-        # Layout parameters
-        state.extend([
-            *layout['desk']['position'],
-            *layout['storage']['position'],
-            layout['desk']['orientation'] / 360,
-            layout['spacing']['clearance'] / 200,
-            layout['spacing']['walkways'] / 200
-        ])
-        
-        # Preference parameters
-        state.extend([
-            preferences['dimensions']['width'] / 1000,
-            preferences['dimensions']['length'] / 1000,
-            {"Low": 0, "Medium": 0.5, "High": 1}[preferences['noise_tolerance']]
-        ])
+    def optimize_layouts(self, initial_layouts: List[Dict], preferences_list: List[Dict],
+                         iterations: int = 100) -> List[Dict]:
+        """Optimize many layouts at once in a vectorized environment.
         
-        return np.array(state)
+        Every step applies one action per layout as array operations and
+        queries the Q-network once for all layouts.
+        """
+        try:
+            env = VectorizedLayoutEnv(initial_layouts, preferences_list, self.encoder)
+            states = env.states()
+            
+            for i in range(iterations):
+                # Choose actions, exploring independently per layout
+                actions = np.random.randint(self.action_size, size=len(env))
+                explore = np.random.rand(len(env)) <= self.epsilon
+                if not explore.all():
+                    q_values = self.model.predict_on_batch(states)
+                    actions = np.where(explore, actions, np.argmax(q_values, axis=1))
+                
+                # Apply actions and get new states and rewards
+                next_states, rewards = env.step(actions)
+                
+                # Store experiences
+                self.memory.extend(
+                    states, actions, rewards,
+                    next_states, np.full(len(env), i == iterations-1)
+                )
+                states = next_states
+                
+                # Train model
+                self._train()
+                
+                # Update exploration rate
+                if self.epsilon > self.epsilon_min:
+                    self.epsilon *= self.epsilon_decay
+            
+            logger.info(f"Optimized {len(env)} layouts")
+            return [layout.to_dict() for layout in env.to_layouts()]
+            
+        except Exception as e:
+            logger.error(f"Error optimizing layouts: {str(e)}")
+            raise
     
-    def _apply_action(self, layout: Dict, action: int) -> Dict:
-        """Apply selected action to modify layout."""
-        new_layout = layout.copy()
+    def _get_state(self, layout: Union[Dict, Layout], preferences: Dict,
+                   preference_features: Optional[np.ndarray] = None) -> np.ndarray:
+        """Convert layout and preferences to state vector.
         
-        # Define possible actions
-        actions = {
-            0: lambda: self._move_desk(new_layout, dx=50),
-            1: lambda: self._move_desk(new_layout, dx=-50),
-            2: lambda: self._move_desk(new_layout, dy=50),
-            3: lambda: self._move_desk(new_layout, dy=-50),
-            4: lambda: self._rotate_desk(new_layout, angle=45),
-            5: lambda: self._move_storage(new_layout, dx=50),
-            6: lambda: self._move_storage(new_layout, dy=50),
-            7: lambda: self._adjust_spacing(new_layout, factor=1.1)
-        }
+        ``preference_features`` is the already encoded (1, n) preference row,
+        if the caller has it.
+        """
+        layout = Layout.coerce(layout)
+        if preference_features is None:
+            preference_features = self.encoder.encode([preferences])
+        return layout_states(layout.values[None, :SCALAR_COUNT], preference_features)[0]
+    
+    def _apply_action(self, layout: Layout, action: int) -> Layout:
+        """Return a copy of the layout with the selected action applied.
         
-        # Apply selected action
-        actions[action]()
+        The input layout is left untouched.
+        """
+        new_layout = layout.copy()
+        new_layout.values[:SCALAR_COUNT] = apply_actions(
+            layout.values[None, :SCALAR_COUNT], np.array([action])
+        )[0]
         return new_layout
     
-    def _calculate_reward(self, layout: Dict, preferences: Dict) -> float:
+    def _calculate_reward(self, layout: Union[Dict, Layout], preferences: Dict) -> float:
         """Calculate reward based on layout quality."""
-        reward = 0
-        
-        # Distance between desk and storage
-        desk_pos = np.array(layout['desk']['position'])
-        storage_pos = np.array(layout['storage']['position'])
-        distance = np.linalg.norm(desk_pos - storage_pos)
-        
-        # Penalize if too close or too far
-        optimal_distance = 200
-        reward -= abs(distance - optimal_distance) / 100
-        
-        # Reward for good spacing
-        if layout['spacing']['clearance'] >= 100:
-            reward += 10
-        
-        # Penalize if too close to walls
-        room_width = preferences['dimensions']['width']
-        room_length = preferences['dimensions']['length']
-        
-        min_wall_distance = 50
-        if (min(desk_pos) < min_wall_distance or 
-            desk_pos[0] > room_width - min_wall_distance or 
-            desk_pos[1] > room_length - min_wall_distance):
-            reward -= 20
-        
-        return reward
+        layout = Layout.coerce(layout)
+        return float(layout_rewards(
+            layout.values[None, :SCALAR_COUNT],
+            room_dimensions([preferences])
+        )[0])
     
     def _train(self, batch_size: int = 32) -> None:
-        """Train the model on stored experiences."""
+        """Train the model on a batch of stored experiences.
+        
+        Q-values for the whole batch come from one call per network and the
+        Bellman targets are computed with array operations.
+        """
         if len(self.memory) < batch_size:
             return
             
         # Sample batch from memory
-        batch = np.random.choice(len(self.memory), batch_size, replace=False)
-        states = []
-        targets = []
+        (states, actions, rewards, next_states,
+         dones, indices, weights) = self.memory.sample(batch_size)
         
-        for i in batch:
-            state, action, reward, next_state, done = self.memory[i]
-            target = reward
-            
-            if not done:
-                target += self.gamma * np.amax(
-                    self.model.predict(next_state.reshape(1, -1), verbose=0)[0]
-                )
-            
-            target_f = self.model.predict(state.reshape(1, -1), verbose=0)
-            target_f[0][action] = target
-            
-            states.append(state)
-            targets.append(target_f[0])
+        # Bootstrap from the target network when enabled
+        bootstrap_model = self.target_model if self.target_model is not None else self.model
+        next_q = bootstrap_model.predict_on_batch(next_states)
+        targets = self.model.predict_on_batch(states)
         
-        self.model.fit(
-            np.array(states), np.array(targets), 
-            epochs=1, verbose=0
-        )
-    
-    def _move_desk(self, layout: Dict, dx: float = 0, dy: float = 0) -> None:
-        """Move desk position."""
-        layout['desk']['position'] = (
-            layout['desk']['position'][0] + dx,
-            layout['desk']['position'][1] + dy
-        )
-    
-    def _rotate_desk(self, layout: Dict, angle: float) -> None:
-        """Rotate desk orientation."""
-        layout['desk']['orientation'] = (
-            layout['desk']['orientation'] + angle
-        ) % 360
-    
-    def _move_storage(self, layout: Dict, dx: float = 0, dy: float = 0) -> None:
-        """Move storage position."""
-        layout['storage']['position'] = (
-            layout['storage']['position'][0] + dx,
-            layout['storage']['position'][1] + dy
-        )
+        rows = np.arange(batch_size)
+        td_targets = rewards + self.gamma * np.amax(next_q, axis=1) * ~dones
+        td_errors = td_targets - targets[rows, actions]
+        targets[rows, actions] = td_targets
+        
+        self.model.train_on_batch(states, targets, sample_weight=weights)
+        self.memory.update_priorities(indices, td_errors)
+        
+        self.train_steps += 1
+        if self.target_model is not None and self.train_steps % self.target_update_freq == 0:
+            self.update_target_network()
     
-    def _adjust_spacing(self, layout: Dict, factor: float) -> None:
-        """Adjust spacing parameters."""
-        layout['spacing']['clearance'] *= factor
-        layout['spacing']['walkways'] *= factor
+    def update_target_network(self) -> None:
+        """Copy the online Q-network weights into the target network."""
+        self.target_model.set_weights(self.model.get_weights())
@@ -0,0 +1,128 @@
+import numpy as np
+from typing import Tuple
+
+class ReplayBuffer:
+    """Fixed-capacity experience replay memory backed by preallocated arrays.
+    
+    Transitions are written into a ring of contiguous NumPy arrays, so
+    insertion is O(1), sampling is a vectorized gather and memory use is
+    fixed at construction. With ``prioritized=True`` transitions are sampled
+    proportionally to ``priority ** alpha`` and importance-sampling weights
+    are returned alongside the batch.
+    """
+    
+    def __init__(self, capacity: int, state_size: int, prioritized: bool = False,
+                 alpha: float = 0.6, beta: float = 0.4):
+        if capacity <= 0:
+            raise ValueError(f"Invalid replay capacity: {capacity}")
+        
+        self.capacity = capacity
+        self.state_size = state_size
+        self.prioritized = prioritized
+        self.alpha = alpha
+        self.beta = beta
+        
+        self.states = np.zeros((capacity, state_size), dtype=np.float32)
+        self.actions = np.zeros(capacity, dtype=np.int64)
+        self.rewards = np.zeros(capacity, dtype=np.float32)
+        self.next_states = np.zeros((capacity, state_size), dtype=np.float32)
+        self.dones = np.zeros(capacity, dtype=bool)
+        self.priorities = np.zeros(capacity, dtype=np.float64) if prioritized else None
+        self.max_priority = 1.0
+        
+        self.position = 0
+        self.size = 0
+    
+    def __len__(self) -> int:
+        return self.size
+    
+    @property
+    def nbytes(self) -> int:
+        """Total bytes held by the preallocated arrays."""
+        arrays = [self.states, self.actions, self.rewards, self.next_states, self.dones]
+        if self.prioritized:
+            arrays.append(self.priorities)
+        return sum(array.nbytes for array in arrays)
+    
+    def append(self, state: np.ndarray, action: int, reward: float,
+               next_state: np.ndarray, done: bool) -> None:
+        """Store one transition, overwriting the oldest once full."""
+        index = self.position
+        self.states[index] = state
+        self.actions[index] = action
+        self.rewards[index] = reward
+        self.next_states[index] = next_state
+        self.dones[index] = done
+        if self.prioritized:
+            # New transitions get the highest priority seen so far
+            self.priorities[index] = self.max_priority
+        
+        self.position = (index + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+    
+    def extend(self, states: np.ndarray, actions: np.ndarray, rewards: np.ndarray,
+               next_states: np.ndarray, dones: np.ndarray) -> None:
+        """Store a batch of transitions with one write per array."""
+        count = len(actions)
+        if count > self.capacity:
+            # Only the newest transitions would survive anyway
+            keep = slice(-self.capacity, None)
+            states, actions, rewards = states[keep], actions[keep], rewards[keep]
+            next_states, dones = next_states[keep], dones[keep]
+            count = self.capacity
+        
+        indices = (self.position + np.arange(count)) % self.capacity
+        self.states[indices] = states
+        self.actions[indices] = actions
+        self.rewards[indices] = rewards
+        self.next_states[indices] = next_states
+        self.dones[indices] = dones
+        if self.prioritized:
+            self.priorities[indices] = self.max_priority
+        
+        self.position = (self.position + count) % self.capacity
+        self.size = min(self.size + count, self.capacity)
+    
+    def sample(self, batch_size: int) -> Tuple[np.ndarray, ...]:
+        """Sample a batch of transitions.
+        
+        Returns (states, actions, rewards, next_states, dones, indices, weights);
+        weights are all ones unless prioritized sampling is enabled.
+        """
+        if self.size == 0:
+            raise ValueError("Cannot sample from an empty replay buffer")
+        
+        if self.prioritized:
+            scaled = self.priorities[:self.size] ** self.alpha
+            probabilities = scaled / scaled.sum()
+            indices = np.random.choice(self.size, batch_size, p=probabilities)
+            weights = (self.size * probabilities[indices]) ** -self.beta
+            weights = (weights / weights.max()).astype(np.float32)
+        else:
+            indices = np.random.randint(0, self.size, batch_size)
+            weights = np.ones(batch_size, dtype=np.float32)
+        
+        return (
+            self.states[indices],
+            self.actions[indices],
+            self.rewards[indices],
+            self.next_states[indices],
+            self.dones[indices],
+            indices,
+            weights
+        )
+    
+    def update_priorities(self, indices: np.ndarray, td_errors: np.ndarray,
+                          epsilon: float = 1e-6) -> None:
+        """Set priorities of sampled transitions from their TD errors."""
+        if not self.prioritized:
+            return
+        priorities = np.abs(td_errors) + epsilon
+        self.priorities[indices] = priorities
+        self.max_priority = max(self.max_priority, float(priorities.max()))
+    
+    def clear(self) -> None:
+        """Forget all stored transitions without releasing the arrays."""
+        self.position = 0
+        self.size = 0
+        self.max_priority = 1.0
@@ -0,0 +1,172 @@
+from typing import Callable, Dict, Optional, Tuple
+
+# Declarative description of a training item. Each category lists its
+# required fields and per-field rules keyed by dotted path:
+#   positive_number - int/float above zero, normalized to float
+#   choices         - one of the listed values
+#   numbers         - sequence of ints/floats
+#   number_lists    - sequence of such sequences
+TRAINING_SCHEMA = {
+    "preferences": {
+        "required": ["dimensions", "work_style", "noise_tolerance", "equipment"],
+        "fields": {
+            "dimensions.width": {"type": "positive_number"},
+            "dimensions.length": {"type": "positive_number"},
+            "work_style": {
+                "choices": ["Individual Focus", "Collaborative", "Hybrid", "Creative Studio"]
+            },
+            "noise_tolerance": {"choices": ["Low", "Medium", "High"]}
+        }
+    },
+    "layout": {
+        "required": ["desk", "storage", "equipment_zones", "spacing"],
+        "fields": {
+            "desk.position": {"type": "numbers"},
+            "desk.dimensions": {"type": "numbers"},
+            "storage.position": {"type": "numbers"},
+            "storage.dimensions": {"type": "numbers"},
+            "equipment_zones.monitor_positions": {"type": "number_lists"}
+        }
+    }
+}
+
+class SchemaError(ValueError):
+    """Validation failure for one field; ``field`` is its dotted path."""
+    
+    def __init__(self, field: str, message: str):
+        super().__init__(message)
+        self.field = field
+
+NUMBER_TYPES = (int, float)
+
+def _positive_number(message: str, rule: Dict) -> Callable:
+    def check(value):
+        if not isinstance(value, NUMBER_TYPES) or value <= 0:
+            raise ValueError(message + ": " + str(value))
+    return check
+
+def _choices(message: str, rule: Dict) -> Callable:
+    choices = frozenset(rule["choices"])
+    def check(value):
+        if value not in choices:
+            raise ValueError(message + ": " + str(value))
+    return check
+
+def _numbers(message: str, rule: Dict) -> Callable:
+    def check(value):
+        for number in value:
+            if not isinstance(number, NUMBER_TYPES):
+                raise ValueError(message)
+    return check
+
+def _number_lists(message: str, rule: Dict) -> Callable:
+    def check(value):
+        for numbers in value:
+            for number in numbers:
+                if not isinstance(number, NUMBER_TYPES):
+                    raise ValueError(message)
+    return check
+
+# Checker factories per rule, called with the error message and rule;
+# each checker raises ValueError for an invalid value
+RULE_CHECKERS = {
+    "positive_number": _positive_number,
+    "choices": _choices,
+    "numbers": _numbers,
+    "number_lists": _number_lists
+}
+
+def _compile_category(category: str, spec: Dict) -> Callable:
+    """Build the validation function for one category.
+    
+    Key paths, messages and choice sets are resolved here, once, into a
+    list of checker closures. The returned function checks required fields
+    and every rule in order, raising SchemaError for the first failing
+    field, and returns the section with positive numbers normalized to
+    float (copying only the dicts on the path to a changed value).
+    """
+    required = [(field, f"{category}.{field}") for field in spec.get("required", [])]
+    
+    checks = []
+    # Normalization steps: (parent key path, key, dict or float) applied to
+    # a copy of the section, so each dict on a normalized path is copied once
+    normalize = []
+    copied = set()
+    for path, rule in spec.get("fields", {}).items():
+        keys = tuple(path.split('.'))
+        kind = "choices" if "choices" in rule else rule["type"]
+        if kind not in RULE_CHECKERS:
+            raise ValueError(f"Unknown schema rule: {kind}")
+        
+        message = f"Invalid {keys[-1].replace('_', ' ')}"
+        if kind == "positive_number":
+            for depth in range(1, len(keys)):
+                if keys[:depth] not in copied:
+                    normalize.append((keys[:depth - 1], keys[depth - 1], dict))
+                    copied.add(keys[:depth])
+            normalize.append((keys[:-1], keys[-1], float))
+        checks.append((f"{category}.{path}", keys[0], keys[1:], RULE_CHECKERS[kind](message, rule)))
+    
+    def validate(section):
+        if not isinstance(section, dict):
+            raise SchemaError(category, f"Invalid category: {category}")
+        for field, dotted in required:
+            if field not in section:
+                raise SchemaError(dotted, f"Missing field: {field} in {category}")
+        
+        field = None
+        try:
+            for field, first, rest, check in checks:
+                value = section[first]
+                for key in rest:
+                    value = value[key]
+                check(value)
+        except (KeyError, IndexError, TypeError, ValueError) as e:
+            raise SchemaError(field, str(e)) from e
+        
+        if normalize:
+            section = dict(section)
+            for parent_keys, key, convert in normalize:
+                parent = section
+                for parent_key in parent_keys:
+                    parent = parent[parent_key]
+                parent[key] = convert(parent[key])
+        return section
+    
+    return validate
+
+class TrainingDataValidator:
+    """Validator compiled once from a declarative schema.
+    
+    Each category is turned into one function over prebuilt checker
+    closures, so choice sets, key paths and messages are resolved once
+    instead of per item. Inputs are never mutated; only dicts holding
+    normalized values are copied.
+    """
+    
+    def __init__(self, schema: Optional[Dict] = None):
+        self.schema = schema or TRAINING_SCHEMA
+        self.categories = {
+            category: _compile_category(category, spec)
+            for category, spec in self.schema.items()
+        }
+    
+    def validate_section(self, category: str, section: Dict) -> Dict:
+        """Validate and normalize one category of an item; raise SchemaError."""
+        return self.categories[category](section)
+    
+    def validate(self, item) -> Tuple[Optional[Dict], Optional[str]]:
+        """Return (processed item, None), or (None, path of the failing field)."""
+        if not isinstance(item, dict):
+            return None, "item"
+        
+        processed = {}
+        try:
+            for category, validate_category in self.categories.items():
+                if category not in item:
+                    raise SchemaError(category, f"Missing category: {category}")
+                processed[category] = validate_category(item[category])
+        except SchemaError as e:
+            return None, e.field
+        
+        return processed, None
@@ -0,0 +1,421 @@
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from typing import Dict, List
+from data.traffic_heatmap import TrafficHeatmap
+
+GRID_SIZE = 50  # cm
+PATH_WINDOW = np.timedelta64(5, 's')
+
+# Paths are keyed on one integer packing the four snapped endpoint grid
+# indices, PATH_FIELD_BITS bits each, so grouping and accumulating never
+# build tuples. Indices must lie within +/- PATH_FIELD_OFFSET of the origin
+# (about 16 km on the default grid).
+PATH_FIELD_BITS = 16
+PATH_FIELD_OFFSET = 1 << (PATH_FIELD_BITS - 1)
+PATH_FIELD_MASK = (1 << PATH_FIELD_BITS) - 1
+
+# Compact column types used when streaming CSVs in chunks. float32 holds
+# centimetre positions with two decimals exactly enough for every grid and
+# rounding decision to match float64. Columns missing from a file are ignored.
+MOVEMENT_DTYPES = {
+    "x_position": "float32",
+    "y_position": "float32",
+    "activity_type": "category",
+    "user_id": "category"
+}
+BREAK_DTYPES = {
+    "break_type": "category",
+    "location": "category",
+    "user_id": "category"
+}
+
+def grid_indices(values: np.ndarray, threshold: int = GRID_SIZE) -> np.ndarray:
+    """Index of the nearest grid point (half to even, like round())."""
+    missing = np.isnan(values)
+    if missing.any():
+        raise ValueError(f"Cannot snap {int(missing.sum())} missing positions to the grid")
+    return np.round(values / threshold).astype(np.int64)
+
+def snap_to_grid(values: np.ndarray, threshold: int = GRID_SIZE) -> np.ndarray:
+    """Round positions to the nearest grid point (half to even, like round())."""
+    return grid_indices(values, threshold) * threshold
+
+def _pack_path_keys(*fields: np.ndarray) -> np.ndarray:
+    """Pack start_x, start_y, end_x and end_y grid indices into one key each."""
+    keys = np.zeros(len(fields[0]), dtype=np.uint64)
+    for field in fields:
+        shifted = field + PATH_FIELD_OFFSET
+        if len(shifted) and (shifted.min() < 0 or shifted.max() > PATH_FIELD_MASK):
+            raise ValueError("Path endpoints are too far from the origin to pack")
+        keys = (keys << np.uint64(PATH_FIELD_BITS)) | shifted.astype(np.uint64)
+    return keys
+
+def _unpack_grid_points(keys: np.ndarray, grid_size: int) -> List[tuple]:
+    """(x, y) grid points of keys packing an x and a y grid index each."""
+    x, y = (
+        ((keys >> np.uint64(shift)) & np.uint64(PATH_FIELD_MASK)).astype(np.int64)
+        - PATH_FIELD_OFFSET
+        for shift in (PATH_FIELD_BITS, 0)
+    )
+    return list(zip((x * grid_size).tolist(), (y * grid_size).tolist()))
+
+def _positions(movements: pd.DataFrame) -> tuple:
+    return (
+        movements['x_position'].to_numpy(dtype=np.float64),
+        movements['y_position'].to_numpy(dtype=np.float64)
+    )
+
+class MovementAggregator:
+    """Incremental movement statistics over one or more data chunks.
+    
+    Chunks must arrive in timestamp order; consecutive rows are paired
+    across chunk boundaries, so feeding a file chunk by chunk produces the
+    same paths and zones as feeding the whole sorted frame at once.
+    
+    Every statistic is a per-key accumulator (cell counts, path counts,
+    seen (cell, user) pairs), so a chunk costs O(chunk) whatever has been
+    accumulated before (amortized, for path counts).
+    """
+    
+    def __init__(self, grid_size: int = GRID_SIZE, sparse_traffic: bool = False):
+        self.grid_size = grid_size
+        self.rows = 0
+        self.traffic = TrafficHeatmap(grid_size, sparse=sparse_traffic)
+        self.stationary = TrafficHeatmap(grid_size, sparse=True)
+        # (grid_x, grid_y, user_id) triples seen, and distinct users per cell
+        self.user_cells = set()
+        self.cell_users = {}
+        # Packed path keys (see _pack_path_keys) and their frequencies, as
+        # chunks of arrays; combined lazily, in first-seen order
+        self.path_chunks = []
+        self._pending_path_rows = 0
+        self._last_movement = None
+    
+    def update(self, movements: pd.DataFrame) -> None:
+        """Fold a timestamp-ordered chunk of movement rows into every statistic."""
+        self.update_traffic(movements)
+        self.update_paths(movements)
+        self.update_static_zones(movements)
+        self.update_interactions(movements)
+    
+    def _cells(self, movements: pd.DataFrame) -> pd.DataFrame:
+        """Grid cell of each movement sample."""
+        x, y = _positions(movements)
+        return pd.DataFrame({'grid_x': x // self.grid_size, 'grid_y': y // self.grid_size})
+    
+    def update_traffic(self, movements: pd.DataFrame) -> None:
+        """Count movement samples per grid cell."""
+        self.rows += len(movements)
+        self.traffic.update(*_positions(movements))
+    
+    def update_static_zones(self, movements: pd.DataFrame) -> None:
+        """Count stationary samples per grid cell."""
+        if 'activity_type' not in movements:
+            return
+        stationary = movements[(movements['activity_type'] == 'stationary').to_numpy()]
+        self.stationary.update(*_positions(stationary))
+    
+    def update_interactions(self, movements: pd.DataFrame) -> None:
+        """Track which users were seen in each grid cell."""
+        if 'user_id' not in movements:
+            return
+        user_cells = self._cells(movements).assign(
+            user_id=movements['user_id'].to_numpy(dtype=object)
+        ).dropna(subset=['grid_x', 'grid_y']).drop_duplicates()
+        self._add_user_cells(zip(
+            user_cells['grid_x'].tolist(), user_cells['grid_y'].tolist(),
+            user_cells['user_id'].tolist()
+        ))
+    
+    def _add_user_cells(self, user_cells) -> None:
+        for user_cell in user_cells:
+            if user_cell not in self.user_cells:
+                self.user_cells.add(user_cell)
+                cell = user_cell[:2]
+                self.cell_users[cell] = self.cell_users.get(cell, 0) + 1
+    
+    def update_paths(self, movements: pd.DataFrame) -> None:
+        """Count grid-snapped paths between movements within PATH_WINDOW."""
+        timestamps = movements['timestamp'].to_numpy()
+        x, y = _positions(movements)
+        if self._last_movement is not None and len(movements):
+            # Pair the previous chunk's final row with this chunk's first
+            last_timestamp, last_x, last_y = self._last_movement
+            timestamps = np.concatenate([[last_timestamp], timestamps])
+            x = np.concatenate([[last_x], x])
+            y = np.concatenate([[last_y], y])
+        if len(timestamps):
+            self._last_movement = (timestamps[-1], x[-1], y[-1])
+        
+        elapsed = timestamps[1:] - timestamps[:-1]
+        if (elapsed < np.timedelta64(0)).any():
+            raise ValueError("Movement chunks must be in timestamp order")
+        sequential = elapsed <= PATH_WINDOW
+        
+        # Combine similar paths: snap both endpoints to the grid and count
+        keys = _pack_path_keys(
+            grid_indices(x[:-1][sequential], self.grid_size),
+            grid_indices(y[:-1][sequential], self.grid_size),
+            grid_indices(x[1:][sequential], self.grid_size),
+            grid_indices(y[1:][sequential], self.grid_size)
+        )
+        counts = pd.Series(keys).value_counts(sort=False)
+        self._add_paths([(counts.index.to_numpy(), counts.to_numpy())])
+    
+    def _add_paths(self, chunks) -> None:
+        for chunk in chunks:
+            self.path_chunks.append(chunk)
+            self._pending_path_rows += len(chunk[0])
+        # Recombine once the pending chunks outgrow the combined paths, so
+        # memory stays bounded and each row is regrouped O(1) times on average
+        combined_rows = len(self.path_chunks[0][0]) if self.path_chunks else 0
+        if self._pending_path_rows > max(combined_rows, 1 << 20):
+            self._combine_paths()
+    
+    def _combine_paths(self) -> tuple:
+        """Merge the path chunks into one (keys, counts) pair and return it."""
+        if not self.path_chunks:
+            return np.empty(0, dtype=np.uint64), np.empty(0, dtype=np.int64)
+        if len(self.path_chunks) > 1:
+            # Grouping without sorting keeps keys in first-seen order
+            counts = pd.Series(
+                np.concatenate([counts for _, counts in self.path_chunks])
+            ).groupby(
+                np.concatenate([keys for keys, _ in self.path_chunks]), sort=False
+            ).sum()
+            self.path_chunks = [(counts.index.to_numpy(), counts.to_numpy())]
+        self._pending_path_rows = 0
+        return self.path_chunks[0]
+    
+    def merge(self, other: "MovementAggregator") -> None:
+        """Fold in the aggregates of data that follows this aggregator's data.
+        
+        Used to combine per-partition results; paths are not joined across
+        the partition boundary.
+        """
+        self.rows += other.rows
+        self.traffic.merge(other.traffic)
+        self.stationary.merge(other.stationary)
+        self._add_user_cells(other.user_cells)
+        self._add_paths(other.path_chunks)
+        if other._last_movement is not None:
+            self._last_movement = other._last_movement
+    
+    def high_traffic_zones(self) -> List[Dict]:
+        """Grid cells in the top 20% by traffic count."""
+        return self.traffic.high_traffic_zones(0.8)
+    
+    def common_paths(self) -> List[Dict]:
+        """Grid-snapped paths with their frequencies, in first-seen order."""
+        keys, counts = self._combine_paths()
+        
+        # Endpoints repeat across paths, so build one tuple per distinct
+        # grid point and share it between the paths that touch it
+        point_bits = np.uint64(2 * PATH_FIELD_BITS)
+        codes, points = pd.factorize(np.concatenate([
+            keys >> point_bits, keys & ((np.uint64(1) << point_bits) - np.uint64(1))
+        ]))
+        points = _unpack_grid_points(points, self.grid_size)
+        endpoints = list(map(points.__getitem__, codes.tolist()))
+        return [
+            {"start": start, "end": end, "frequency": frequency}
+            for start, end, frequency in zip(
+                endpoints[:len(keys)], endpoints[len(keys):], counts.tolist()
+            )
+        ]
+    
+    def static_zones(self) -> List[Dict]:
+        """Grid cells where users were stationary, with their stationary sample counts."""
+        return self._zones(*self.stationary.cells(), "sample_count")
+    
+    def interaction_zones(self) -> List[Dict]:
+        """Grid cells visited by two or more distinct users."""
+        cells = sorted(cell for cell, users in self.cell_users.items() if users >= 2)
+        counts = [self.cell_users[cell] for cell in cells]
+        return self._zones(np.array(cells).reshape(-1, 2), counts, "user_count")
+    
+    def _zones(self, cells: np.ndarray, counts, count_name: str) -> List[Dict]:
+        positions = np.asarray(cells, dtype=np.float64) * self.grid_size
+        return [
+            {"position": (x, y), count_name: count}
+            for (x, y), count in zip(positions.tolist(), np.asarray(counts).tolist())
+        ]
+    
+    def analysis(self) -> Dict:
+        """Movement analysis in the shape of analyze_movement_patterns()."""
+        return {
+            "high_traffic_zones": self.high_traffic_zones(),
+            "common_paths": self.common_paths(),
+            "static_zones": self.static_zones(),
+            "interaction_zones": self.interaction_zones()
+        }
+
+MINUTES_PER_DAY = 24 * 60
+NS_PER_MINUTE = 60 * 10 ** 9
+
+class BreakAggregator:
+    """Incremental break statistics over one or more data chunks.
+    
+    Every statistic is computed with vectorized interval arithmetic on the
+    start_time/end_time columns and kept as integer totals, so results do
+    not depend on how the data is chunked or partitioned.
+    """
+    
+    def __init__(self, grid_size: int = GRID_SIZE):
+        self.grid_size = grid_size
+        self.count = 0
+        self.duration_count = 0
+        self.total_duration_ns = 0
+        self.days = set()
+        # Break-minutes falling in each minute of the day, over all days
+        self.minute_occupancy = np.zeros(MINUTES_PER_DAY, dtype=np.int64)
+        # Breaks starting in each hour of the day, over all days
+        self.hourly_starts = np.zeros(24, dtype=np.int64)
+        self.location_counts = {}
+    
+    def update(self, breaks: pd.DataFrame) -> None:
+        """Fold a chunk of break rows into the running statistics."""
+        self.update_durations(breaks)
+        self.update_frequency(breaks)
+        self.update_peak_times(breaks)
+        self.update_locations(breaks)
+    
+    @staticmethod
+    def _intervals(breaks: pd.DataFrame) -> tuple:
+        """Start and end as int64 nanoseconds for breaks with both times set."""
+        start = breaks['start_time'].to_numpy(dtype='datetime64[ns]')
+        end = breaks['end_time'].to_numpy(dtype='datetime64[ns]')
+        complete = ~(np.isnat(start) | np.isnat(end))
+        return start[complete].astype(np.int64), end[complete].astype(np.int64)
+    
+    def update_durations(self, breaks: pd.DataFrame) -> None:
+        """Sum break durations via datetime64 subtraction."""
+        start, end = self._intervals(breaks)
+        self.duration_count += len(start)
+        self.total_duration_ns += int((end - start).sum(dtype=np.int64))
+    
+    def update_frequency(self, breaks: pd.DataFrame) -> None:
+        """Count breaks and the calendar days they start on."""
+        start = breaks['start_time'].to_numpy(dtype='datetime64[ns]')
+        start = start[~np.isnat(start)]
+        self.count += len(start)
+        self.days.update(np.unique(start.astype('datetime64[D]')).tolist())
+    
+    def update_peak_times(self, breaks: pd.DataFrame) -> None:
+        """Histogram break occupancy onto the minute-of-day grid.
+        
+        A break occupies each minute slot from the one it starts in up to,
+        but not including, the one it ends in. Each interval adds +1/-1
+        markers to a difference array (splitting intervals that wrap past
+        midnight), and one cumulative sum gives the coverage.
+        """
+        start, end = self._intervals(breaks)
+        start_minute = start // NS_PER_MINUTE
+        span = np.maximum(end // NS_PER_MINUTE - start_minute, 0)
+        self.hourly_starts += np.bincount(start_minute % MINUTES_PER_DAY // 60, minlength=24)
+        
+        full_days, remainder = np.divmod(span, MINUTES_PER_DAY)
+        self.minute_occupancy += int(full_days.sum())
+        
+        begin = start_minute % MINUTES_PER_DAY
+        finish = begin + remainder
+        wraps = finish > MINUTES_PER_DAY
+        size = MINUTES_PER_DAY + 1
+        markers = (
+            np.bincount(begin, minlength=size)
+            - np.bincount(np.where(wraps, MINUTES_PER_DAY, finish), minlength=size)
+            + np.bincount(np.zeros(wraps.sum(), dtype=np.int64), minlength=size)
+            - np.bincount(finish[wraps] - MINUTES_PER_DAY, minlength=size)
+        )
+        self.minute_occupancy += np.cumsum(markers)[:MINUTES_PER_DAY]
+    
+    def update_locations(self, breaks: pd.DataFrame) -> None:
+        """Count breaks per location.
+        
+        Breaks with positions are binned onto the movement grid and keyed
+        by the cell position in cm as "x,y"; otherwise the named 'location'
+        column is used. Keys are always strings, so chunks or partitions
+        of either kind can be combined.
+        """
+        if 'x_position' in breaks and 'y_position' in breaks:
+            heatmap = TrafficHeatmap(self.grid_size, sparse=True)
+            heatmap.update(breaks['x_position'], breaks['y_position'])
+            cells, counts = heatmap.cells()
+            keys = (f"{x},{y}" for x, y in (cells * self.grid_size).tolist())
+            items = zip(keys, counts.tolist())
+        elif 'location' in breaks:
+            items = breaks['location'].value_counts(sort=False).items()
+        else:
+            return
+        
+        for location, count in items:
+            if count:
+                location = str(location)
+                self.location_counts[location] = self.location_counts.get(location, 0) + int(count)
+    
+    def merge(self, other: "BreakAggregator") -> None:
+        """Fold in another aggregator's statistics (e.g. from another partition)."""
+        self.count += other.count
+        self.duration_count += other.duration_count
+        self.total_duration_ns += other.total_duration_ns
+        self.days.update(other.days)
+        self.minute_occupancy += other.minute_occupancy
+        self.hourly_starts += other.hourly_starts
+        for location, count in other.location_counts.items():
+            self.location_counts[location] = self.location_counts.get(location, 0) + count
+    
+    def average_break_duration(self) -> float:
+        """Mean break length in minutes."""
+        if not self.duration_count:
+            return 0.0
+        return self.total_duration_ns / self.duration_count / NS_PER_MINUTE
+    
+    def break_frequency(self) -> float:
+        """Average number of breaks per day with recorded breaks."""
+        return self.count / len(self.days) if self.days else 0.0
+    
+    def peak_break_times(self, top: int = 3) -> List[Dict]:
+        """Hours of the day with the most break-minutes, busiest first.
+        
+        Each entry also gives ``break_count``, the number of breaks that
+        started in that hour.
+        """
+        hourly = self.minute_occupancy.reshape(24, 60).sum(axis=1)
+        hours = np.argsort(-hourly, kind='stable')[:top]
+        return [
+            {"hour": hour, "break_count": count, "break_minutes": minutes}
+            for hour, count, minutes in zip(
+                hours.tolist(), self.hourly_starts[hours].tolist(), hourly[hours].tolist()
+            )
+            if minutes
+        ]
+    
+    def break_locations(self) -> Dict:
+        """Number of breaks taken at each location, most used first."""
+        return dict(sorted(
+            self.location_counts.items(), key=lambda item: (-item[1], item[0])
+        ))
+    
+    def analysis(self) -> Dict:
+        """Break analysis in the shape of analyze_break_patterns()."""
+        return {
+            "average_break_duration": self.average_break_duration(),
+            "break_frequency": self.break_frequency(),
+            "peak_break_times": self.peak_break_times(),
+            "break_locations": self.break_locations()
+        }
+
+def aggregate_movement_file(path: Path) -> MovementAggregator:
+    """Aggregate one movement partition file (process pool worker)."""
+    movements = pd.read_csv(path, parse_dates=['timestamp'], dtype=MOVEMENT_DTYPES)
+    aggregator = MovementAggregator()
+    aggregator.update(movements.sort_values('timestamp'))
+    return aggregator
+
+def aggregate_break_file(path: Path) -> BreakAggregator:
+    """Aggregate one break partition file (process pool worker)."""
+    breaks = pd.read_csv(path, parse_dates=['start_time', 'end_time'], dtype=BREAK_DTYPES)
+    aggregator = BreakAggregator()
+    aggregator.update(breaks)
+    return aggregator
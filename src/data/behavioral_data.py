@@ -1,32 +1,76 @@
+from concurrent.futures import ProcessPoolExecutor
 from typing import Dict, List, Optional
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 from pathlib import Path
+from data.behavioral_aggregates import (
+    BreakAggregator, MovementAggregator, BREAK_DTYPES, MOVEMENT_DTYPES,
+    aggregate_break_file, aggregate_movement_file
+)
+from data.columnar_cache import ColumnarCache
+from data.frame_schema import optimize_frame
+from data.spatial_index import GridIndex
 from utils.logger import setup_logger
 
 logger = setup_logger()
 
 class BehavioralDataProcessor:
-    """Processes and analyzes user behavioral data for workspace optimization."""
+    """Processes and analyzes user behavioral data for workspace optimization.
     
-    def __init__(self, data_dir: Path):
+    With ``columnar_cache=True`` parsed CSVs are cached as memory-mapped
+    per-column files under ``data_dir/columnar_cache`` and reused by later
+    loads until the source file changes.
+    
+    Loaded frames are downcast with optimize_frame() unless
+    ``optimize_schema=False``; the memory summary of the last load of each
+    dataset is kept in ``memory_reports``.
+    """
+    
+    def __init__(self, data_dir: Path, columnar_cache: bool = False,
+                 optimize_schema: bool = True):
         self.data_dir = data_dir
+        self.optimize_schema = optimize_schema
+        self.memory_reports = {}
         self.logger = setup_logger()
+        self.columnar_cache = (
+            ColumnarCache(Path(data_dir) / "columnar_cache") if columnar_cache else None
+        )
         self.movement_patterns = pd.DataFrame()
         self.break_patterns = pd.DataFrame()
         self.interaction_zones = pd.DataFrame()
+        
+        # Set by streaming loads, which keep aggregates instead of raw rows
+        self.movement_aggregator = None
+        self.break_aggregator = None
     
-    def load_movement_data(self, file_path: Optional[str] = None) -> None:
-        """Load movement tracking data from file."""
+    def load_movement_data(self, file_path: Optional[str] = None,
+                           chunksize: Optional[int] = None) -> None:
+        """Load movement tracking data from file.
+        
+        With ``chunksize`` the file is streamed in chunks of that many rows
+        with compact dtypes and folded into a MovementAggregator, so memory
+        stays bounded; rows must be in timestamp order.
+        """
         try:
             if file_path is None:
                 file_path = self.data_dir / "movement_data.csv"
             
-            self.movement_patterns = pd.read_csv(
-                file_path,
-                parse_dates=['timestamp']
-            )
+            if chunksize is not None:
+                self.movement_patterns = pd.DataFrame()
+                self.movement_aggregator = MovementAggregator()
+                with pd.read_csv(file_path, parse_dates=['timestamp'],
+                                 dtype=MOVEMENT_DTYPES, chunksize=chunksize) as reader:
+                    for chunk in reader:
+                        self.movement_aggregator.update(chunk)
+                
+                logger.info(
+                    f"Streamed movement data: {self.movement_aggregator.rows} records"
+                )
+                return
+            
+            self.movement_patterns = self._read_csv(file_path, ['timestamp'], 'movement')
+            self.movement_aggregator = None
             
             logger.info(f"Loaded movement data: {len(self.movement_patterns)} records")
             
@@ -34,16 +78,32 @@ class BehavioralDataProcessor:
             logger.error(f"Error loading movement data: {str(e)}")
             raise
     
-    def load_break_data(self, file_path: Optional[str] = None) -> None:
-        """Load break pattern data from file."""
+    def load_break_data(self, file_path: Optional[str] = None,
+                        chunksize: Optional[int] = None) -> None:
+        """Load break pattern data from file.
+        
+        With ``chunksize`` the file is streamed into a BreakAggregator
+        instead of being held in memory.
+        """
         try:
             if file_path is None:
                 file_path = self.data_dir / "break_data.csv"
             
-            self.break_patterns = pd.read_csv(
-                file_path,
-                parse_dates=['start_time', 'end_time']
+            if chunksize is not None:
+                self.break_patterns = pd.DataFrame()
+                self.break_aggregator = BreakAggregator()
+                with pd.read_csv(file_path, parse_dates=['start_time', 'end_time'],
+                                 dtype=BREAK_DTYPES, chunksize=chunksize) as reader:
+                    for chunk in reader:
+                        self.break_aggregator.update(chunk)
+                
+                logger.info(f"Streamed break data: {self.break_aggregator.count} records")
+                return
+            
+            self.break_patterns = self._read_csv(
+                file_path, ['start_time', 'end_time'], 'break'
             )
+            self.break_aggregator = None
             
             logger.info(f"Loaded break data: {len(self.break_patterns)} records")
             
@@ -51,20 +111,106 @@ class BehavioralDataProcessor:
             logger.error(f"Error loading break data: {str(e)}")
             raise
     
+    def load_partitions(self, partition_dir: Optional[Path] = None,
+                        max_workers: Optional[int] = None,
+                        movement_pattern: str = "movement_*.csv",
+                        break_pattern: str = "break_*.csv") -> None:
+        """Aggregate per-day/per-floor partition files in a process pool.
+        
+        Each partition is parsed and aggregated in its own worker; the
+        partial aggregates are merged sequentially in file name order, so
+        analyze_* work as after a streaming load. Paths are not joined
+        across partitions.
+        """
+        try:
+            partition_dir = Path(partition_dir or self.data_dir)
+            movement_files = sorted(partition_dir.glob(movement_pattern))
+            break_files = sorted(partition_dir.glob(break_pattern))
+            if not movement_files and not break_files:
+                raise ValueError(f"No partition files found in {partition_dir}")
+            
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                movement_parts = executor.map(aggregate_movement_file, movement_files)
+                break_parts = executor.map(aggregate_break_file, break_files)
+                
+                self.movement_aggregator = self._merge_partitions(
+                    MovementAggregator(), movement_parts
+                ) if movement_files else None
+                self.break_aggregator = self._merge_partitions(
+                    BreakAggregator(), break_parts
+                ) if break_files else None
+            
+            self.movement_patterns = pd.DataFrame()
+            self.break_patterns = pd.DataFrame()
+            
+            logger.info(
+                f"Aggregated {len(movement_files)} movement and "
+                f"{len(break_files)} break partitions"
+            )
+            
+        except Exception as e:
+            logger.error(f"Error loading partitions: {str(e)}")
+            raise
+    
+    @staticmethod
+    def _merge_partitions(total, parts):
+        """Merge partial aggregates into total, in partition order."""
+        for part in parts:
+            total.merge(part)
+        return total
+    
+    def ingest_movement_batch(self, movements: pd.DataFrame) -> None:
+        """Fold a new timestamp-ordered batch of movement rows into the analysis.
+        
+        Intended for live sensor feeds. Every aggregate is a per-key
+        accumulator, so the batch costs O(batch) plus O(distinct traffic
+        counts) for the threshold histogram, independent of how much has
+        been ingested. Rows already held in movement_patterns are folded in
+        first (a one-off O(rows) step) and the frame is released.
+        """
+        try:
+            if self.movement_aggregator is None or not self.movement_patterns.empty:
+                self.movement_aggregator = MovementAggregator()
+                if not self.movement_patterns.empty:
+                    self.movement_aggregator.update(
+                        self.movement_patterns.sort_values('timestamp')
+                    )
+                    self.movement_patterns = pd.DataFrame()
+            
+            self.movement_aggregator.update(movements)
+            
+        except Exception as e:
+            logger.error(f"Error ingesting movement batch: {str(e)}")
+            raise
+    
+    def _read_csv(self, file_path: Path, parse_dates: List[str],
+                  dataset: str) -> pd.DataFrame:
+        """Parse a CSV, going through the columnar cache when enabled.
+        
+        Frames are optimized before caching, so cached columns are compact too.
+        """
+        def parse(path: Path) -> pd.DataFrame:
+            frame = pd.read_csv(path, parse_dates=parse_dates)
+            if self.optimize_schema:
+                frame, self.memory_reports[dataset] = optimize_frame(frame)
+            return frame
+        
+        if self.columnar_cache is None:
+            return parse(file_path)
+        return self.columnar_cache.load_or_convert(Path(file_path), parse)
+    
     def analyze_movement_patterns(self) -> Dict:
         """Analyze movement patterns to identify optimal layout zones."""
         try:
-            if self.movement_patterns.empty:
+            if self.movement_patterns.empty and self.movement_aggregator is None:
                 raise ValueError("No movement data loaded")
             
-            analysis = {
-                "high_traffic_zones": self._identify_high_traffic_zones(),
-                "common_paths": self._identify_common_paths(),
-                "static_zones": self._identify_static_zones(),
-                "interaction_zones": self._identify_interaction_zones()
-            }
+            aggregator = self.movement_aggregator
+            if not self.movement_patterns.empty or aggregator is None:
+                aggregator = MovementAggregator()
+                aggregator.update(self.movement_patterns.sort_values('timestamp'))
             
-            return analysis
+            return aggregator.analysis()
             
         except Exception as e:
             logger.error(f"Error analyzing movement patterns: {str(e)}")
@@ -73,17 +219,15 @@ class BehavioralDataProcessor:
     def analyze_break_patterns(self) -> Dict:
         """Analyze break patterns for workspace optimization."""
         try:
-            if self.break_patterns.empty:
+            if self.break_patterns.empty and self.break_aggregator is None:
                 raise ValueError("No break data loaded")
             
-            analysis = {
-                "average_break_duration": self._calculate_average_break_duration(),
-                "break_frequency": self._calculate_break_frequency(),
-                "peak_break_times": self._identify_peak_break_times(),
-                "break_locations": self._analyze_break_locations()
-            }
+            aggregator = self.break_aggregator
+            if not self.break_patterns.empty or aggregator is None:
+                aggregator = BreakAggregator()
+                aggregator.update(self.break_patterns)
             
-            return analysis
+            return aggregator.analysis()
             
         except Exception as e:
             logger.error(f"Error analyzing break patterns: {str(e)}")
@@ -91,35 +235,11 @@ class BehavioralDataProcessor:
     
     def _identify_high_traffic_zones(self) -> List[Dict]:
         """Identify zones with high movement traffic."""
-        zones = []
         try:
-            # Group movement data by grid cells
-            grid_size = 50  # cm
-            self.movement_patterns['grid_x'] = (
-                self.movement_patterns['x_position'] // grid_size
-            )
-            self.movement_patterns['grid_y'] = (
-                self.movement_patterns['y_position'] // grid_size
-            )
-            
-            traffic = self.movement_patterns.groupby(
-                ['grid_x', 'grid_y']
-            ).size().reset_index(name='count')
-            
-            # Identify high traffic zones (top 20%)
-            threshold = traffic['count'].quantile(0.8)
-            high_traffic = traffic[traffic['count'] >= threshold]
-            
-            for _, row in high_traffic.iterrows():
-                zones.append({
-                    "position": (
-                        row['grid_x'] * grid_size,
-                        row['grid_y'] * grid_size
-                    ),
-                    "traffic_count": row['count']
-                })
-            
-            return zones
+            # Group movement data by grid cells and keep the top 20%
+            aggregator = MovementAggregator()
+            aggregator.update_traffic(self.movement_patterns)
+            return aggregator.high_traffic_zones()
             
         except Exception as e:
             logger.error(f"Error identifying high traffic zones: {str(e)}")
@@ -128,56 +248,81 @@ class BehavioralDataProcessor:
     def _identify_common_paths(self) -> List[Dict]:
         """Identify commonly taken paths between points."""
         try:
-            paths = []
+            # Pair consecutive movements within 5 seconds, snapped to the grid
+            aggregator = MovementAggregator()
+            aggregator.update_paths(self.movement_patterns.sort_values('timestamp'))
+            return aggregator.common_paths()
             
-            # Sort movement data by timestamp
-            sorted_movements = self.movement_patterns.sort_values('timestamp')
+        except Exception as e:
+            logger.error(f"Error identifying common paths: {str(e)}")
+            raise
+    
+    def _identify_static_zones(self) -> List[Dict]:
+        """Identify grid cells where users remain stationary."""
+        try:
+            aggregator = MovementAggregator()
+            aggregator.update_static_zones(self.movement_patterns)
+            return aggregator.static_zones()
             
-            # Identify sequential movements
-            for i in range(len(sorted_movements) - 1):
-                start = sorted_movements.iloc[i]
-                end = sorted_movements.iloc[i + 1]
-                
-                # If movements are within 5 seconds of each other
-                if (end['timestamp'] - start['timestamp']) <= timedelta(seconds=5):
-                    paths.append({
-                        "start": (start['x_position'], start['y_position']),
-                        "end": (end['x_position'], end['y_position']),
-                        "frequency": 1
-                    })
+        except Exception as e:
+            logger.error(f"Error identifying static zones: {str(e)}")
+            raise
+    
+    def _identify_interaction_zones(self) -> List[Dict]:
+        """Identify grid cells shared by several users."""
+        try:
+            aggregator = MovementAggregator()
+            aggregator.update_interactions(self.movement_patterns)
+            return aggregator.interaction_zones()
             
-            # Combine similar paths
-            combined_paths = self._combine_similar_paths(paths)
+        except Exception as e:
+            logger.error(f"Error identifying interaction zones: {str(e)}")
+            raise
+    
+    def _calculate_average_break_duration(self) -> float:
+        """Calculate the mean break length in minutes."""
+        try:
+            aggregator = BreakAggregator()
+            aggregator.update_durations(self.break_patterns)
+            return aggregator.average_break_duration()
+            
+        except Exception as e:
+            logger.error(f"Error calculating average break duration: {str(e)}")
+            raise
+    
+    def _calculate_break_frequency(self) -> float:
+        """Calculate the average number of breaks per day."""
+        try:
+            aggregator = BreakAggregator()
+            aggregator.update_frequency(self.break_patterns)
+            return aggregator.break_frequency()
             
-            return combined_paths
+        except Exception as e:
+            logger.error(f"Error calculating break frequency: {str(e)}")
+            raise
+    
+    def _identify_peak_break_times(self) -> List[Dict]:
+        """Identify the hours of the day with the most time spent on breaks."""
+        try:
+            # Histogram break intervals onto a minute-of-day grid
+            aggregator = BreakAggregator()
+            aggregator.update_peak_times(self.break_patterns)
+            return aggregator.peak_break_times()
             
         except Exception as e:
-            logger.error(f"Error identifying common paths: {str(e)}")
+            logger.error(f"Error identifying peak break times: {str(e)}")
             raise
     
-    def _combine_similar_paths(self, paths: List[Dict]) -> List[Dict]:
-        """Combine paths that are similar in start and end points."""
-        combined = {}
-        threshold = 50  # cm
-        
-        for path in paths:
-            key = (
-                round(path['start'][0] / threshold) * threshold,
-                round(path['start'][1] / threshold) * threshold,
-                round(path['end'][0] / threshold) * threshold,
-                round(path['end'][1] / threshold) * threshold
-            )
+    def _analyze_break_locations(self) -> Dict:
+        """Count breaks per grid cell, or per named location without positions."""
+        try:
+            aggregator = BreakAggregator()
+            aggregator.update_locations(self.break_patterns)
+            return aggregator.break_locations()
             
-            if key in combined:
-                combined[key]['frequency'] += 1
-            else:
-                combined[key] = {
-                    "start": (key[0], key[1]),
-                    "end": (key[2], key[3]),
-                    "frequency": 1
-                }
-        
-        return list(combined.values())
+        except Exception as e:
+            logger.error(f"Error analyzing break locations: {str(e)}")
+            raise
     
     def generate_layout_recommendations(self) -> Dict:
         """Generate layout recommendations based on behavioral data."""
@@ -205,14 +350,18 @@ class BehavioralDataProcessor:
             traffic_zones = movement_analysis['high_traffic_zones']
             
             # Filter static zones that are not in high traffic areas
-            desk_zones = []
-            for zone in static_zones:
-                if not any(self._is_nearby(zone['position'], tz['position']) 
-                          for tz in traffic_zones):
-                    desk_zones.append({
-                        "position": zone['position'],
-                        "suitability_score": zone['duration']
-                    })
+            near_traffic = self._is_nearby_batch(
+                [zone['position'] for zone in static_zones],
+                [zone['position'] for zone in traffic_zones]
+            )
+            desk_zones = [
+                {
+                    "position": zone['position'],
+                    "suitability_score": zone['sample_count']
+                }
+                for zone, near in zip(static_zones, near_traffic)
+                if not near
+            ]
             
             return sorted(desk_zones, key=lambda x: x['suitability_score'], reverse=True)
             
@@ -226,3 +375,12 @@ class BehavioralDataProcessor:
             ((pos1[0] - pos2[0]) ** 2 + (pos1[1] - pos2[1]) ** 2) ** 0.5
             < threshold
         )
+    
+    def _is_nearby_batch(self, positions: List[tuple], targets: List[tuple],
+                         threshold: float = 100) -> np.ndarray:
+        """For each position, check if any target is within the threshold distance.
+        
+        Uses a uniform grid index over the targets, so the cost grows with
+        the number of positions rather than positions x targets.
+        """
+        return GridIndex(targets, cell_size=threshold).any_within(positions, threshold)
@@ -0,0 +1,150 @@
+import hashlib
+import json
+import os
+import shutil
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from typing import Callable, Dict, Optional
+from utils.logger import setup_logger
+
+logger = setup_logger()
+
+MANIFEST_NAME = "manifest.json"
+
+class ColumnarCache:
+    """On-disk cache of parsed CSV frames as one .npy file per column.
+    
+    Entries are keyed on a hash of the source's resolved path plus its size
+    and modification time, so an edited CSV is re-parsed automatically and
+    same-named files in different directories never share or evict each
+    other's entries. Cached columns are opened with ``mmap_mode='r'`` and
+    wrapped without copying, so warm loads only map files and processes
+    reading the same entry share one page cache.
+    
+    Text columns are stored as categorical codes plus a category list.
+    Columns that were categorical come back as categoricals without a copy;
+    plain object or string columns are restored to their original dtype,
+    which materializes them in memory.
+    """
+    
+    def __init__(self, cache_dir: Path):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+    
+    @staticmethod
+    def _source_key(source: Path) -> Dict:
+        stat = source.stat()
+        return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    
+    @staticmethod
+    def _entry_prefix(source: Path) -> str:
+        path_hash = hashlib.sha256(str(source.resolve()).encode()).hexdigest()[:16]
+        return f"{source.name}-{path_hash}-"
+    
+    def _entry_dir(self, source: Path, key: Dict) -> Path:
+        return self.cache_dir / f"{self._entry_prefix(source)}{key['size']}-{key['mtime_ns']}"
+    
+    def load(self, source: Path) -> Optional[pd.DataFrame]:
+        """Return the memory-mapped frame cached for source, or None if stale."""
+        source = Path(source)
+        entry_dir = self._entry_dir(source, self._source_key(source))
+        manifest_path = entry_dir / MANIFEST_NAME
+        if not manifest_path.exists():
+            return None
+        
+        try:
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+            
+            columns = {}
+            for column in manifest["columns"]:
+                values = np.load(entry_dir / column["file"], mmap_mode='r')
+                if "categories" in column:
+                    values = pd.Categorical.from_codes(
+                        values,
+                        dtype=pd.CategoricalDtype(column["categories"]),
+                        validate=False
+                    )
+                    if column.get("dtype", "category") != "category":
+                        values = pd.Series(values, copy=False).astype(column["dtype"])
+                columns[column["name"]] = values
+            
+            return pd.DataFrame(columns, copy=False)
+        
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable columnar cache {entry_dir}: {str(e)}")
+            return None
+    
+    def store(self, source: Path, frame: pd.DataFrame) -> Path:
+        """Write frame as the cache entry for source; return the entry directory."""
+        source = Path(source)
+        key = self._source_key(source)
+        entry_dir = self._entry_dir(source, key)
+        
+        # Build in a private directory and rename into place, so readers
+        # never see a partially written entry
+        tmp_dir = self.cache_dir / f".{entry_dir.name}.{os.getpid()}.tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        tmp_dir.mkdir()
+        
+        try:
+            manifest = {"source": str(source), **key, "rows": len(frame), "columns": []}
+            for index, name in enumerate(frame.columns):
+                column = {"name": name, "file": f"column_{index}.npy"}
+                values = frame[name]
+                
+                # Plain NumPy numeric, bool and naive datetime columns map
+                # directly; everything else is dictionary-encoded
+                if not (isinstance(values.dtype, np.dtype) and values.dtype.kind in "biufM"):
+                    categorical = pd.Categorical(values)
+                    categories = categorical.categories.tolist()
+                    json.dumps(categories)  # Only JSON-representable labels
+                    column["categories"] = categories
+                    column["dtype"] = str(values.dtype)
+                    array = categorical.codes
+                else:
+                    array = values.to_numpy()
+                
+                np.save(tmp_dir / column["file"], array)
+                manifest["columns"].append(column)
+            
+            with open(tmp_dir / MANIFEST_NAME, "w") as f:
+                json.dump(manifest, f)
+            
+            self._remove_entries(source)
+            try:
+                tmp_dir.rename(entry_dir)
+            except OSError:
+                # Another process published the same entry first
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+            
+            return entry_dir
+        
+        except Exception:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+    
+    def _remove_entries(self, source: Path) -> None:
+        """Delete stale entries for source (open memory maps stay valid)."""
+        prefix = self._entry_prefix(source)
+        for entry_dir in self.cache_dir.iterdir():
+            if entry_dir.name.startswith(prefix) and (entry_dir / MANIFEST_NAME).exists():
+                shutil.rmtree(entry_dir, ignore_errors=True)
+    
+    def load_or_convert(self, source: Path,
+                        parse: Callable[[Path], pd.DataFrame]) -> pd.DataFrame:
+        """Load source from the cache, parsing and caching it on a miss."""
+        frame = self.load(source)
+        if frame is not None:
+            return frame
+        
+        frame = parse(source)
+        try:
+            self.store(source, frame)
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning(f"Could not cache {source}: {str(e)}")
+            return frame
+        
+        cached = self.load(source)
+        return cached if cached is not None else frame
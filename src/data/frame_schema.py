@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, Tuple
+from utils.logger import setup_logger
+
+logger = setup_logger()
+
+def _compact_column(values: pd.Series, decimals: int, max_category_ratio: float):
+    """Lossless compact form of one column, or None to keep it as it is."""
+    dtype = values.dtype
+    if isinstance(dtype, np.dtype) and dtype.kind in "iu":
+        compact = pd.to_numeric(values, downcast='integer')
+        return compact if compact.dtype != dtype else None
+    
+    if isinstance(dtype, np.dtype) and dtype.kind == "f":
+        if dtype == np.float32:
+            return None
+        
+        # Floats stay floating, so later arithmetic keeps float semantics.
+        # float32 is used only when every value has at most ``decimals``
+        # decimals and rounds back to itself, so its error stays below half
+        # a unit in the last decimal and no grid or rounding decision changes
+        array = values.to_numpy(dtype=np.float64)
+        single = array.astype(np.float32)
+        finite = np.isfinite(array)
+        exact = np.round(array[finite], decimals)
+        if (exact == array[finite]).all() and (
+            np.round(single[finite].astype(np.float64), decimals) == exact
+        ).all():
+            return values.astype(np.float32)
+        return None
+    
+    if isinstance(dtype, pd.CategoricalDtype) or dtype.kind == "M":
+        return None
+    
+    # Text ids and labels repeat heavily; store them as categoricals
+    if len(values) and values.nunique(dropna=False) <= max_category_ratio * len(values):
+        return values.astype('category')
+    return None
+
+def optimize_frame(frame: pd.DataFrame, decimals: int = 2,
+                   max_category_ratio: float = 0.5) -> Tuple[pd.DataFrame, Dict]:
+    """Downcast the columns of a parsed frame without changing any value.
+    
+    Integer columns (grid ids, counts) become the smallest integer type
+    that holds them, float positions with at most ``decimals`` decimals
+    become float32 (never integers), and repetitive text columns
+    (user, zone and activity ids) become categoricals. Timestamps are kept.
+    Returns the compact frame and a memory report.
+    """
+    before = frame.memory_usage(deep=True)
+    columns = {}
+    changes = {}
+    for name in frame.columns:
+        compact = _compact_column(frame[name], decimals, max_category_ratio)
+        if compact is None:
+            columns[name] = frame[name]
+        else:
+            columns[name] = compact
+            changes[name] = (str(frame[name].dtype), str(compact.dtype))
+    
+    optimized = pd.DataFrame(columns, index=frame.index, copy=False)
+    after = optimized.memory_usage(deep=True)
+    report = {
+        "before_bytes": int(before.sum()),
+        "after_bytes": int(after.sum()),
+        "reduction": float(before.sum() / after.sum()) if after.sum() else 1.0,
+        "columns": changes
+    }
+    
+    logger.info(
+        f"Optimized frame schema: {report['before_bytes'] / 2**20:.1f} MiB -> "
+        f"{report['after_bytes'] / 2**20:.1f} MiB ({report['reduction']:.1f}x); "
+        + ", ".join(f"{name}: {old} -> {new}" for name, (old, new) in changes.items())
+    )
+    return optimized, report
@@ -0,0 +1,241 @@
+import asyncio
+import math
+import numpy as np
+import pandas as pd
+from datetime import timedelta
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+from data.behavioral_aggregates import BREAK_DTYPES, GRID_SIZE, MOVEMENT_DTYPES
+from data.traffic_heatmap import histogram_quantile
+
+# Default windows: (length, bucket width) per name
+DEFAULT_WINDOWS = {
+    "15min": (timedelta(minutes=15), timedelta(minutes=1)),
+    "4h": (timedelta(hours=4), timedelta(minutes=10))
+}
+
+def _to_ns(timestamp) -> int:
+    """Nanoseconds since the epoch for ints, datetimes and numpy datetimes."""
+    if isinstance(timestamp, (int, np.integer)):
+        return int(timestamp)
+    return pd.Timestamp(timestamp).value
+
+def _add(counts: Dict, key, amount: int) -> None:
+    total = counts.get(key, 0) + amount
+    if total:
+        counts[key] = total
+    else:
+        del counts[key]
+
+class SlidingWindow:
+    """Time-bucketed ring buffer of movement and break counts.
+    
+    Each bucket keeps per-cell counts for its time slice, and window-wide
+    totals are updated as events arrive and as buckets expire, so queries
+    read precomputed aggregates instead of rescanning events. Traffic cells
+    are also indexed by count, so the quantile threshold and the cells
+    above it are read without scanning every cell. Query results are
+    cached until the counts they read change. Time advances with event
+    timestamps, which lets recorded data be replayed at any speed.
+    """
+    
+    def __init__(self, length: timedelta, bucket: timedelta, grid_size: int = GRID_SIZE):
+        if bucket <= timedelta(0) or length < bucket:
+            raise ValueError(f"Invalid window {length} with bucket {bucket}")
+        
+        self.length = length
+        self.grid_size = grid_size
+        self.bucket_ns = int(bucket / timedelta(microseconds=1)) * 1000
+        self.n_buckets = math.ceil(length / bucket)
+        
+        self.bucket_ids = [None] * self.n_buckets
+        self.bucket_traffic = [{} for _ in range(self.n_buckets)]
+        self.bucket_stationary = [{} for _ in range(self.n_buckets)]
+        self.bucket_breaks = [0] * self.n_buckets
+        
+        self.traffic = {}
+        self.cells_by_count = {}  # Traffic count -> cells holding it
+        self.stationary = {}
+        self.breaks = 0
+        self.current_bucket = None
+        self._traffic_cache = {}
+        self._static_cache = None
+    
+    def _slot(self, timestamp_ns: int) -> Optional[int]:
+        """Ring slot for the bucket containing timestamp, advancing time as needed."""
+        bucket_id = timestamp_ns // self.bucket_ns
+        if self.current_bucket is None or bucket_id > self.current_bucket:
+            self._advance(bucket_id)
+        elif bucket_id <= self.current_bucket - self.n_buckets:
+            return None  # Older than the window
+        
+        slot = bucket_id % self.n_buckets
+        if self.bucket_ids[slot] != bucket_id:
+            self._expire(slot)
+            self.bucket_ids[slot] = bucket_id
+        return slot
+    
+    def _advance(self, bucket_id: int) -> None:
+        """Move the window end to bucket_id, expiring buckets that fall out."""
+        oldest = bucket_id - self.n_buckets + 1
+        for slot, slot_bucket in enumerate(self.bucket_ids):
+            if slot_bucket is not None and slot_bucket < oldest:
+                self._expire(slot)
+        self.current_bucket = bucket_id
+    
+    def _expire(self, slot: int) -> None:
+        for cell, count in self.bucket_traffic[slot].items():
+            self._add_traffic(cell, -count)
+        if self.bucket_stationary[slot]:
+            for cell, count in self.bucket_stationary[slot].items():
+                _add(self.stationary, cell, -count)
+            self._static_cache = None
+        self.breaks -= self.bucket_breaks[slot]
+        
+        self.bucket_ids[slot] = None
+        self.bucket_traffic[slot] = {}
+        self.bucket_stationary[slot] = {}
+        self.bucket_breaks[slot] = 0
+    
+    def _add_traffic(self, cell: Tuple, amount: int) -> None:
+        """Update a cell's window count and move it to its new count."""
+        old = self.traffic.get(cell, 0)
+        if old:
+            cells = self.cells_by_count[old]
+            cells.discard(cell)
+            if not cells:
+                del self.cells_by_count[old]
+        _add(self.traffic, cell, amount)
+        if old + amount:
+            self.cells_by_count.setdefault(old + amount, set()).add(cell)
+        if self._traffic_cache:
+            self._traffic_cache = {}
+    
+    def add_movement(self, timestamp, x: float, y: float,
+                     activity_type: Optional[str] = None) -> None:
+        """Count one movement sample in its time bucket and grid cell."""
+        if x != x or y != y:  # NaN positions are skipped, as in batch analysis
+            return
+        slot = self._slot(_to_ns(timestamp))
+        if slot is None:
+            return
+        
+        cell = (x // self.grid_size, y // self.grid_size)
+        _add(self.bucket_traffic[slot], cell, 1)
+        self._add_traffic(cell, 1)
+        if activity_type == 'stationary':
+            _add(self.bucket_stationary[slot], cell, 1)
+            _add(self.stationary, cell, 1)
+            self._static_cache = None
+    
+    def add_break(self, start_time) -> None:
+        """Count one break starting at start_time."""
+        slot = self._slot(_to_ns(start_time))
+        if slot is None:
+            return
+        self.bucket_breaks[slot] += 1
+        self.breaks += 1
+    
+    def _zones(self, cells: Iterable[Tuple], counts: Dict, count_name: str) -> List[Dict]:
+        return [
+            {"position": (x * self.grid_size, y * self.grid_size), count_name: counts[(x, y)]}
+            for x, y in sorted(cells)
+        ]
+    
+    def high_traffic_zones(self, quantile: float = 0.8) -> List[Dict]:
+        """Cells in the window at or above the traffic quantile."""
+        if quantile not in self._traffic_cache:
+            zones = []
+            if self.traffic:
+                values = sorted(self.cells_by_count)
+                threshold = histogram_quantile(
+                    values, [len(self.cells_by_count[count]) for count in values], quantile
+                )
+                zones = self._zones(
+                    (cell for count in values if count >= threshold
+                     for cell in self.cells_by_count[count]),
+                    self.traffic, "traffic_count"
+                )
+            self._traffic_cache[quantile] = zones
+        return self._traffic_cache[quantile]
+    
+    def static_zones(self) -> List[Dict]:
+        """Cells with stationary samples in the window."""
+        if self._static_cache is None:
+            self._static_cache = self._zones(self.stationary, self.stationary, "sample_count")
+        return self._static_cache
+    
+    def breaks_per_hour(self) -> float:
+        """Breaks started per hour over the window.
+        
+        Batch analysis reports ``break_frequency`` per day; this is per hour.
+        """
+        return self.breaks / (self.length / timedelta(hours=1))
+
+class LiveOccupancyEngine:
+    """Feeds movement and break events into several sliding windows at once."""
+    
+    def __init__(self, windows: Optional[Dict[str, Tuple[timedelta, timedelta]]] = None,
+                 grid_size: int = GRID_SIZE):
+        windows = windows or DEFAULT_WINDOWS
+        self.windows = {
+            name: SlidingWindow(length, bucket, grid_size)
+            for name, (length, bucket) in windows.items()
+        }
+        self.events = 0
+    
+    def add_event(self, event: Mapping) -> None:
+        """Route a movement event (has 'timestamp') or break event (has 'start_time')."""
+        if 'timestamp' in event:
+            timestamp_ns = _to_ns(event['timestamp'])
+            for window in self.windows.values():
+                window.add_movement(
+                    timestamp_ns, event['x_position'], event['y_position'],
+                    event.get('activity_type')
+                )
+        elif 'start_time' in event:
+            start_ns = _to_ns(event['start_time'])
+            for window in self.windows.values():
+                window.add_break(start_ns)
+        else:
+            raise ValueError(f"Unrecognised event: {event}")
+        self.events += 1
+    
+    def consume(self, events: Iterable[Mapping]) -> int:
+        """Consume events from an iterator; return how many were processed."""
+        start = self.events
+        for event in events:
+            self.add_event(event)
+        return self.events - start
+    
+    async def consume_queue(self, queue: asyncio.Queue) -> int:
+        """Consume events from an asyncio queue until a None sentinel arrives."""
+        start = self.events
+        while True:
+            event = await queue.get()
+            try:
+                if event is None:
+                    return self.events - start
+                self.add_event(event)
+            finally:
+                queue.task_done()
+    
+    def high_traffic_zones(self, window: str) -> List[Dict]:
+        return self.windows[window].high_traffic_zones()
+    
+    def static_zones(self, window: str) -> List[Dict]:
+        return self.windows[window].static_zones()
+    
+    def breaks_per_hour(self, window: str) -> float:
+        return self.windows[window].breaks_per_hour()
+
+def replay_csv(file_path: Path, chunksize: int = 100000) -> Iterator[Dict]:
+    """Yield the rows of a recorded movement or break CSV as events, in file order."""
+    header = pd.read_csv(file_path, nrows=0).columns
+    parse_dates = [name for name in ('timestamp', 'start_time', 'end_time') if name in header]
+    dtype = MOVEMENT_DTYPES if 'timestamp' in header else BREAK_DTYPES
+    
+    with pd.read_csv(file_path, parse_dates=parse_dates, dtype=dtype,
+                     chunksize=chunksize) as reader:
+        for chunk in reader:
+            yield from chunk.to_dict('records')
@@ -0,0 +1,433 @@
+from abc import ABC, abstractmethod
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
+import copy
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+MAX_HISTORY = 10
+_STALE = object()  # Version token of an empty cache
+
+class PreferenceStore(ABC):
+    """Storage backend for user preferences and their change history."""
+    
+    def __init__(self, max_history: int = MAX_HISTORY):
+        self.max_history = max_history
+    
+    @abstractmethod
+    def ensure_exists(self) -> None:
+        """Create empty storage if it does not exist yet."""
+        pass
+    
+    @abstractmethod
+    def get(self, user_id: str) -> Optional[Dict]:
+        """Stored preferences for a user, or None."""
+        pass
+    
+    def put(self, user_id: str, preferences: Dict, timestamp: str) -> None:
+        """Store a user's preferences and record them in the history."""
+        self.put_many([(user_id, preferences, timestamp)])
+    
+    @abstractmethod
+    def put_many(self, records: Iterable[Tuple[str, Dict, str]]) -> None:
+        """Store several (user_id, preferences, timestamp) records at once."""
+        pass
+    
+    @abstractmethod
+    def history(self, user_id: str) -> List[Dict]:
+        """A user's history entries, oldest first."""
+        pass
+    
+    def version(self) -> Optional[Hashable]:
+        """Cheap token that changes when another writer changes the data."""
+        return None
+    
+    def get_all(self) -> Optional[Dict]:
+        """Every user's preferences, if the backend reads them all at once anyway."""
+        return None
+    
+    def close(self) -> None:
+        pass
+
+class JSONPreferenceStore(PreferenceStore):
+    """Preferences and history kept in two JSON files, rewritten on every save.
+    
+    Saves write a temporary file and rename it into place, so readers never
+    see a partial file and every save gives preferences.json a new inode.
+    version() combines inode, modification time and size. A save through
+    this class replaces the inode, so it is detected even when size and
+    timestamp are unchanged; an external in-place edit that keeps the size
+    within the filesystem's timestamp granularity can be missed.
+    """
+    
+    def __init__(self, preferences_file: Path, history_file: Path,
+                 max_history: int = MAX_HISTORY):
+        super().__init__(max_history)
+        self.preferences_file = preferences_file
+        self.history_file = history_file
+    
+    def ensure_exists(self) -> None:
+        self.preferences_file.parent.mkdir(exist_ok=True)
+        
+        # Create preferences file if it doesn't exist
+        if not self.preferences_file.exists():
+            self._write(self.preferences_file, {})
+        
+        # Create history file if it doesn't exist
+        if not self.history_file.exists():
+            with open(self.history_file, 'w') as f:
+                json.dump([], f)
+    
+    @staticmethod
+    def _write(path: Path, data) -> None:
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, indent=4)
+        os.replace(tmp_path, path)
+    
+    def get(self, user_id: str) -> Optional[Dict]:
+        return self.get_all().get(user_id)
+    
+    def get_all(self) -> Dict:
+        with open(self.preferences_file, 'r') as f:
+            return json.load(f)
+    
+    def version(self) -> Tuple[int, int, int]:
+        stat = self.preferences_file.stat()
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+    
+    def put_many(self, records: Iterable[Tuple[str, Dict, str]]) -> None:
+        records = list(records)
+        with open(self.preferences_file, 'r') as f:
+            all_preferences = json.load(f)
+        with open(self.history_file, 'r') as f:
+            history = json.load(f)
+        
+        for user_id, preferences, timestamp in records:
+            all_preferences[user_id] = preferences
+            history.append({
+                "user_id": user_id,
+                "preferences": preferences,
+                "timestamp": timestamp
+            })
+        for user_id in dict.fromkeys(user_id for user_id, _, _ in records):
+            history = self._trim_history(history, user_id)
+        
+        self._write(self.preferences_file, all_preferences)
+        self._write(self.history_file, history)
+    
+    def _trim_history(self, history: list, user_id: str) -> list:
+        """Keep only the most recent entries for a user."""
+        user_entries = [h for h in history if h['user_id'] != user_id]
+        recent_entries = sorted(
+            [h for h in history if h['user_id'] == user_id],
+            key=lambda x: x['timestamp'],
+            reverse=True
+        )[:self.max_history]
+        
+        return user_entries + recent_entries
+    
+    def history(self, user_id: str) -> List[Dict]:
+        with open(self.history_file, 'r') as f:
+            entries = [h for h in json.load(f) if h['user_id'] == user_id]
+        return sorted(entries, key=lambda x: x['timestamp'])
+
+class SQLitePreferenceStore(PreferenceStore):
+    """Preferences in a local SQLite database.
+    
+    One indexed row per user and a separate history table trimmed per user,
+    so a save touches only that user's rows. The database runs in WAL mode,
+    so readers never block the writer and concurrent savers (threads or
+    processes) queue on the write lock instead of overwriting each other.
+    """
+    
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS preferences (
+            user_id TEXT PRIMARY KEY,
+            data TEXT NOT NULL,
+            updated_at TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS preference_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT NOT NULL,
+            data TEXT NOT NULL,
+            timestamp TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS preference_history_user
+            ON preference_history (user_id, id);
+        CREATE TABLE IF NOT EXISTS store_metadata (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        );
+    """
+    
+    def __init__(self, db_path: Path, max_history: int = MAX_HISTORY,
+                 timeout: float = 30.0):
+        super().__init__(max_history)
+        self.db_path = db_path
+        self.timeout = timeout
+        self._connection = None
+        self._lock = threading.Lock()
+    
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(
+                self.db_path, timeout=self.timeout,
+                isolation_level=None, check_same_thread=False
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(self.SCHEMA)
+            self._connection = connection
+        return self._connection
+    
+    def ensure_exists(self) -> None:
+        self.connection
+    
+    def get(self, user_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self.connection.execute(
+                "SELECT data FROM preferences WHERE user_id = ?", (user_id,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+    
+    def put_many(self, records: Iterable[Tuple[str, Dict, str]]) -> None:
+        """Store records in one transaction, trimming each user's history once."""
+        rows = [
+            (user_id, json.dumps(preferences), timestamp)
+            for user_id, preferences, timestamp in records
+        ]
+        if not rows:
+            return
+        
+        with self._lock:
+            connection = self.connection
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                connection.executemany(
+                    "INSERT INTO preferences (user_id, data, updated_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT (user_id) DO UPDATE SET "
+                    "data = excluded.data, updated_at = excluded.updated_at",
+                    rows
+                )
+                connection.executemany(
+                    "INSERT INTO preference_history (user_id, data, timestamp) VALUES (?, ?, ?)",
+                    rows
+                )
+                connection.executemany(
+                    "DELETE FROM preference_history WHERE user_id = ? AND id NOT IN ("
+                    "SELECT id FROM preference_history WHERE user_id = ? "
+                    "ORDER BY id DESC LIMIT ?)",
+                    [(user_id, user_id, self.max_history)
+                     for user_id in dict.fromkeys(row[0] for row in rows)]
+                )
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+    
+    def version(self) -> int:
+        # Changes whenever another connection commits to the database
+        with self._lock:
+            return self.connection.execute("PRAGMA data_version").fetchone()[0]
+    
+    def history(self, user_id: str) -> List[Dict]:
+        with self._lock:
+            rows = self.connection.execute(
+                "SELECT data, timestamp FROM preference_history "
+                "WHERE user_id = ? ORDER BY id", (user_id,)
+            ).fetchall()
+        return [
+            {"user_id": user_id, "preferences": json.loads(data), "timestamp": timestamp}
+            for data, timestamp in rows
+        ]
+    
+    def _json_imported(self) -> bool:
+        return self.connection.execute(
+            "SELECT 1 FROM store_metadata WHERE key = 'json_imported'"
+        ).fetchone() is not None
+    
+    def import_json(self, preferences_file: Path, history_file: Path) -> Optional[int]:
+        """Load preferences.json and preference_history.json in one transaction.
+        
+        History entries are inserted in timestamp order and the current
+        preferences are written last, so they win over history. Completion
+        is recorded in ``store_metadata`` by the same transaction, so an
+        import that failed is retried on the next call and a finished one
+        (even of missing files) is never repeated. Returns the number of
+        users imported, or None if the database was already imported.
+        """
+        with self._lock:
+            if self._json_imported():
+                return None
+        
+        preferences, history = {}, []
+        if preferences_file.exists():
+            with open(preferences_file, 'r') as f:
+                preferences = json.load(f)
+        if history_file.exists():
+            with open(history_file, 'r') as f:
+                history = sorted(json.load(f), key=lambda x: x['timestamp'])
+        
+        with self._lock:
+            connection = self.connection
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                # Another process may have finished the import meanwhile
+                if self._json_imported():
+                    connection.execute("ROLLBACK")
+                    return None
+                
+                connection.executemany(
+                    "INSERT INTO preference_history (user_id, data, timestamp) VALUES (?, ?, ?)",
+                    [(h['user_id'], json.dumps(h['preferences']), h['timestamp'])
+                     for h in history]
+                )
+                latest = {h['user_id']: h['timestamp'] for h in history}
+                connection.executemany(
+                    "INSERT INTO preferences (user_id, data, updated_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT (user_id) DO UPDATE SET "
+                    "data = excluded.data, updated_at = excluded.updated_at",
+                    [(user_id, json.dumps(prefs), latest.get(user_id, ""))
+                     for user_id, prefs in preferences.items()]
+                )
+                connection.execute(
+                    "DELETE FROM preference_history WHERE id IN ("
+                    "SELECT id FROM (SELECT id, ROW_NUMBER() OVER ("
+                    "PARTITION BY user_id ORDER BY id DESC) AS recent "
+                    "FROM preference_history) WHERE recent > ?)",
+                    (self.max_history,)
+                )
+                connection.execute(
+                    "INSERT INTO store_metadata (key, value) VALUES ('json_imported', ?)",
+                    (str(preferences_file),)
+                )
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+        
+        return len(preferences)
+    
+    def close(self) -> None:
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+class CachedPreferenceStore(PreferenceStore):
+    """Read-through in-memory cache in front of another store.
+    
+    Lookups are served from a dict. Before each lookup the backend's
+    version() token (inode, mtime and size for JSON, ``PRAGMA data_version``
+    for SQLite) is checked, and the cache is dropped when it changed or
+    after a write through this cache. Backends that can only read
+    everything at once (JSON) are reloaded in full; others fill per user
+    and keep at most ``max_entries`` users, evicting the least recently
+    used.
+    """
+    
+    def __init__(self, store: PreferenceStore, max_entries: int = 10000):
+        if max_entries <= 0:
+            raise ValueError(f"Invalid cache size: {max_entries}")
+        
+        super().__init__(store.max_history)
+        self.store = store
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.complete = False
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+        self.last_reload_seconds = 0.0
+        self.total_reload_seconds = 0.0
+        self._version = _STALE
+        self._lock = threading.Lock()
+    
+    def ensure_exists(self) -> None:
+        self.store.ensure_exists()
+        self.invalidate()
+    
+    def invalidate(self) -> None:
+        """Drop every cached entry."""
+        with self._lock:
+            self.entries = OrderedDict()
+            self.complete = False
+            self._version = _STALE
+    
+    def _refresh(self) -> bool:
+        """Drop stale entries, reloading in full when the backend supports it.
+        
+        Returns whether the cache was stale.
+        """
+        version = self.store.version()
+        if version == self._version:
+            return False
+        
+        start = time.perf_counter()
+        entries = self.store.get_all()
+        self.entries = entries if entries is not None else OrderedDict()
+        self.complete = entries is not None
+        self._version = version
+        
+        if self.complete:
+            self.reloads += 1
+            self.last_reload_seconds = time.perf_counter() - start
+            self.total_reload_seconds += self.last_reload_seconds
+        return True
+    
+    def get(self, user_id: str) -> Optional[Dict]:
+        with self._lock:
+            stale = self._refresh()
+            if user_id in self.entries or self.complete:
+                # A lookup that had to reload counts as a miss
+                if stale:
+                    self.misses += 1
+                else:
+                    self.hits += 1
+                preferences = self.entries.get(user_id)
+                if not self.complete:
+                    self.entries.move_to_end(user_id)
+            else:
+                self.misses += 1
+                preferences = self.entries[user_id] = self.store.get(user_id)
+                if len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+        
+        # Callers get their own copy, so edits never leak into the cache
+        return copy.deepcopy(preferences) if preferences is not None else None
+    
+    def put_many(self, records: Iterable[Tuple[str, Dict, str]]) -> None:
+        try:
+            self.store.put_many(records)
+        finally:
+            self.invalidate()
+    
+    def history(self, user_id: str) -> List[Dict]:
+        return self.store.history(user_id)
+    
+    def version(self) -> Optional[Hashable]:
+        return self.store.version()
+    
+    def stats(self) -> Dict:
+        """Hit/miss counters and reload timings."""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "reloads": self.reloads,
+            "last_reload_seconds": self.last_reload_seconds,
+            "total_reload_seconds": self.total_reload_seconds
+        }
+    
+    def close(self) -> None:
+        self.invalidate()
+        self.store.close()
@@ -0,0 +1,66 @@
+import numpy as np
+from typing import Sequence
+
+class GridIndex:
+    """Uniform grid hash over 2-D points for fixed-radius queries.
+    
+    Points are bucketed by ``floor(position / cell_size)`` and kept sorted by
+    bucket key, so a radius query only inspects the neighbouring buckets.
+    With bounded point density each query costs O(1), making a batch query
+    near-linear in the number of points instead of O(queries x points).
+    """
+    
+    def __init__(self, points: Sequence, cell_size: float):
+        if cell_size <= 0:
+            raise ValueError(f"Invalid cell size: {cell_size}")
+        
+        self.cell_size = cell_size
+        self.points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        
+        keys = self._keys(self._cells(self.points))
+        self.order = np.argsort(keys, kind='stable')
+        self.keys = keys[self.order]
+    
+    def __len__(self) -> int:
+        return len(self.points)
+    
+    def _cells(self, points: np.ndarray) -> np.ndarray:
+        return np.floor(points / self.cell_size).astype(np.int64)
+    
+    @staticmethod
+    def _keys(cells: np.ndarray) -> np.ndarray:
+        # Pack (cell_x, cell_y) into one sortable int64
+        return (cells[:, 0] << 32) + (cells[:, 1] & 0xFFFFFFFF)
+    
+    def any_within(self, queries: Sequence, radius: float) -> np.ndarray:
+        """For each query point, whether any indexed point is closer than radius."""
+        queries = np.asarray(queries, dtype=np.float64).reshape(-1, 2)
+        found = np.zeros(len(queries), dtype=bool)
+        if not len(self.points) or not len(queries):
+            return found
+        
+        rings = int(np.ceil(radius / self.cell_size))
+        query_cells = self._cells(queries)
+        
+        for offset_x in range(-rings, rings + 1):
+            for offset_y in range(-rings, rings + 1):
+                pending = np.flatnonzero(~found)
+                if not len(pending):
+                    return found
+                
+                keys = self._keys(query_cells[pending] + (offset_x, offset_y))
+                start = np.searchsorted(self.keys, keys, side='left')
+                counts = np.searchsorted(self.keys, keys, side='right') - start
+                if not counts.any():
+                    continue
+                
+                # Expand every (query, candidate) pair in the bucket
+                query_index = np.repeat(pending, counts)
+                first = np.repeat(start - np.cumsum(counts) + counts, counts)
+                candidates = self.order[first + np.arange(counts.sum())]
+                
+                delta = self.points[candidates] - queries[query_index]
+                distance = np.sqrt(delta[:, 0] ** 2 + delta[:, 1] ** 2)
+                found[query_index[distance < radius]] = True
+        
+        return found
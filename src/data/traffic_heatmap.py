@@ -0,0 +1,222 @@
+import numpy as np
+from pathlib import Path
+from typing import Dict, List, Tuple
+from utils.logger import setup_logger
+
+logger = setup_logger()
+
+# Largest dense grid (cells) before switching to sparse storage; 2^22
+# int64 counts is 32 MiB, or a 1 km x 1 km floor at 50 cm cells
+MAX_DENSE_CELLS = 2 ** 22
+
+def histogram_quantile(values: np.ndarray, cells: np.ndarray, quantile: float) -> float:
+    """Quantile of per-cell counts given as a histogram.
+    
+    ``values`` are the distinct counts in ascending order and ``cells`` how
+    many cells hold each; matches ``np.quantile`` with linear interpolation
+    over the expanded counts.
+    """
+    visited = int(np.sum(cells))
+    if visited == 0:
+        raise ValueError("Cannot take a quantile of no cells")
+    
+    position = quantile * (visited - 1)
+    lower = int(np.floor(position))
+    ranks = [lower, min(lower + 1, visited - 1)]
+    low, high = np.asarray(values)[
+        np.searchsorted(np.cumsum(cells), ranks, side='right')
+    ].astype(np.float64)
+    # Same lerp as np.quantile, so thresholds match it bit for bit
+    fraction = position - lower
+    if fraction >= 0.5:
+        return float(high - (high - low) * (1 - fraction))
+    return float(low + (high - low) * fraction)
+
+class TrafficHeatmap:
+    """Movement counts per grid cell, updated incrementally.
+    
+    The dense form keeps a 2-D count array that grows to cover new cells;
+    ``sparse=True`` keeps a dict of visited cells instead, for floors too
+    large to allocate densely. A dense heatmap switches to sparse storage
+    by itself once covering its cells would take more than
+    ``max_dense_cells`` (e.g. after an outlier position). Alongside the
+    cells it keeps a histogram of the per-cell counts (how many cells hold
+    each count), so the traffic threshold is read without scanning the
+    cells. Updates cost O(batch) plus O(distinct counts) either way.
+    """
+    
+    def __init__(self, grid_size: int = 50, sparse: bool = False,
+                 max_dense_cells: int = MAX_DENSE_CELLS):
+        self.grid_size = grid_size
+        self.sparse = sparse
+        self.max_dense_cells = max_dense_cells
+        self.total = 0
+        self.counts = {} if sparse else np.zeros((0, 0), dtype=np.int64)
+        self.origin = np.zeros(2, dtype=np.int64)
+        # Distinct per-cell counts (ascending) and how many cells hold each
+        self.count_values = np.zeros(0, dtype=np.int64)
+        self.count_cells = np.zeros(0, dtype=np.int64)
+    
+    def __len__(self) -> int:
+        """Number of cells with at least one sample."""
+        return int(self.count_cells.sum())
+    
+    def update(self, x: np.ndarray, y: np.ndarray) -> None:
+        """Add one sample per (x, y) position; NaN positions are skipped."""
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        valid = np.isfinite(x) & np.isfinite(y)
+        cells = np.column_stack([
+            x[valid] // self.grid_size, y[valid] // self.grid_size
+        ]).astype(np.int64)
+        self._add_cells(cells, np.ones(len(cells), dtype=np.int64))
+    
+    def merge(self, other: "TrafficHeatmap") -> None:
+        """Add another heatmap's counts (e.g. from a parallel worker) into this one."""
+        if other.grid_size != self.grid_size:
+            raise ValueError("Cannot merge heatmaps with different grid sizes")
+        self._add_cells(*other.cells())
+    
+    def _add_cells(self, cells: np.ndarray, counts: np.ndarray) -> None:
+        """Add counts to the given (n, 2) integer cells."""
+        if not len(cells):
+            return
+        if not self.sparse and not self._grow(cells.min(axis=0), cells.max(axis=0)):
+            self._make_sparse()
+        self.total += int(counts.sum())
+        
+        if self.sparse:
+            unique, inverse = np.unique(cells, axis=0, return_inverse=True)
+            totals = np.bincount(inverse.ravel(), weights=counts).astype(np.int64)
+            old = []
+            for cell, count in zip(map(tuple, unique.tolist()), totals.tolist()):
+                old.append(self.counts.get(cell, 0))
+                self.counts[cell] = old[-1] + count
+            old = np.array(old, dtype=np.int64)
+            self._update_histogram(old, old + totals)
+            return
+        
+        index = cells - self.origin
+        flat, inverse = np.unique(
+            index[:, 0] * self.counts.shape[1] + index[:, 1], return_inverse=True
+        )
+        totals = np.bincount(inverse.ravel(), weights=counts).astype(np.int64)
+        old = self.counts.flat[flat]
+        self.counts.flat[flat] = old + totals
+        self._update_histogram(old, old + totals)
+    
+    def _update_histogram(self, old: np.ndarray, new: np.ndarray) -> None:
+        """Move the updated cells from their old counts (0 = unvisited) to the new ones."""
+        old = old[old > 0]
+        values = np.concatenate([self.count_values, old, new])
+        weights = np.concatenate([
+            self.count_cells, np.full(len(old), -1, dtype=np.int64),
+            np.ones(len(new), dtype=np.int64)
+        ])
+        values, inverse = np.unique(values, return_inverse=True)
+        cells = np.bincount(inverse, weights=weights).astype(np.int64)
+        keep = cells > 0
+        self.count_values = values[keep]
+        self.count_cells = cells[keep]
+    
+    def _grow(self, low: np.ndarray, high: np.ndarray) -> bool:
+        """Resize the dense array so it covers cells low..high inclusive.
+        
+        Returns False, leaving the array as it is, if the result would
+        exceed max_dense_cells.
+        """
+        if self.counts.size == 0:
+            new_origin, new_end = low, high + 1
+        else:
+            end = self.origin + self.counts.shape
+            new_origin = np.minimum(self.origin, low)
+            new_end = np.maximum(end, high + 1)
+            if (new_origin == self.origin).all() and (new_end == end).all():
+                return True
+        
+        shape = new_end - new_origin
+        if int(shape[0]) * int(shape[1]) > self.max_dense_cells:
+            return False
+        
+        counts = np.zeros(shape, dtype=np.int64)
+        offset = self.origin - new_origin
+        if self.counts.size:
+            counts[offset[0]:offset[0] + self.counts.shape[0],
+                   offset[1]:offset[1] + self.counts.shape[1]] = self.counts
+        self.origin = new_origin
+        self.counts = counts
+        return True
+    
+    def _make_sparse(self) -> None:
+        """Move the dense counts into a dict of visited cells."""
+        cells, counts = self.cells()
+        logger.warning(
+            f"Traffic grid would exceed {self.max_dense_cells} cells; "
+            "switching to sparse storage"
+        )
+        self.counts = dict(zip(map(tuple, cells.tolist()), counts.tolist()))
+        self.origin = np.zeros(2, dtype=np.int64)
+        self.sparse = True
+    
+    def cells(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Visited cells sorted by (grid_x, grid_y), and their counts."""
+        if self.sparse:
+            if not self.counts:
+                return np.zeros((0, 2), dtype=np.int64), np.zeros(0, dtype=np.int64)
+            cells = np.array(sorted(self.counts), dtype=np.int64)
+            counts = np.array([self.counts[cell] for cell in map(tuple, cells.tolist())])
+            return cells, counts
+        
+        index = np.argwhere(self.counts)
+        return index + self.origin, self.counts[index[:, 0], index[:, 1]]
+    
+    def high_traffic_threshold(self, quantile: float = 0.8) -> float:
+        """Count at the given quantile of visited cells.
+        
+        Read from the count histogram; matches ``np.quantile`` with linear
+        interpolation over the per-cell counts.
+        """
+        if len(self) == 0:
+            raise ValueError("Cannot take a quantile of an empty heatmap")
+        return histogram_quantile(self.count_values, self.count_cells, quantile)
+    
+    def high_traffic_zones(self, quantile: float = 0.8) -> List[Dict]:
+        """Cells whose count is at or above the given quantile of visited cells."""
+        if len(self) == 0:
+            return []
+        
+        threshold = self.high_traffic_threshold(quantile)
+        if self.sparse:
+            selected = sorted(
+                cell for cell, count in self.counts.items() if count >= threshold
+            )
+            cells = np.array(selected, dtype=np.int64).reshape(-1, 2)
+            counts = [self.counts[cell] for cell in selected]
+        else:
+            index = np.argwhere(self.counts >= threshold)
+            cells = index + self.origin
+            counts = self.counts[index[:, 0], index[:, 1]].tolist()
+        
+        positions = cells.astype(np.float64) * self.grid_size
+        return [
+            {"position": (x, y), "traffic_count": count}
+            for (x, y), count in zip(positions.tolist(), counts)
+        ]
+    
+    def save(self, path: Path) -> None:
+        """Write the heatmap to a .npz file."""
+        cells, counts = self.cells()
+        np.savez_compressed(
+            path, cells=cells, counts=counts,
+            grid_size=self.grid_size, sparse=self.sparse
+        )
+    
+    @classmethod
+    def load(cls, path: Path) -> "TrafficHeatmap":
+        """Read a heatmap written by save()."""
+        with np.load(path) as data:
+            heatmap = cls(int(data["grid_size"]), sparse=bool(data["sparse"]))
+            cells, counts = data["cells"], data["counts"]
+        
+        heatmap._add_cells(cells, counts)
+        return heatmap
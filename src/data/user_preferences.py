@@ -1,34 +1,51 @@
-from typing import Dict, Optional
-import json
+from typing import Dict, List, Optional
 from pathlib import Path
+from data.preference_store import (
+    CachedPreferenceStore, JSONPreferenceStore, SQLitePreferenceStore
+)
 from utils.logger import setup_logger
 from datetime import datetime
 
 logger = setup_logger()
 
 class UserPreferences:
-    """Manages user preferences for workspace layout generation."""
+    """Manages user preferences for workspace layout generation.
     
-    def __init__(self, data_dir: Path):
+    ``backend="json"`` (the default) keeps preferences.json and
+    preference_history.json; ``backend="sqlite"`` uses preferences.db, with
+    per-user rows and WAL mode, and imports existing JSON files once; the
+    database records a completed import, so a failed one is retried.
+    
+    Lookups go through a CachedPreferenceStore unless ``cache=False``; it
+    reloads when the backing file or database changes, and its counters
+    are available from cache_stats().
+    """
+    
+    def __init__(self, data_dir: Path, backend: str = "json", cache: bool = True):
         self.data_dir = data_dir
         self.preferences_file = data_dir / "preferences.json"
         self.history_file = data_dir / "preference_history.json"
         self.logger = setup_logger()
+        
+        if backend == "json":
+            self.backend = JSONPreferenceStore(self.preferences_file, self.history_file)
+        elif backend == "sqlite":
+            self.backend = SQLitePreferenceStore(data_dir / "preferences.db")
+        else:
+            raise ValueError(f"Unknown preference backend: {backend}")
+        self.store = CachedPreferenceStore(self.backend) if cache else self.backend
         self._ensure_files_exist()
     
     def _ensure_files_exist(self) -> None:
-        """Ensure preference files exist with default structure."""
+        """Ensure preference storage exists with default structure."""
         try:
             self.data_dir.mkdir(exist_ok=True)
             
-            # Create preferences file if it doesn't exist
-            if not self.preferences_file.exists():
-                self._save_preferences({})
-            
-            # Create history file if it doesn't exist
-            if not self.history_file.exists():
-                with open(self.history_file, 'w') as f:
-                    json.dump([], f)
+            self.store.ensure_exists()
+            if isinstance(self.backend, SQLitePreferenceStore):
+                count = self.backend.import_json(self.preferences_file, self.history_file)
+                if count:
+                    logger.info(f"Imported preferences for {count} users from JSON")
                     
         except Exception as e:
             logger.error(f"Error ensuring preference files: {str(e)}")
@@ -37,10 +54,8 @@ class UserPreferences:
     def get_preferences(self, user_id: str) -> Dict:
         """Get preferences for a specific user."""
         try:
-            with open(self.preferences_file, 'r') as f:
-                preferences = json.load(f)
-            
-            return preferences.get(user_id, self._get_default_preferences())
+            preferences = self.store.get(user_id)
+            return preferences if preferences is not None else self._get_default_preferences()
             
         except Exception as e:
             logger.error(f"Error getting preferences: {str(e)}")
@@ -52,18 +67,8 @@ class UserPreferences:
             # Validate preferences
             self._validate_preferences(preferences)
             
-            # Load existing preferences
-            with open(self.preferences_file, 'r') as f:
-                all_preferences = json.load(f)
-            
-            # Update preferences
-            all_preferences[user_id] = preferences
-            
-            # Save updated preferences
-            self._save_preferences(all_preferences)
-            
-            # Add to history
-            self._add_to_history(user_id, preferences)
+            # Save and add to history
+            self.store.put(user_id, preferences, datetime.now().isoformat())
             
             logger.info(f"Saved preferences for user {user_id}")
             
@@ -71,43 +76,40 @@ class UserPreferences:
             logger.error(f"Error saving preferences: {str(e)}")
             raise
     
-    def _save_preferences(self, preferences: Dict) -> None:
-        """Save preferences to file."""
-        with open(self.preferences_file, 'w') as f:
-            json.dump(preferences, f, indent=4)
-    
-    def _add_to_history(self, user_id: str, preferences: Dict) -> None:
-        """Add preferences to history with timestamp."""
+    def save_many(self, preferences_by_user: Dict[str, Dict]) -> None:
+        """Validate and save preferences for several users in one batch."""
         try:
-            with open(self.history_file, 'r') as f:
-                history = json.load(f)
+            for preferences in preferences_by_user.values():
+                self._validate_preferences(preferences)
             
-            history.append({
-                "user_id": user_id,
-                "preferences": preferences,
-                "timestamp": datetime.now().isoformat()
-            })
+            timestamp = datetime.now().isoformat()
+            self.store.put_many(
+                (user_id, preferences, timestamp)
+                for user_id, preferences in preferences_by_user.items()
+            )
             
-            # Keep only last 10 entries per user
-            history = self._trim_history(history, user_id)
+            logger.info(f"Saved preferences for {len(preferences_by_user)} users")
             
-            with open(self.history_file, 'w') as f:
-                json.dump(history, f, indent=4)
-                
         except Exception as e:
-            logger.error(f"Error adding to history: {str(e)}")
+            logger.error(f"Error saving preferences: {str(e)}")
             raise
     
-    def _trim_history(self, history: list, user_id: str, max_entries: int = 10) -> list:
-        """Keep only the most recent entries for a user."""
-        user_entries = [h for h in history if h['user_id'] != user_id]
-        recent_entries = sorted(
-            [h for h in history if h['user_id'] == user_id],
-            key=lambda x: x['timestamp'],
-            reverse=True
-        )[:max_entries]
-        
-        return user_entries + recent_entries
+    def get_history(self, user_id: str) -> List[Dict]:
+        """Get a user's saved preference history, oldest first."""
+        try:
+            return self.store.history(user_id)
+            
+        except Exception as e:
+            logger.error(f"Error getting preference history: {str(e)}")
+            raise
+    
+    def cache_stats(self) -> Dict:
+        """Hit rate and reload timings of the lookup cache (empty when disabled)."""
+        return self.store.stats() if isinstance(self.store, CachedPreferenceStore) else {}
+    
+    def close(self) -> None:
+        """Release the storage backend."""
+        self.store.close()
     
     def _get_default_preferences(self) -> Dict:
         """Return default preferences structure."""
@@ -1,7 +1,8 @@
-from typing import Dict, Optional
+from typing import Dict, Optional, Union
 import clr
 import System
 from utils.logger import setup_logger
+from ai.layout import Layout, as_layout_dict
 from pathlib import Path
 
 # Add Revit API references
@@ -51,9 +52,12 @@ class RevitExporter:
             logger.error(f"Error loading Revit family types: {str(e)}")
             raise
     
-    def export_layout(self, layout: Dict, template_path: Optional[str] = None) -> None:
+    def export_layout(self, layout: Union[Dict, Layout],
+                      template_path: Optional[str] = None) -> None:
         """Export layout to Revit."""
         try:
+            layout = as_layout_dict(layout)
+            
             # Create new Revit document if none exists
             if not self.doc and template_path:
                 self._create_new_document(template_path)
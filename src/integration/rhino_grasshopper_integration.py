@@ -1,7 +1,8 @@
 import rhinoscriptsyntax as rs
 import Rhino.Geometry as rg
-from typing import Dict, List, Tuple
+from typing import Dict, List, Tuple, Union
 from utils.logger import setup_logger
+from ai.layout import Layout, as_layout_dict
 import json
 import os
 
@@ -14,9 +15,11 @@ class RhinoIntegration:
         self.logger = setup_logger()
         self.gh_file = grasshopper_file or "grasshopper_scripts/layout_generator.gh"
         
-    def create_layout_geometry(self, layout: Dict) -> None:
+    def create_layout_geometry(self, layout: Union[Dict, Layout]) -> None:
         """Create 3D geometry in Rhino based on layout specification."""
         try:
+            layout = as_layout_dict(layout)
+            
             # Clear existing geometry
             rs.DeleteObjects(rs.AllObjects())
             
@@ -128,12 +131,12 @@ class RhinoIntegration:
         # (Implementation depends on specific visualization needs)
         pass
     
-    def export_to_grasshopper(self, layout: Dict, output_file: str) -> None:
+    def export_to_grasshopper(self, layout: Union[Dict, Layout], output_file: str) -> None:
         """Export layout data to Grasshopper for parametric modeling."""
         try:
             # Convert layout to Grasshopper-compatible format
             gh_data = {
-                "layout": layout,
+                "layout": as_layout_dict(layout),
                 "parameters": {
                     "wall_height": 2700,  # Standard wall height
                     "ceiling_height": 3000,
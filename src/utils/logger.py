@@ -1,17 +1,65 @@
+import atexit
 import logging
+import queue
 import sys
+import time
+from contextlib import contextmanager
 from pathlib import Path
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Iterator, List, Optional
 
-def setup_logger():
-    """Configure and return a logger instance for the application."""
-    # Create logs directory if it doesn't exist
-    logs_dir = Path(__file__).parent.parent.parent / "logs"
-    logs_dir.mkdir(exist_ok=True)
+LOGGER_NAME = "workspace_generator"
+
+# Handler names used to recognise handlers installed by setup_logger
+FILE_HANDLER = f"{LOGGER_NAME}.file"
+CONSOLE_HANDLER = f"{LOGGER_NAME}.console"
+QUEUE_HANDLER = f"{LOGGER_NAME}.queue"
+
+def setup_logger(use_queue: Optional[bool] = None) -> logging.Logger:
+    """Configure and return a logger instance for the application.
     
+    Handlers are installed on the first call only; later calls return the
+    already configured logger, so calling this at import time and in every
+    ``__init__`` is cheap. With ``use_queue=True`` records are handed to a
+    ``QueueHandler`` and written by a background ``QueueListener`` thread,
+    keeping file and console I/O off the calling thread. Passing a different
+    ``use_queue`` value than the current configuration reconfigures it.
+    """
     # Create logger instance
-    logger = logging.getLogger("workspace_generator")
+    logger = logging.getLogger(LOGGER_NAME)
+    
+    queued = _find_handler(logger, QUEUE_HANDLER) is not None
+    configured = queued or _find_handler(logger, FILE_HANDLER) is not None
+    if configured and (use_queue is None or use_queue == queued):
+        return logger
+    if configured:
+        shutdown_logger()
+    
     logger.setLevel(logging.DEBUG)
+    handlers = _build_handlers()
+    
+    if use_queue:
+        # Unbounded queue: emitting never blocks the hot path
+        log_queue = queue.SimpleQueue()
+        queue_handler = QueueHandler(log_queue)
+        queue_handler.set_name(QUEUE_HANDLER)
+        queue_handler.listener = QueueListener(
+            log_queue, *handlers, respect_handler_level=True
+        )
+        queue_handler.listener.start()
+        logger.addHandler(queue_handler)
+    else:
+        # Add handlers to logger
+        for handler in handlers:
+            logger.addHandler(handler)
+    
+    return logger
+
+def _build_handlers() -> List[logging.Handler]:
+    """Create the rotating file and console handlers."""
+    # Create logs directory if it doesn't exist
+    logs_dir = Path(__file__).parent.parent.parent / "logs"
+    logs_dir.mkdir(exist_ok=True)
     
     # Create formatters
     file_formatter = logging.Formatter(
@@ -27,16 +75,83 @@ def setup_logger():
         maxBytes=1024 * 1024,  # 1MB
         backupCount=5
     )
+    file_handler.set_name(FILE_HANDLER)
     file_handler.setLevel(logging.DEBUG)
     file_handler.setFormatter(file_formatter)
     
     # Console handler
     console_handler = logging.StreamHandler(sys.stdout)
+    console_handler.set_name(CONSOLE_HANDLER)
     console_handler.setLevel(logging.INFO)
     console_handler.setFormatter(console_formatter)
     
-    # Add handlers to logger
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
+    return [file_handler, console_handler]
+
+def _find_handler(logger: logging.Logger, name: str) -> Optional[logging.Handler]:
+    for handler in logger.handlers:
+        if handler.get_name() == name:
+            return handler
+    return None
+
+def shutdown_logger() -> None:
+    """Flush and remove the handlers installed by setup_logger."""
+    logger = logging.getLogger(LOGGER_NAME)
+    for name in (QUEUE_HANDLER, FILE_HANDLER, CONSOLE_HANDLER):
+        handler = _find_handler(logger, name)
+        if handler is None:
+            continue
+        
+        listener = getattr(handler, "listener", None)
+        if listener is not None:
+            # Drains queued records, then stops the writer thread
+            listener.stop()
+            for target in listener.handlers:
+                target.close()
+        
+        logger.removeHandler(handler)
+        handler.close()
+
+atexit.register(shutdown_logger)
+
+class LoggingOverhead:
+    """Call count and time spent handling log records."""
+    
+    def __init__(self):
+        self.calls = 0
+        self.total_seconds = 0.0
     
-    return logger
+    @property
+    def seconds_per_call(self) -> float:
+        return self.total_seconds / self.calls if self.calls else 0.0
+
+@contextmanager
+def measure_logging_overhead(logger: Optional[logging.Logger] = None) -> Iterator[LoggingOverhead]:
+    """Time every record the logger handles inside the ``with`` block.
+    
+    Example::
+        
+        with measure_logging_overhead() as overhead:
+            optimizer.optimize_layout(layout, preferences)
+        print(overhead.calls, overhead.seconds_per_call)
+    """
+    logger = logger or logging.getLogger(LOGGER_NAME)
+    overhead = LoggingOverhead()
+    handle = logger.handle
+    patched = "handle" in vars(logger)
+    
+    def timed_handle(record: logging.LogRecord) -> None:
+        start = time.perf_counter()
+        try:
+            handle(record)
+        finally:
+            overhead.total_seconds += time.perf_counter() - start
+            overhead.calls += 1
+    
+    logger.handle = timed_handle
+    try:
+        yield overhead
+    finally:
+        if patched:
+            logger.handle = handle
+        else:
+            del logger.handle
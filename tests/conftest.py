@@ -0,0 +1,15 @@
+import os
+import pytest
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers", "benchmark: timing benchmark, run only with RUN_BENCHMARKS=1"
+    )
+
+def pytest_collection_modifyitems(config, items):
+    if os.environ.get("RUN_BENCHMARKS") == "1":
+        return
+    skip = pytest.mark.skip(reason="timing benchmark; set RUN_BENCHMARKS=1 to run")
+    for item in items:
+        if "benchmark" in item.keywords:
+            item.add_marker(skip)
@@ -1,8 +1,25 @@
+import sys
+import copy
+import json
+import os
+import time
+import warnings
+import subprocess
+from pathlib import Path
 import pytest
 import numpy as np
+import pandas as pd
+from src.ai.base_model import TrainableLayoutModel
 from src.ai.models import WorkspaceLayoutGenerator
+from src.ai.inference import InferenceLayoutGenerator, OUTPUT_TOLERANCE
+from src.ai.feature_encoding import PreferenceEncoder
 from src.ai.decision_tree import LayoutDecisionTree
 from src.ai.reinforcement_learning import LayoutOptimizer
+from src.ai.replay_buffer import ReplayBuffer
+from src.ai.layout_env import VectorizedLayoutEnv
+from src.ai.layout import Layout
+from src.ai.prediction_cache import PredictionCache
+from src.ai.data_processing import DataProcessor
 
 @pytest.fixture
 def sample_preferences():
@@ -44,6 +61,45 @@ def sample_layout():
         }
     }
 
+class TestPreferenceEncoder:
+    def test_generator_profile(self, sample_preferences):
+        features = PreferenceEncoder("generator").encode([sample_preferences])
+        
+        assert features.dtype == np.float32
+        assert np.allclose(features[0], [0.5, 0.4, 1, 0, 0, 0, 0.5, 0.5, 1, 1])
+    
+    def test_decision_tree_profile(self, sample_preferences):
+        features = PreferenceEncoder("decision_tree").encode([sample_preferences])
+        assert np.allclose(features[0], [5000, 4000, 1, 0, 0, 0, 1, 2, 1, 1])
+    
+    def test_optimizer_profile(self, sample_preferences):
+        features = PreferenceEncoder("optimizer").encode([sample_preferences])
+        assert np.allclose(features[0], [5, 4, 0.5])
+    
+    def test_encode_dataframe_matches_records(self, sample_preferences):
+        records = [
+            sample_preferences,
+            dict(sample_preferences, work_style="Hybrid", noise_tolerance="High")
+        ]
+        encoder = PreferenceEncoder("generator")
+        
+        from_frame = encoder.encode(pd.json_normalize(records))
+        assert np.array_equal(from_frame, encoder.encode(records))
+    
+    def test_unknown_work_style_encodes_as_zeros(self, sample_preferences):
+        encoder = PreferenceEncoder("generator")
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            features = encoder.encode([dict(sample_preferences, work_style="Remote")])
+        assert features[0, 2:6].tolist() == [0, 0, 0, 0]
+    
+    def test_invalid_values(self, sample_preferences):
+        encoder = PreferenceEncoder("generator")
+        with pytest.raises(ValueError):
+            encoder.encode([dict(sample_preferences, noise_tolerance="Loud")])
+        with pytest.raises(ValueError):
+            PreferenceEncoder("unknown")
+
 class TestWorkspaceLayoutGenerator:
     def test_initialization(self):
         generator = WorkspaceLayoutGenerator()
@@ -68,6 +124,119 @@ class TestWorkspaceLayoutGenerator:
         # Check position ranges
         assert 0 <= layout["desk"]["position"][0] <= sample_preferences["dimensions"]["width"]
         assert 0 <= layout["desk"]["position"][1] <= sample_preferences["dimensions"]["length"]
+    
+    def test_generate_layouts(self, sample_preferences):
+        generator = WorkspaceLayoutGenerator()
+        other_preferences = dict(sample_preferences, work_style="Collaborative")
+        layouts = generator.generate_layouts(
+            [sample_preferences, other_preferences], batch_size=1
+        )
+        
+        assert len(layouts) == 2
+        single = generator.generate_layout(sample_preferences)
+        assert np.allclose(layouts[0]["desk"]["position"], single["desk"]["position"], atol=1e-5)
+        assert generator.generate_layouts([]) == []
+        
+        # One model call per batch, not per profile
+        batch_sizes = []
+        predict_on_batch = generator.model.predict_on_batch
+        def counting_predict(batch):
+            batch_sizes.append(len(batch))
+            return predict_on_batch(batch)
+        generator.model.predict_on_batch = counting_predict
+        assert len(generator.generate_layouts([sample_preferences] * 40, batch_size=16)) == 40
+        assert batch_sizes == [16, 16, 8]
+    
+    @pytest.mark.benchmark
+    def test_generate_layouts_benchmark(self, sample_preferences):
+        generator = WorkspaceLayoutGenerator()
+        preferences_list = [sample_preferences] * 40
+        generator.generate_layouts(preferences_list[:1])  # Warm up
+        
+        start = time.perf_counter()
+        for preferences in preferences_list:
+            generator.generate_layout(preferences)
+        sequential_time = time.perf_counter() - start
+        
+        start = time.perf_counter()
+        layouts = generator.generate_layouts(preferences_list)
+        batched_time = time.perf_counter() - start
+        
+        assert len(layouts) == len(preferences_list)
+        assert sequential_time / batched_time >= 20
+    
+    def test_layout_to_params_roundtrip(self, sample_layout):
+        generator = WorkspaceLayoutGenerator()
+        params = generator._layout_to_params(sample_layout)
+        layout = generator._params_to_layout(params)
+        
+        assert params.shape == (generator.PARAMETER_COUNT,)
+        assert layout["desk"]["position"] == sample_layout["desk"]["position"]
+        assert layout["equipment_zones"]["monitor_positions"][:2] == [(2040, 1500), (2120, 1500)]
+        assert layout["spacing"]["walkways"] == sample_layout["spacing"]["walkways"]
+    
+    def test_train_streaming(self, sample_preferences, sample_layout, tmp_path):
+        shard_paths = []
+        for shard in range(3):
+            path = tmp_path / f"training_data-{shard:05d}.jsonl"
+            with open(path, "w") as f:
+                for _ in range(20):
+                    item = {"preferences": sample_preferences, "layout": sample_layout}
+                    f.write(json.dumps(item) + "\n")
+            shard_paths.append(path)
+        
+        generator = WorkspaceLayoutGenerator()
+        checkpoint_path = tmp_path / "generator.weights.h5"
+        history = generator.train_streaming(
+            shard_paths[:2],
+            validation_paths=shard_paths[2:],
+            epochs=2,
+            batch_size=16,
+            checkpoint_path=checkpoint_path
+        )
+        
+        assert len(history.history["loss"]) == 2
+        assert len(history.history["samples_per_sec"]) == 2
+        assert all(rate > 0 for rate in history.history["samples_per_sec"])
+        # Each epoch counts exactly the samples it trained on
+        assert history.history["samples"] == [40, 40]
+        assert checkpoint_path.exists()
+        
+        with pytest.raises(ValueError):
+            generator.train_streaming([], epochs=1)
+
+class TestInferenceLayoutGenerator:
+    def test_matches_keras_output(self, sample_preferences, tmp_path):
+        generator = WorkspaceLayoutGenerator()
+        weights_path = generator.export_weights(tmp_path / "layout_model")
+        assert weights_path.suffix == ".npz"
+        
+        inference = InferenceLayoutGenerator(weights_path)
+        model_input = np.random.rand(16, 10).astype(np.float32)
+        expected = generator.model.predict_on_batch(model_input)
+        
+        assert np.abs(inference.predict(model_input) - expected).max() <= OUTPUT_TOLERANCE
+    
+    def test_generate_layout(self, sample_preferences, tmp_path):
+        generator = WorkspaceLayoutGenerator()
+        inference = InferenceLayoutGenerator(generator.export_weights(tmp_path / "model.npz"))
+        
+        layout = inference.generate_layout(sample_preferences)
+        layouts = inference.generate_layouts([sample_preferences] * 3)
+        
+        assert all(key in layout for key in ["desk", "storage", "equipment_zones", "spacing"])
+        assert len(layouts) == 3
+        assert not isinstance(inference, TrainableLayoutModel)
+        assert not hasattr(inference, "train")
+    
+    def test_does_not_import_tensorflow(self):
+        src_dir = Path(__file__).parent.parent / "src"
+        code = (
+            f"import sys; sys.path.insert(0, {str(src_dir)!r}); "
+            "import ai.inference; "
+            "assert 'tensorflow' not in sys.modules"
+        )
+        subprocess.run([sys.executable, "-c", code], check=True)
 
 class TestLayoutDecisionTree:
     def test_initialization(self):
@@ -91,7 +260,61 @@ class TestLayoutDecisionTree:
         # Check dimensions
         assert len(layout["desk"]["dimensions"]) == 2
         assert len(layout["storage"]["dimensions"]) == 2
-
+    
+    def test_train_from_cached_arrays(self, tmp_path, sample_preferences, sample_layout,
+                                      monkeypatch):
+        items = []
+        for i in range(40):
+            item = json.loads(json.dumps(
+                {"preferences": sample_preferences, "layout": sample_layout}
+            ))
+            item["preferences"]["dimensions"]["width"] = 3000 + 100 * i
+            item["layout"]["desk"]["position"] = [1000 + 50 * i, 1500]
+            items.append(item)
+        data_path = tmp_path / "training_data.json"
+        data_path.write_text(json.dumps(items))
+        
+        tree = LayoutDecisionTree()
+        X, y = DataProcessor(tmp_path).load_training_arrays(tree)
+        
+        # Warm loads skip parsing and validation entirely
+        processor = DataProcessor(tmp_path)
+        monkeypatch.setattr(processor, "iter_training_data", None)
+        cached_X, cached_y = processor.load_training_arrays(tree)
+        np.testing.assert_array_equal(cached_X, X)
+        np.testing.assert_array_equal(cached_y, y)
+        assert processor.load_stats["valid"] == 40
+        
+        tree.train_arrays(cached_X, cached_y)
+        reference = LayoutDecisionTree()
+        reference.train(DataProcessor(tmp_path).load_training_data())
+        features = tree._extract_features(items[:5])
+        np.testing.assert_array_equal(
+            tree._predict_positions(features), reference._predict_positions(features)
+        )
+        
+        # Generator targets are cached separately; editing the file invalidates both
+        generator_X, generator_y = DataProcessor(tmp_path).load_training_arrays(
+            WorkspaceLayoutGenerator()
+        )
+        assert generator_y.shape == (40, WorkspaceLayoutGenerator.PARAMETER_COUNT)
+        data_path.write_text(json.dumps(items[:10]))
+        X, y = DataProcessor(tmp_path).load_training_arrays(tree)
+        assert len(X) == len(y) == 10
+        assert len(list((tmp_path / "training_cache").glob("*.npz"))) == 2
+        
+        # A same-named file elsewhere sharing the cache keeps its own entry
+        other_path = tmp_path / "other" / data_path.name
+        other_path.parent.mkdir()
+        other_path.write_text(json.dumps(items[:5]))
+        other_X, _ = DataProcessor(tmp_path).load_training_arrays(
+            tree, other_path, cache_dir=tmp_path / "training_cache"
+        )
+        assert len(other_X) == 5
+        assert len(list((tmp_path / "training_cache").glob("*.npz"))) == 3
+        X, _ = DataProcessor(tmp_path).load_training_arrays(tree)
+        assert len(X) == 10
+    
 class TestLayoutOptimizer:
     def test_initialization(self):
         optimizer = LayoutOptimizer()
@@ -104,6 +327,25 @@ class TestLayoutOptimizer:
         assert isinstance(state, np.ndarray)
         assert len(state) == optimizer.state_size
     
+    def test_optimize_layout_encodes_preferences_once(self, sample_layout, sample_preferences):
+        optimizer = LayoutOptimizer()
+        calls = []
+        encode = optimizer.encoder.encode
+        optimizer.encoder.encode = lambda preferences: calls.append(1) or encode(preferences)
+        
+        optimizer.optimize_layout(sample_layout, sample_preferences, iterations=5)
+        assert len(calls) == 1
+    
+    def test_apply_action_does_not_mutate(self, sample_layout):
+        optimizer = LayoutOptimizer()
+        layout = Layout.from_dict(sample_layout)
+        
+        moved = optimizer._apply_action(layout, 0)
+        
+        assert moved.desk_position == (2050, 1500)
+        assert layout.desk_position == (2000, 1500)
+        assert sample_layout["desk"]["position"] == (2000, 1500)
+    
     def test_calculate_reward(self, sample_layout, sample_preferences):
         optimizer = LayoutOptimizer()
         reward = optimizer._calculate_reward(sample_layout, sample_preferences)
@@ -116,3 +358,263 @@ class TestLayoutOptimizer:
         # Check that optimization maintains layout structure
         assert all(key in optimized_layout for key in sample_layout.keys())
         assert all(key in optimized_layout["desk"] for key in sample_layout["desk"].keys())
+    
+    def test_train_with_target_network(self, sample_layout, sample_preferences):
+        optimizer = LayoutOptimizer(use_target_network=True, target_update_freq=2)
+        state = optimizer._get_state(sample_layout, sample_preferences)
+        for i in range(40):
+            optimizer.memory.append(state, i % optimizer.action_size, 1.0, state, False)
+        
+        before = optimizer.target_model.get_weights()[0].copy()
+        optimizer._train()
+        assert np.array_equal(optimizer.target_model.get_weights()[0], before)
+        
+        optimizer._train()
+        assert np.array_equal(
+            optimizer.target_model.get_weights()[0], optimizer.model.get_weights()[0]
+        )
+    
+    def test_optimize_layout_prioritized_replay(self, sample_layout, sample_preferences):
+        optimizer = LayoutOptimizer(memory_size=50, prioritized_replay=True)
+        optimizer.optimize_layout(sample_layout, sample_preferences, iterations=60)
+        
+        assert len(optimizer.memory) == 50
+        assert optimizer.memory.priorities.max() > 0
+    
+    def test_train_batches_model_calls(self, sample_layout, sample_preferences):
+        optimizer = LayoutOptimizer()
+        state = optimizer._get_state(sample_layout, sample_preferences)
+        for i in range(64):
+            optimizer.memory.append(state, i % optimizer.action_size, 1.0, state, i == 63)
+        
+        # One predict per network and one update for the whole batch
+        calls = []
+        model = optimizer.model
+        predict_on_batch, train_on_batch = model.predict_on_batch, model.train_on_batch
+        model.predict_on_batch = lambda x: calls.append(("predict", len(x))) or predict_on_batch(x)
+        model.train_on_batch = lambda x, y, **kwargs: (
+            calls.append(("train", len(x))) or train_on_batch(x, y, **kwargs)
+        )
+        optimizer._train(batch_size=32)
+        assert calls == [("predict", 32), ("predict", 32), ("train", 32)]
+    
+    @pytest.mark.benchmark
+    def test_train_benchmark(self, sample_layout, sample_preferences):
+        optimizer = LayoutOptimizer()
+        state = optimizer._get_state(sample_layout, sample_preferences)
+        for i in range(64):
+            optimizer.memory.append(state, i % optimizer.action_size, 1.0, state, i == 63)
+        optimizer._train()  # Warm up
+        
+        # Previous implementation: two single-row predicts per transition
+        start = time.perf_counter()
+        memory = optimizer.memory
+        batch = np.random.choice(len(memory), 32, replace=False)
+        states, targets = [], []
+        for i in batch:
+            s, action, reward = memory.states[i], memory.actions[i], memory.rewards[i]
+            next_s, done = memory.next_states[i], memory.dones[i]
+            target = reward
+            if not done:
+                target += optimizer.gamma * np.amax(
+                    optimizer.model.predict(next_s.reshape(1, -1), verbose=0)[0]
+                )
+            target_f = optimizer.model.predict(s.reshape(1, -1), verbose=0)
+            target_f[0][action] = target
+            states.append(s)
+            targets.append(target_f[0])
+        optimizer.model.fit(np.array(states), np.array(targets), epochs=1, verbose=0)
+        per_sample_time = time.perf_counter() - start
+        
+        start = time.perf_counter()
+        optimizer._train()
+        batched_time = time.perf_counter() - start
+        
+        assert per_sample_time / batched_time >= 10
+
+class TestReplayBuffer:
+    def test_ring_buffer_wraps_at_capacity(self):
+        buffer = ReplayBuffer(capacity=4, state_size=3)
+        nbytes = buffer.nbytes
+        for i in range(6):
+            buffer.append(np.full(3, i), i, float(i), np.full(3, i + 1), False)
+        
+        assert len(buffer) == 4
+        assert buffer.nbytes == nbytes
+        assert sorted(buffer.actions.tolist()) == [2, 3, 4, 5]
+    
+    def test_extend_and_sample(self):
+        buffer = ReplayBuffer(capacity=100, state_size=2)
+        states = np.random.rand(10, 2)
+        buffer.extend(states, np.arange(10), np.ones(10), states, np.zeros(10, dtype=bool))
+        
+        sampled_states, actions, rewards, next_states, dones, indices, weights = buffer.sample(32)
+        assert sampled_states.shape == (32, 2)
+        assert np.allclose(sampled_states, states[actions])
+        assert np.all(weights == 1)
+        with pytest.raises(ValueError):
+            ReplayBuffer(capacity=4, state_size=2).sample(1)
+    
+    def test_prioritized_sampling(self):
+        buffer = ReplayBuffer(capacity=10, state_size=1, prioritized=True, alpha=1.0)
+        for i in range(10):
+            buffer.append(np.zeros(1), i, 0.0, np.zeros(1), False)
+        buffer.update_priorities(np.arange(10), np.where(np.arange(10) == 3, 1000.0, 0.001))
+        
+        *_, indices, weights = buffer.sample(200)
+        assert np.mean(indices == 3) > 0.9
+        assert weights.max() == pytest.approx(1.0)
+
+class TestVectorizedLayoutEnv:
+    def test_matches_scalar_optimizer(self, sample_layout, sample_preferences):
+        optimizer = LayoutOptimizer()
+        other_layout = copy.deepcopy(sample_layout)
+        other_layout["desk"]["position"] = (30, 3990)
+        layouts = [sample_layout, other_layout] * 4
+        env = VectorizedLayoutEnv(layouts, [sample_preferences] * 8, optimizer.encoder)
+        
+        assert np.allclose(env.states()[0], optimizer._get_state(sample_layout, sample_preferences))
+        
+        actions = np.arange(8)
+        next_states, rewards = env.step(actions)
+        for layout, action, state, reward in zip(layouts, actions, next_states, rewards):
+            expected_layout = optimizer._apply_action(Layout.from_dict(layout), action)
+            assert np.allclose(state, optimizer._get_state(expected_layout, sample_preferences))
+            assert reward == pytest.approx(
+                optimizer._calculate_reward(expected_layout, sample_preferences)
+            )
+    
+    def test_optimize_layouts(self, sample_layout, sample_preferences):
+        optimizer = LayoutOptimizer()
+        layouts = optimizer.optimize_layouts(
+            [sample_layout] * 16, [sample_preferences] * 16, iterations=10
+        )
+        
+        assert len(layouts) == 16
+        assert len(optimizer.memory) == 160
+        assert all(layout["desk"]["dimensions"] == sample_layout["desk"]["dimensions"]
+                   for layout in layouts)
+        assert sample_layout["desk"]["position"] == (2000, 1500)
+
+def _deep_sizeof(obj):
+    if isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(_deep_sizeof(k) + _deep_sizeof(v) for k, v in obj.items())
+    if isinstance(obj, (list, tuple)):
+        return sys.getsizeof(obj) + sum(_deep_sizeof(item) for item in obj)
+    if isinstance(obj, Layout):
+        return sys.getsizeof(obj) + sys.getsizeof(obj.values)
+    return sys.getsizeof(obj)
+
+class TestLayout:
+    def test_dict_roundtrip(self, sample_layout):
+        layout_dict = dict(sample_layout, room_width=5000)
+        layout = Layout.from_dict(layout_dict)
+        
+        assert layout.to_dict() == layout_dict
+        assert Layout.from_dict(layout.to_dict()) == layout
+        assert layout.storage_dimensions == (100, 50)
+        assert layout.monitor_positions.shape == (2, 2)
+    
+    def test_copy_is_independent(self, sample_layout):
+        layout = Layout.from_dict(dict(sample_layout, room_width=5000))
+        copied = layout.copy()
+        copied.desk_position = (0, 0)
+        copied.clearance *= 2
+        copied.extras["room_width"] = 6000
+        
+        assert layout.desk_position == (2000, 1500)
+        assert layout.clearance == 100
+        assert layout.extras == {"room_width": 5000}
+        assert copied.to_dict()["spacing"]["clearance"] == 200
+        
+        assert Layout.coerce(layout) is layout
+        assert Layout.coerce(layout, copy=True) == layout
+        assert Layout.coerce(layout, copy=True).values is not layout.values
+    
+    def test_compact_memory(self):
+        params = np.random.rand(50).astype(np.float32)
+        layout_dict = WorkspaceLayoutGenerator._params_to_layout(None, params)
+        layout = Layout.from_dict(layout_dict)
+        
+        # One dtype for every layout, so updates round the same way; values
+        # round to float32 once and later conversions are exact
+        assert layout.values.dtype == Layout.from_dict(layout.to_dict()).values.dtype == np.float32
+        assert Layout.from_dict(layout.to_dict()) == layout
+        assert layout.desk_orientation == pytest.approx(layout_dict["desk"]["orientation"], rel=1e-6)
+        
+        assert _deep_sizeof(layout_dict) >= 10 * _deep_sizeof(layout)
+
+class TestPredictionCache:
+    def test_lru_eviction_and_stats(self):
+        cache = PredictionCache(max_entries=2)
+        for name in ("a", "b", "c"):
+            cache.put(name, np.array([1.0]))
+        
+        assert len(cache) == 2
+        assert cache.get("a") is None
+        assert cache.get("c") is not None
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 1
+    
+    def test_disk_tier(self, tmp_path):
+        key = PredictionCache.make_key(np.ones(10, dtype=np.float32), "v1")
+        PredictionCache(persist=True, cache_dir=tmp_path).put(key, np.arange(4.0))
+        
+        cache = PredictionCache(persist=True, cache_dir=tmp_path)
+        np.testing.assert_array_equal(cache.get(key), np.arange(4.0))
+        assert cache.stats()["disk_hits"] == 1
+    
+    def test_disk_tier_is_bounded(self, tmp_path):
+        cache = PredictionCache(max_entries=1, persist=True, cache_dir=tmp_path,
+                                max_disk_entries=10)
+        for i in range(10):
+            cache.put(f"old-{i}", np.arange(4.0))
+        os.utime(tmp_path / "old-0.npy", ns=(0, 0))
+        os.utime(tmp_path / "old-1.npy", ns=(0, 0))
+        cache.get("old-1")  # A disk hit counts as a recent use
+        
+        for i in range(5):
+            cache.put(f"new-{i}", np.arange(4.0))
+        
+        files = {path.stem for path in tmp_path.glob("*.npy")}
+        assert len(files) <= 10
+        assert cache.stats()["disk_entries"] == len(files)
+        assert "old-0" not in files
+        assert {"old-1", "new-4"} <= files
+    
+    def test_generator_cache_hits(self, sample_preferences):
+        generator = WorkspaceLayoutGenerator(prediction_cache=PredictionCache())
+        first = generator.generate_layout(sample_preferences)
+        second = generator.generate_layout(sample_preferences)
+        
+        assert first == second
+        assert generator.prediction_cache.stats()["hits"] == 1
+        assert generator.generate_layouts([sample_preferences] * 3) == [first] * 3
+    
+    def test_generator_invalidated_by_training(self, sample_preferences, sample_layout):
+        generator = WorkspaceLayoutGenerator(prediction_cache=PredictionCache())
+        generator.generate_layout(sample_preferences)
+        version = generator.weights_version
+        
+        generator.train([{"preferences": sample_preferences, "layout": sample_layout}] * 2)
+        
+        assert len(generator.prediction_cache) == 0
+        assert generator.weights_version != version
+    
+    def test_decision_tree_cache(self, sample_preferences, sample_layout):
+        training_data = [{"preferences": sample_preferences, "layout": sample_layout}] * 4
+        tree = LayoutDecisionTree(prediction_cache=PredictionCache())
+        tree.train(training_data)
+        
+        first = tree.suggest_layout(sample_preferences)
+        assert tree.suggest_layout(sample_preferences) == first
+        assert first["desk"]["position"] == (2000, 1500)
+        assert tree.prediction_cache.stats()["hits"] == 1
+        
+        version = tree.weights_version
+        shifted = copy.deepcopy(sample_layout)
+        shifted["desk"]["position"] = (1000, 1000)
+        tree.train([{"preferences": sample_preferences, "layout": shifted}] * 4)
+        
+        assert tree.weights_version != version
+        assert tree.suggest_layout(sample_preferences)["desk"]["position"] == (1000, 1000)
@@ -1,9 +1,16 @@
+import asyncio
+import time
 import pytest
 import pandas as pd
 import numpy as np
 from pathlib import Path
 from datetime import datetime, timedelta
 from src.data.behavioral_data import BehavioralDataProcessor
+from src.data.behavioral_aggregates import BreakAggregator
+from src.data.columnar_cache import ColumnarCache
+from src.data.frame_schema import optimize_frame
+from src.data.traffic_heatmap import TrafficHeatmap
+from src.data.live_occupancy import LiveOccupancyEngine, SlidingWindow, replay_csv
 
 @pytest.fixture
 def sample_movement_data():
@@ -22,6 +29,89 @@ def sample_break_data():
         'break_type': np.random.choice(['coffee', 'lunch', 'stretch'], 10)
     })
 
+@pytest.fixture
+def dense_movement_data():
+    # Sensor-rate data: irregular 0-8 s gaps so some pairs fall outside 5 s
+    n = 5000
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        'timestamp': pd.Timestamp('2024-01-01') + pd.to_timedelta(
+            np.cumsum(rng.integers(0, 8, n)), unit='s'
+        ),
+        'x_position': rng.choice([25.0, 75.0, 125.0, 1000.4, 2010.0], n),
+        'y_position': rng.uniform(0, 400, n),
+        'activity_type': rng.choice(['moving', 'stationary'], n)
+    })
+
+@pytest.fixture
+def sensor_csvs(tmp_path):
+    # Centimetre positions with two decimals, in timestamp order
+    n = 20000
+    rng = np.random.default_rng(2)
+    movement_file = tmp_path / "movement_data.csv"
+    pd.DataFrame({
+        'timestamp': pd.Timestamp('2024-01-01') + pd.to_timedelta(
+            np.cumsum(rng.integers(1, 8, n)), unit='s'
+        ),
+        'x_position': rng.integers(0, 500000, n) / 100,
+        'y_position': rng.integers(0, 400000, n) / 100,
+        'activity_type': rng.choice(['moving', 'stationary'], n),
+        'user_id': rng.choice([f'user-{i}' for i in range(20)], n)
+    }).to_csv(movement_file, index=False)
+    
+    starts = pd.Timestamp('2024-01-01') + pd.to_timedelta(
+        np.sort(rng.integers(0, 7 * 24 * 3600, 500)), unit='s'
+    )
+    break_file = tmp_path / "break_data.csv"
+    pd.DataFrame({
+        'start_time': starts,
+        'end_time': starts + pd.to_timedelta(rng.integers(60, 3600, 500), unit='s'),
+        'break_type': rng.choice(['coffee', 'lunch', 'stretch'], 500),
+        'location': rng.choice(['kitchen', 'lounge', 'terrace'], 500)
+    }).to_csv(break_file, index=False)
+    
+    return movement_file, break_file
+
+def reference_common_paths(processor):
+    """Row-by-row implementation the vectorized version must match."""
+    paths = []
+    sorted_movements = processor.movement_patterns.sort_values('timestamp')
+    for i in range(len(sorted_movements) - 1):
+        start = sorted_movements.iloc[i]
+        end = sorted_movements.iloc[i + 1]
+        if (end['timestamp'] - start['timestamp']) <= timedelta(seconds=5):
+            paths.append({
+                "start": (start['x_position'], start['y_position']),
+                "end": (end['x_position'], end['y_position']),
+                "frequency": 1
+            })
+    
+    # Combine paths whose endpoints round to the same grid points
+    combined = {}
+    for path in paths:
+        key = tuple(round(value / 50) * 50 for value in (*path['start'], *path['end']))
+        if key in combined:
+            combined[key]['frequency'] += 1
+        else:
+            combined[key] = {"start": key[:2], "end": key[2:], "frequency": 1}
+    return list(combined.values())
+
+def reference_minute_occupancy(breaks):
+    # Walk every break minute by minute
+    occupancy = np.zeros(24 * 60, dtype=np.int64)
+    for start, end in zip(breaks['start_time'], breaks['end_time']):
+        first = int(start.value // 60e9)
+        for minute in range(first, int(end.value // 60e9)):
+            occupancy[minute % (24 * 60)] += 1
+    return occupancy
+
+def is_memory_mapped(array):
+    while array is not None:
+        if isinstance(array, np.memmap):
+            return True
+        array = getattr(array, 'base', None)
+    return False
+
 @pytest.fixture
 def behavioral_processor(tmp_path):
     return BehavioralDataProcessor(tmp_path)
@@ -67,6 +157,25 @@ class TestBehavioralDataProcessor:
         assert all(isinstance(zone, dict) for zone in zones)
         assert all('position' in zone and 'traffic_count' in zone for zone in zones)
     
+    def test_high_traffic_zones_do_not_mutate(self, behavioral_processor, sample_movement_data):
+        behavioral_processor.movement_patterns = sample_movement_data
+        behavioral_processor._identify_high_traffic_zones()
+        
+        assert list(behavioral_processor.movement_patterns.columns) == list(sample_movement_data.columns)
+    
+    def test_ingest_movement_batches(self, tmp_path, dense_movement_data):
+        # Live feeds arrive in order; ties would be reordered by the batch sort
+        dense_movement_data = dense_movement_data.drop_duplicates('timestamp')
+        batch = BehavioralDataProcessor(tmp_path)
+        batch.movement_patterns = dense_movement_data
+        expected = batch.analyze_movement_patterns()
+        
+        live = BehavioralDataProcessor(tmp_path)
+        for start in range(0, len(dense_movement_data), 600):
+            live.ingest_movement_batch(dense_movement_data.iloc[start:start + 600])
+        
+        assert live.analyze_movement_patterns() == expected
+    
     def test_identify_common_paths(self, behavioral_processor, sample_movement_data):
         behavioral_processor.movement_patterns = sample_movement_data
         paths = behavioral_processor._identify_common_paths()
@@ -75,17 +184,260 @@ class TestBehavioralDataProcessor:
         assert all(isinstance(path, dict) for path in paths)
         assert all('start' in path and 'end' in path for path in paths)
     
-    def test_combine_similar_paths(self, behavioral_processor):
-        test_paths = [
-            {"start": (100, 100), "end": (200, 200), "frequency": 1},
-            {"start": (102, 98), "end": (198, 202), "frequency": 1},  # Similar to first path
-            {"start": (500, 500), "end": (600, 600), "frequency": 1}  # Different path
-        ]
+    def test_common_paths_match_reference(self, behavioral_processor, dense_movement_data):
+        behavioral_processor.movement_patterns = dense_movement_data
+        paths = behavioral_processor._identify_common_paths()
+        
+        assert paths == reference_common_paths(behavioral_processor)
+        assert any(path['frequency'] > 1 for path in paths)
+    
+    @pytest.mark.benchmark
+    def test_common_paths_benchmark(self, behavioral_processor):
+        n = 1_000_000
+        rng = np.random.default_rng(1)
+        behavioral_processor.movement_patterns = pd.DataFrame({
+            'timestamp': pd.Timestamp('2024-01-01') + pd.to_timedelta(
+                np.cumsum(rng.integers(0, 8, n)), unit='s'
+            ),
+            'x_position': rng.uniform(0, 5000, n),
+            'y_position': rng.uniform(0, 4000, n)
+        })
+        
+        start = time.perf_counter()
+        behavioral_processor._identify_common_paths()
+        vectorized_time = time.perf_counter() - start
         
-        combined = behavioral_processor._combine_similar_paths(test_paths)
+        start = time.perf_counter()
+        reference_common_paths(behavioral_processor)
+        reference_time = time.perf_counter() - start
         
-        assert len(combined) < len(test_paths)  # Should combine similar paths
-        assert any(path['frequency'] > 1 for path in combined)  # Should increment frequency
+        assert reference_time / vectorized_time >= 100
+    
+    def test_streaming_matches_batch(self, tmp_path, sensor_csvs):
+        movement_file, break_file = sensor_csvs
+        batch = BehavioralDataProcessor(tmp_path)
+        batch.load_movement_data(movement_file)
+        batch.load_break_data(break_file)
+        
+        streaming = BehavioralDataProcessor(tmp_path)
+        streaming.load_movement_data(movement_file, chunksize=997)
+        streaming.load_break_data(break_file, chunksize=37)
+        
+        assert streaming.movement_patterns.empty
+        assert streaming.break_patterns.empty
+        assert streaming.analyze_movement_patterns() == batch.analyze_movement_patterns()
+        assert streaming.analyze_break_patterns() == batch.analyze_break_patterns()
+        
+        analysis = streaming.analyze_movement_patterns()
+        assert all(analysis[key] for key in analysis)
+        assert sum(streaming.analyze_break_patterns()['break_locations'].values()) == 500
+    
+    def test_columnar_cache(self, tmp_path, sensor_csvs):
+        movement_file, _ = sensor_csvs
+        expected = pd.read_csv(movement_file, parse_dates=['timestamp'])
+        
+        cold = BehavioralDataProcessor(tmp_path, columnar_cache=True)
+        cold.load_movement_data(movement_file)
+        warm = BehavioralDataProcessor(tmp_path, columnar_cache=True)
+        warm.load_movement_data(movement_file)
+        
+        frame = warm.movement_patterns
+        assert is_memory_mapped(frame['x_position'].to_numpy())
+        pd.testing.assert_frame_equal(frame, expected, check_dtype=False,
+                                      check_categorical=False)
+        assert warm.analyze_movement_patterns() == cold.analyze_movement_patterns()
+        
+        # Rewriting the source invalidates the entry
+        expected.iloc[:100].to_csv(movement_file, index=False)
+        warm.load_movement_data(movement_file)
+        assert len(warm.movement_patterns) == 100
+        assert len(list((tmp_path / "columnar_cache").iterdir())) == 1
+    
+    def test_columnar_cache_keys_and_dtypes(self, tmp_path, sensor_csvs):
+        movement_file, _ = sensor_csvs
+        other_file = tmp_path / "other" / movement_file.name
+        other_file.parent.mkdir()
+        pd.read_csv(movement_file).iloc[:50].to_csv(other_file, index=False)
+        
+        # Same-named sources in different directories keep separate entries
+        cache = ColumnarCache(tmp_path / "cache")
+        frames = {}
+        for source in (movement_file, other_file):
+            frames[source] = pd.read_csv(source, parse_dates=['timestamp'])
+            frames[source]['zone'] = frames[source]['user_id'].astype('category')
+            cache.store(source, frames[source])
+        assert len(list((tmp_path / "cache").iterdir())) == 2
+        
+        for source, expected in frames.items():
+            cached = cache.load(source)
+            # Text stays text and categoricals stay categorical
+            assert dict(cached.dtypes) == dict(expected.dtypes)
+            pd.testing.assert_frame_equal(cached, expected, check_categorical=False)
+    
+    def test_schema_optimization(self, tmp_path, sensor_csvs):
+        movement_file, break_file = sensor_csvs
+        plain = BehavioralDataProcessor(tmp_path, optimize_schema=False)
+        plain.load_movement_data(movement_file)
+        plain.load_break_data(break_file)
+        
+        optimized = BehavioralDataProcessor(tmp_path)
+        optimized.load_movement_data(movement_file)
+        optimized.load_break_data(break_file)
+        
+        frame = optimized.movement_patterns
+        assert frame['x_position'].dtype == frame['y_position'].dtype == np.float32
+        assert isinstance(frame['user_id'].dtype, pd.CategoricalDtype)
+        assert frame['timestamp'].equals(plain.movement_patterns['timestamp'])
+        
+        report = optimized.memory_reports['movement']
+        assert report['before_bytes'] == plain.movement_patterns.memory_usage(deep=True).sum()
+        assert report['after_bytes'] == frame.memory_usage(deep=True).sum()
+        assert report['reduction'] >= 3
+        
+        assert optimized.analyze_movement_patterns() == plain.analyze_movement_patterns()
+        assert optimized.analyze_break_patterns() == plain.analyze_break_patterns()
+    
+    def test_optimize_frame_is_lossless(self):
+        frame = pd.DataFrame({
+            'grid_x': np.arange(1000, dtype=np.int64),
+            'x_position': np.arange(1000, dtype=np.float64) * 10,
+            'y_position': np.arange(1000) / 7,
+            'zone_id': ['a', 'b'] * 500
+        })
+        optimized, report = optimize_frame(frame)
+        
+        # Whole-valued floats stay floating
+        assert dict(optimized.dtypes) == {
+            'grid_x': np.int16,
+            'x_position': np.float32,
+            'y_position': np.float64,
+            'zone_id': pd.CategoricalDtype(['a', 'b'])
+        }
+        assert set(report['columns']) == {'grid_x', 'x_position', 'zone_id'}
+        pd.testing.assert_frame_equal(
+            optimized, frame, check_dtype=False, check_categorical=False, check_exact=True
+        )
+    
+    def test_partitioned_analysis(self, tmp_path, sensor_csvs):
+        movement_file, break_file = sensor_csvs
+        movements = pd.read_csv(movement_file, parse_dates=['timestamp'])
+        breaks = pd.read_csv(break_file, parse_dates=['start_time', 'end_time'])
+        
+        # One file per day, as written by the sensor export
+        partition_dir = tmp_path / "partitions"
+        partition_dir.mkdir()
+        for day, part in movements.groupby(movements['timestamp'].dt.date):
+            part.to_csv(partition_dir / f"movement_{day}.csv", index=False)
+        for day, part in breaks.groupby(breaks['start_time'].dt.date):
+            part.to_csv(partition_dir / f"break_{day}.csv", index=False)
+        
+        partitioned = BehavioralDataProcessor(tmp_path)
+        partitioned.load_partitions(partition_dir, max_workers=2)
+        
+        monolithic = BehavioralDataProcessor(tmp_path)
+        monolithic.movement_patterns = movements
+        monolithic.break_patterns = breaks
+        expected = monolithic.analyze_movement_patterns()
+        analysis = partitioned.analyze_movement_patterns()
+        
+        for key in ['high_traffic_zones', 'static_zones', 'interaction_zones']:
+            assert analysis[key] == expected[key]
+        assert (
+            sum(path['frequency'] for path in analysis['common_paths'])
+            <= sum(path['frequency'] for path in expected['common_paths'])
+        )
+        assert partitioned.analyze_break_patterns() == monolithic.analyze_break_patterns()
+        
+        assert (
+            partitioned._recommend_desk_zones(analysis)
+            == monolithic._recommend_desk_zones(expected)
+        )
+    
+    def test_break_analytics_match_reference(self, behavioral_processor):
+        # Includes breaks crossing midnight, lasting over a day, and zero-length
+        n = 300
+        rng = np.random.default_rng(3)
+        starts = pd.Timestamp('2024-01-01') + pd.to_timedelta(
+            rng.integers(0, 5 * 24 * 3600, n), unit='s'
+        )
+        durations = rng.choice([0, 59, 61, 900, 3600, 26 * 3600], n)
+        behavioral_processor.break_patterns = pd.DataFrame({
+            'start_time': starts,
+            'end_time': starts + pd.to_timedelta(durations, unit='s'),
+            'x_position': rng.uniform(0, 500, n),
+            'y_position': rng.uniform(0, 400, n)
+        })
+        breaks = behavioral_processor.break_patterns
+        
+        assert behavioral_processor._calculate_average_break_duration() == pytest.approx(
+            durations.mean() / 60
+        )
+        assert behavioral_processor._calculate_break_frequency() == pytest.approx(
+            n / breaks['start_time'].dt.date.nunique()
+        )
+        
+        hourly = reference_minute_occupancy(breaks).reshape(24, 60).sum(axis=1)
+        peaks = behavioral_processor._identify_peak_break_times()
+        assert [peak['break_minutes'] for peak in peaks] == sorted(hourly, reverse=True)[:3]
+        assert all(hourly[peak['hour']] == peak['break_minutes'] for peak in peaks)
+        starts = breaks['start_time'].dt.hour.value_counts()
+        assert all(starts.get(peak['hour'], 0) == peak['break_count'] for peak in peaks)
+        
+        locations = behavioral_processor._analyze_break_locations()
+        expected = breaks.groupby([
+            breaks['x_position'] // 50 * 50, breaks['y_position'] // 50 * 50
+        ]).size()
+        assert locations == {f"{x:.0f},{y:.0f}": count for (x, y), count in expected.items()}
+        assert list(locations.values()) == sorted(locations.values(), reverse=True)
+        
+        # Named locations from other data combine with grid cells
+        aggregator = BreakAggregator()
+        aggregator.update(breaks)
+        aggregator.update(breaks[['start_time', 'end_time']].assign(location='kitchen'))
+        assert aggregator.break_locations()['kitchen'] == n
+        assert list(aggregator.break_locations())[0] == 'kitchen'
+    
+    @pytest.mark.benchmark
+    def test_break_analytics_benchmark(self, behavioral_processor):
+        n = 1_000_000
+        rng = np.random.default_rng(4)
+        starts = pd.Timestamp('2024-01-01') + pd.to_timedelta(
+            rng.integers(0, 365 * 24 * 3600, n), unit='s'
+        )
+        behavioral_processor.break_patterns = pd.DataFrame({
+            'start_time': starts,
+            'end_time': starts + pd.to_timedelta(rng.integers(60, 3600, n), unit='s'),
+            'x_position': rng.uniform(0, 5000, n),
+            'y_position': rng.uniform(0, 4000, n)
+        })
+        
+        start = time.perf_counter()
+        analysis = behavioral_processor.analyze_break_patterns()
+        elapsed = time.perf_counter() - start
+        
+        assert sum(analysis['break_locations'].values()) == n
+        assert len(analysis['peak_break_times']) == 3
+        assert elapsed < 5
+    
+    def test_missing_positions_are_rejected(self, behavioral_processor):
+        behavioral_processor.movement_patterns = pd.DataFrame({
+            'timestamp': pd.date_range(start='2024-01-01', periods=3, freq='1s'),
+            'x_position': [100.0, np.nan, 120.0],
+            'y_position': [100.0, 110.0, 120.0]
+        })
+        
+        with pytest.raises(ValueError, match="1 missing positions"):
+            behavioral_processor._identify_common_paths()
+    
+    def test_far_positions_are_rejected(self, behavioral_processor):
+        behavioral_processor.movement_patterns = pd.DataFrame({
+            'timestamp': pd.date_range(start='2024-01-01', periods=2, freq='1s'),
+            'x_position': [100.0, 5e6],
+            'y_position': [100.0, 110.0]
+        })
+        
+        with pytest.raises(ValueError, match="too far from the origin"):
+            behavioral_processor._identify_common_paths()
     
     def test_generate_layout_recommendations(self, behavioral_processor, sample_movement_data):
         behavioral_processor.movement_patterns = sample_movement_data
@@ -102,4 +454,187 @@ class TestBehavioralDataProcessor:
         pos3 = (500, 500)
         
         assert behavioral_processor._is_nearby(pos1, pos2, threshold=100)
-        assert not behavioral_processor._is_nearby(pos1, pos3, threshold=100) 
\ No newline at end of file
+        assert not behavioral_processor._is_nearby(pos1, pos3, threshold=100) 
+    
+    def test_is_nearby_batch(self, behavioral_processor):
+        rng = np.random.default_rng(3)
+        positions = [tuple(p) for p in rng.uniform(-500, 2000, (300, 2))]
+        targets = [tuple(p) for p in rng.integers(0, 40, (50, 2)) * 50.0]
+        
+        near = behavioral_processor._is_nearby_batch(positions, targets, threshold=100)
+        expected = [
+            any(behavioral_processor._is_nearby(p, t, threshold=100) for t in targets)
+            for p in positions
+        ]
+        assert near.tolist() == expected
+        assert not behavioral_processor._is_nearby_batch(positions, []).any()
+    
+    @pytest.mark.benchmark
+    def test_recommend_desk_zones_scaling(self, behavioral_processor):
+        def movement_analysis(n):
+            rng = np.random.default_rng(4)
+            cells = rng.integers(0, int(n ** 0.5) * 4, (2 * n, 2)) * 50.0
+            return {
+                "static_zones": [
+                    {"position": tuple(p), "sample_count": int(d)}
+                    for p, d in zip(cells[:n], rng.integers(1, 100, n))
+                ],
+                "high_traffic_zones": [
+                    {"position": tuple(p), "traffic_count": 1} for p in cells[n:]
+                ]
+            }
+        
+        small, large = movement_analysis(20000), movement_analysis(80000)
+        start = time.perf_counter()
+        behavioral_processor._recommend_desk_zones(small)
+        small_time = time.perf_counter() - start
+        start = time.perf_counter()
+        zones = behavioral_processor._recommend_desk_zones(large)
+        large_time = time.perf_counter() - start
+        
+        # 4x the zones; a pairwise loop would take 16x as long
+        assert large_time < 8 * small_time
+        scores = [zone['suitability_score'] for zone in zones]
+        assert scores == sorted(scores, reverse=True)
+
+class TestTrafficHeatmap:
+    @pytest.mark.parametrize("sparse", [False, True])
+    def test_matches_groupby(self, sparse, sample_movement_data, tmp_path):
+        heatmap = TrafficHeatmap(sparse=sparse)
+        for start in range(0, 100, 30):
+            batch = sample_movement_data.iloc[start:start + 30]
+            heatmap.update(batch['x_position'], batch['y_position'] - 2000)
+        
+        traffic = pd.DataFrame({
+            'grid_x': sample_movement_data['x_position'] // 50,
+            'grid_y': (sample_movement_data['y_position'] - 2000) // 50
+        }).groupby(['grid_x', 'grid_y']).size()
+        threshold = traffic.quantile(0.8)
+        expected = [
+            {"position": (x * 50, y * 50), "traffic_count": count}
+            for (x, y), count in traffic[traffic >= threshold].items()
+        ]
+        
+        assert heatmap.high_traffic_zones() == expected
+        assert heatmap.total == 100
+        
+        heatmap.save(tmp_path / "heatmap.npz")
+        restored = TrafficHeatmap.load(tmp_path / "heatmap.npz")
+        assert restored.sparse == sparse
+        assert restored.high_traffic_zones() == expected
+    
+    def test_outlier_switches_to_sparse(self):
+        heatmap = TrafficHeatmap()
+        heatmap.update([100.0, 120.0, 260.0], [100.0, 110.0, 90.0])
+        assert not heatmap.sparse
+        
+        # A (1e7, 1e7) cm outlier would need a 200000 x 200000 cell grid
+        heatmap.update([1e7, 130.0], [1e7, 140.0])
+        assert heatmap.sparse
+        assert heatmap.counts == {(2, 2): 3, (5, 1): 1, (200000, 200000): 1}
+        assert heatmap.total == 5
+        assert heatmap.high_traffic_threshold(1.0) == 3
+        
+        small = TrafficHeatmap(max_dense_cells=4)
+        small.update([0.0, 60.0], [0.0, 60.0])
+        assert not small.sparse and small.counts.shape == (2, 2)
+        small.update([110.0], [0.0])
+        assert small.sparse
+        assert small.counts == {(0, 0): 1, (1, 1): 1, (2, 0): 1}
+    
+    @pytest.mark.parametrize("sparse", [False, True])
+    def test_threshold_tracks_updates_and_merges(self, sparse):
+        rng = np.random.default_rng(5)
+        x, y = rng.normal(5000, 1500, 200000), rng.normal(4000, 1200, 200000)
+        parts = [TrafficHeatmap(sparse=sparse) for _ in range(4)]
+        for part, index in zip(parts, np.array_split(np.arange(len(x)), 4)):
+            for batch in np.array_split(index, 10):
+                part.update(x[batch], y[batch])
+        
+        heatmap = parts[0]
+        for part in parts[1:]:
+            heatmap.merge(part)
+        
+        # The histogram must agree with the cells it summarises
+        _, counts = heatmap.cells()
+        values, cells = np.unique(counts, return_counts=True)
+        assert heatmap.count_values.tolist() == values.tolist()
+        assert heatmap.count_cells.tolist() == cells.tolist()
+        assert len(heatmap) == len(counts)
+        for q in (0.0, 0.3, 0.8, 0.95, 1.0):
+            assert heatmap.high_traffic_threshold(q) == np.quantile(counts, q)
+
+class TestLiveOccupancyEngine:
+    def test_replay_matches_batch(self, tmp_path, sensor_csvs):
+        movement_file, break_file = sensor_csvs
+        engine = LiveOccupancyEngine({
+            "all": (timedelta(days=8), timedelta(hours=1)),
+            "15min": (timedelta(minutes=15), timedelta(minutes=1))
+        })
+        
+        start = time.perf_counter()
+        engine.consume(replay_csv(movement_file, chunksize=5000))
+        replay_time = time.perf_counter() - start
+        
+        # The short window only holds the last 15 one-minute buckets
+        recent = pd.read_csv(movement_file, parse_dates=['timestamp'])
+        recent = recent[recent['timestamp'] >= recent['timestamp'].iloc[-1].floor('min')
+                        - timedelta(minutes=14)]
+        short_window = engine.windows["15min"]
+        assert sum(zone['traffic_count'] for zone in short_window.high_traffic_zones(0)) == len(recent)
+        
+        engine.consume(replay_csv(break_file))
+        
+        batch = BehavioralDataProcessor(tmp_path)
+        batch.load_movement_data(movement_file)
+        batch.load_break_data(break_file)
+        analysis = batch.analyze_movement_patterns()
+        
+        assert engine.high_traffic_zones("all") == analysis['high_traffic_zones']
+        assert engine.static_zones("all") == analysis['static_zones']
+        assert engine.breaks_per_hour("all") == 500 / (8 * 24)
+        
+        # Recorded data spans most of a day; replay must be far faster
+        assert replay_time < 60
+        
+        start = time.perf_counter()
+        for _ in range(1000):
+            engine.high_traffic_zones("15min")
+            engine.static_zones("all")
+            engine.breaks_per_hour("all")
+        assert (time.perf_counter() - start) / 1000 < 1e-3
+    
+    def test_queries_track_events_and_expiry(self):
+        rng = np.random.default_rng(5)
+        window = SlidingWindow(timedelta(minutes=5), timedelta(minutes=1))
+        start = pd.Timestamp("2024-01-01")
+        for i in range(3000):
+            window.add_movement(start + timedelta(seconds=int(i * 0.3)),
+                                float(rng.integers(0, 500)), float(rng.integers(0, 300)))
+            if i % 97 == 0:
+                # Interleaved queries stay exact as cells are added and expire
+                counts = np.fromiter(window.traffic.values(), dtype=np.int64)
+                threshold = np.quantile(counts, 0.8)
+                expected = sorted(cell for cell, count in window.traffic.items()
+                                  if count >= threshold)
+                zones = window.high_traffic_zones()
+                assert [(zone['position'][0] // 50, zone['position'][1] // 50)
+                        for zone in zones] == expected
+                assert sum(len(cells) for cells in window.cells_by_count.values()) == len(counts)
+    
+    def test_consume_queue(self):
+        engine = LiveOccupancyEngine()
+        
+        async def feed():
+            queue = asyncio.Queue()
+            for i in range(10):
+                await queue.put({
+                    "timestamp": pd.Timestamp("2024-01-01") + timedelta(seconds=i),
+                    "x_position": 100.0, "y_position": 100.0, "activity_type": "stationary"
+                })
+            await queue.put(None)
+            return await engine.consume_queue(queue)
+        
+        assert asyncio.run(feed()) == 10
+        assert engine.static_zones("15min") == [{"position": (100.0, 100.0), "sample_count": 10}]
+
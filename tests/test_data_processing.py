@@ -1,8 +1,14 @@
 import pytest
+import threading
+import time
+import tracemalloc
 from pathlib import Path
 import json
+import os
 import numpy as np
-from src.data.data_processing import DataProcessor
+from src.ai.data_processing import DataProcessor, _merge_stats, _new_stats
+from src.ai.training_schema import TrainingDataValidator
+from src.data.preference_store import CachedPreferenceStore, SQLitePreferenceStore
 from src.data.user_preferences import UserPreferences
 
 @pytest.fixture
@@ -96,6 +102,172 @@ class TestDataProcessor:
         with pytest.raises(ValueError):
             processor._process_preferences(invalid_preferences)
     
+    def test_iter_training_data_array(self, temp_data_dir, sample_training_data):
+        valid = json.loads(json.dumps(sample_training_data[0]))
+        invalid = {"preferences": {}, "layout": {}}
+        raw_items = [valid, invalid, None, valid, 42, valid, valid] * 3
+        with open(temp_data_dir / "training_data.json", "w") as f:
+            json.dump(raw_items, f, indent=2)
+        
+        processor = DataProcessor(temp_data_dir)
+        # A tiny read size splits items across reads
+        items = list(processor.iter_training_data(read_size=64))
+        reference = DataProcessor(temp_data_dir)
+        expected = [reference._validate_and_process_item(item) for item in raw_items]
+        
+        assert items == [item for item in expected if item]
+        assert processor.load_stats == {
+            "valid": 12, "rejected": 9,
+            "errors": {"preferences.dimensions": 3, "item": 6}
+        }
+        
+        batches = list(processor.iter_training_data(batch_size=5))
+        assert [len(batch) for batch in batches] == [5, 5, 2]
+        assert [item for batch in batches for item in batch] == items
+        assert processor.load_training_data() == items
+    
+    def test_iter_training_data_errors(self, temp_data_dir):
+        data_path = temp_data_dir / "training_data.json"
+        processor = DataProcessor(temp_data_dir)
+        assert list(processor.iter_training_data()) == []
+        
+        data_path.write_text('[{"preferences": {}}, {"layout": ')
+        with pytest.raises(ValueError):
+            list(processor.iter_training_data(read_size=8))
+        
+        data_path.write_text('[{"preferences": {}} {"layout": {}}]')
+        with pytest.raises(ValueError):
+            list(processor.iter_training_data())
+    
+    def test_iter_training_data_jsonl(self, temp_data_dir, sample_training_data):
+        lines = [json.dumps(sample_training_data[0])] * 4
+        lines.insert(2, '{"preferences": ')
+        (temp_data_dir / "training_data.jsonl").write_text("\n".join(lines) + "\n\n")
+        
+        processor = DataProcessor(temp_data_dir)
+        items = processor.load_training_data()
+        
+        assert len(items) == 4
+        assert items[0] == processor._validate_and_process_item(json.loads(lines[0]))
+        assert processor.load_stats == {"valid": 4, "rejected": 1, "errors": {"item": 1}}
+    
+    @pytest.mark.parametrize("name", ["training_data.json", "training_data.jsonl"])
+    def test_iter_training_data_memory(self, temp_data_dir, sample_training_data, name):
+        data_path = temp_data_dir / name
+        with open(data_path, "w") as f:
+            if name.endswith(".jsonl"):
+                f.writelines(json.dumps(sample_training_data[0]) + "\n" for _ in range(10000))
+            else:
+                json.dump(sample_training_data * 10000, f)
+        
+        processor = DataProcessor(temp_data_dir)
+        tracemalloc.start()
+        try:
+            batches = processor.iter_training_data(data_path, batch_size=100)
+            count = sum(len(batch) for batch in batches)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        
+        assert count == 10000
+        assert peak < data_path.stat().st_size / 4
+    
+    def test_validator_field_errors(self, sample_training_data):
+        processor = DataProcessor(Path())
+        valid = json.loads(json.dumps(sample_training_data[0]))
+        
+        def with_value(category, path, value):
+            item = json.loads(json.dumps(valid))
+            target = item[category]
+            for key in path[:-1]:
+                target = target[key]
+            target[path[-1]] = value
+            return item
+        
+        bad_items = [
+            with_value('preferences', ['work_style'], 'Remote'),
+            with_value('preferences', ['dimensions', 'width'], '5000'),
+            with_value('layout', ['desk', 'position'], [2000, None]),
+            with_value('layout', ['equipment_zones', 'monitor_positions'], [[1, 'a']]),
+            {"preferences": valid['preferences']}
+        ]
+        for item in bad_items:
+            assert processor._validate_and_process_item(item) is None
+        
+        assert processor.load_stats['errors'] == {
+            "preferences.work_style": 1,
+            "preferences.dimensions.width": 1,
+            "layout.desk.position": 1,
+            "layout.equipment_zones.monitor_positions": 1,
+            "layout": 1
+        }
+        
+        # Valid items are normalized without mutating the input
+        processed = processor._validate_and_process_item(valid)
+        assert processed['preferences']['dimensions'] == {"width": 5000.0, "length": 4000.0}
+        assert isinstance(valid['preferences']['dimensions']['width'], int)
+    
+    def test_validator_custom_schema(self):
+        validator = TrainingDataValidator({
+            "user's prefs": {
+                "required": ["size"],
+                "fields": {"size.width": {"type": "positive_number"}, "mode": {"choices": ["a"]}}
+            }
+        })
+        item = {"user's prefs": {"size": {"width": 3}, "mode": "a"}}
+        assert validator.validate(item) == ({"user's prefs": {"size": {"width": 3.0}, "mode": "a"}}, None)
+        assert validator.validate({"user's prefs": {"size": {}}}) == (None, "user's prefs.size.width")
+        with pytest.raises(ValueError):
+            TrainingDataValidator({"prefs": {"fields": {"a": {"type": "unknown"}}}})
+    
+    def test_validate_training_data_parallel(self, temp_data_dir, sample_training_data):
+        valid = json.dumps(sample_training_data[0])
+        lines = []
+        for i in range(600):
+            if i % 7 == 0:
+                lines.append('{"preferences": {}, "layout": {}}')
+            elif i % 11 == 0:
+                lines.append('{"preferences": ')
+            else:
+                lines.append(valid.replace('"Medium"', '"Low"' if i % 2 else '"High"'))
+        data_path = temp_data_dir / "training_data.jsonl"
+        data_path.write_text("\n".join(lines) + "\n")
+        
+        # Non-ASCII text shifts byte offsets, strings that look like an item
+        # boundary must be skipped, and nested objects in a list parse like
+        # items, so shards that guess one must be re-run
+        array_items = []
+        for i in range(300):
+            item = json.loads(valid)
+            item["note"] = "caf\u00e9, {" * (i % 5)
+            item["tags"] = [{"id": i}, {"id": i + 1}] * (i % 3)
+            if i % 13 == 0:
+                del item["layout"]
+            array_items.append(item)
+        array_path = temp_data_dir / "extra.json"
+        array_path.write_text(json.dumps(array_items, indent=1, ensure_ascii=False), encoding='utf-8')
+        
+        serial = DataProcessor(temp_data_dir)
+        expected = _new_stats()
+        for path in (data_path, array_path):
+            list(serial.iter_training_data(path))
+            _merge_stats(expected, serial.load_stats)
+        
+        processor = DataProcessor(temp_data_dir)
+        stats = processor.validate_training_data(
+            [data_path, array_path], max_workers=2, shard_size=4096
+        )
+        
+        assert stats == processor.load_stats == expected
+        assert stats["valid"] == 600 - 86 - 47 + 300 - 24
+        assert stats["errors"] == {
+            "preferences.dimensions": 86, "item": 47, "layout": 24
+        }
+        
+        with pytest.raises(ValueError):
+            array_path.write_text(json.dumps(array_items)[:-2])
+            processor.validate_training_data([array_path], max_workers=2, shard_size=4096)
+    
     def test_save_generated_layout(self, temp_data_dir, sample_training_data):
         processor = DataProcessor(temp_data_dir)
         output_path = temp_data_dir / "test_layout.json"
@@ -199,4 +371,154 @@ class TestUserPreferences:
         
         # Count entries for test_user
         test_user_entries = [h for h in history if h["user_id"] == "test_user"]
-        assert len(test_user_entries) == 10  # Should be trimmed to max_entries 
\ No newline at end of file
+        assert len(test_user_entries) == 10  # Should be trimmed to max_entries 
+    
+    def test_sqlite_backend(self, temp_data_dir, sample_training_data):
+        preferences = json.loads(json.dumps(sample_training_data[0]["preferences"]))
+        
+        # Existing JSON files are imported when the database is created
+        json_prefs = UserPreferences(temp_data_dir)
+        for monitors in range(12):
+            preferences["equipment"]["monitors"] = monitors
+            json_prefs.save_preferences("legacy_user", preferences)
+        
+        prefs = UserPreferences(temp_data_dir, backend="sqlite")
+        assert prefs.get_preferences("legacy_user") == preferences
+        assert prefs.get_history("legacy_user") == json_prefs.get_history("legacy_user")
+        assert len(prefs.get_history("legacy_user")) == 10
+        
+        prefs.save_many({f"user_{i}": preferences for i in range(100)})
+        for monitors in range(15):
+            preferences["equipment"]["monitors"] = monitors
+            prefs.save_preferences("user_1", preferences)
+        
+        history = prefs.get_history("user_1")
+        assert len(history) == 10
+        assert [h["preferences"]["equipment"]["monitors"] for h in history] == list(range(5, 15))
+        assert prefs.get_preferences("user_1")["equipment"]["monitors"] == 14
+        assert prefs.get_preferences("missing")["work_style"] == "Individual Focus"
+        
+        with pytest.raises(ValueError):
+            prefs.save_many({"bad": {**preferences, "work_style": "Invalid Style"}})
+        prefs.close()
+    
+    def test_sqlite_import_is_retried_after_failure(self, temp_data_dir, sample_training_data):
+        preferences = sample_training_data[0]["preferences"]
+        json_prefs = UserPreferences(temp_data_dir)
+        json_prefs.save_preferences("legacy_user", preferences)
+        
+        # A malformed history entry aborts the import transaction
+        history = json_prefs.get_history("legacy_user")
+        with open(temp_data_dir / "preference_history.json", "w") as f:
+            json.dump(history + [{"user_id": "legacy_user", "timestamp": "9999"}], f)
+        with pytest.raises(KeyError):
+            UserPreferences(temp_data_dir, backend="sqlite")
+        assert (temp_data_dir / "preferences.db").exists()
+        
+        with open(temp_data_dir / "preference_history.json", "w") as f:
+            json.dump(history, f)
+        prefs = UserPreferences(temp_data_dir, backend="sqlite")
+        assert prefs.get_preferences("legacy_user") == preferences
+        assert len(prefs.get_history("legacy_user")) == 1
+        prefs.close()
+        
+        # Completed imports are not repeated
+        prefs = UserPreferences(temp_data_dir, backend="sqlite")
+        assert len(prefs.get_history("legacy_user")) == 1
+        prefs.close()
+    
+    def test_sqlite_concurrent_saves(self, temp_data_dir, sample_training_data):
+        preferences = sample_training_data[0]["preferences"]
+        UserPreferences(temp_data_dir, backend="sqlite").close()
+        
+        def save(worker):
+            # Separate instances, like separate processes sharing the database
+            prefs = UserPreferences(temp_data_dir, backend="sqlite")
+            for i in range(20):
+                prefs.save_preferences(f"user_{worker}_{i}", preferences)
+            prefs.close()
+        
+        threads = [threading.Thread(target=save, args=(worker,)) for worker in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        prefs = UserPreferences(temp_data_dir, backend="sqlite")
+        assert all(
+            prefs.store.get(f"user_{worker}_{i}") is not None
+            for worker in range(4) for i in range(20)
+        )
+    
+    @pytest.mark.benchmark
+    def test_sqlite_save_latency_is_flat(self, temp_data_dir, sample_training_data):
+        preferences = sample_training_data[0]["preferences"]
+        prefs = UserPreferences(temp_data_dir, backend="sqlite")
+        
+        def save_latency():
+            start = time.perf_counter()
+            for i in range(50):
+                prefs.save_preferences(f"user_{i}", preferences)
+            return (time.perf_counter() - start) / 50
+        
+        prefs.save_many({f"seed_{i}": preferences for i in range(1000)})
+        small = save_latency()
+        prefs.save_many({f"seed_{i}": preferences for i in range(1000, 100000)})
+        large = save_latency()
+        
+        assert large < small * 3
+    
+    @pytest.mark.parametrize("backend", ["json", "sqlite"])
+    def test_preference_cache(self, temp_data_dir, sample_training_data, backend):
+        preferences = json.loads(json.dumps(sample_training_data[0]["preferences"]))
+        prefs = UserPreferences(temp_data_dir, backend=backend)
+        prefs.save_preferences("user_1", preferences)
+        
+        for _ in range(10):
+            assert prefs.get_preferences("user_1") == preferences
+        stats = prefs.cache_stats()
+        assert (stats["hits"], stats["misses"]) == (9, 1)
+        
+        # Returned dicts are copies
+        prefs.get_preferences("user_1")["equipment"]["monitors"] = 99
+        assert prefs.get_preferences("user_1")["equipment"]["monitors"] == 2
+        
+        # Writes by another instance (or process) are picked up, even when
+        # they keep the file size and modification time
+        other = UserPreferences(temp_data_dir, backend=backend, cache=False)
+        mtime_ns = prefs.preferences_file.stat().st_mtime_ns if backend == "json" else None
+        preferences["equipment"]["monitors"] = 7
+        other.save_preferences("user_1", preferences)
+        if backend == "json":
+            os.utime(prefs.preferences_file, ns=(mtime_ns, mtime_ns))
+        assert prefs.get_preferences("user_1")["equipment"]["monitors"] == 7
+        
+        # As are this instance's own writes
+        preferences["equipment"]["monitors"] = 3
+        prefs.save_preferences("user_1", preferences)
+        assert prefs.get_preferences("user_1")["equipment"]["monitors"] == 3
+        assert prefs.get_preferences("unknown")["work_style"] == "Individual Focus"
+        
+        stats = prefs.cache_stats()
+        assert stats["misses"] == (3 if backend == "json" else 4)
+        assert stats["hit_rate"] == stats["hits"] / (stats["hits"] + stats["misses"])
+        if backend == "json":
+            assert stats["reloads"] == 3
+            assert stats["last_reload_seconds"] > 0
+        assert other.cache_stats() == {}
+    
+    def test_preference_cache_lru(self, temp_data_dir, sample_training_data):
+        preferences = sample_training_data[0]["preferences"]
+        store = CachedPreferenceStore(
+            SQLitePreferenceStore(temp_data_dir / "preferences.db"), max_entries=2
+        )
+        store.put_many([(f"user_{i}", preferences, "2024-01-01") for i in range(3)])
+        
+        for user_id in ["user_0", "user_1", "user_0", "user_2"]:
+            assert store.get(user_id) == preferences
+        # user_1 was least recently used
+        assert list(store.entries) == ["user_0", "user_2"]
+        assert store.get("user_0") == preferences
+        assert store.stats()["hits"] == 2
+        store.close()
+
@@ -27,11 +27,15 @@ def mock_api_response():
     }
 
 @pytest.fixture
-def ergonomics_api():
-    return ErgonomicsAPI(
+def ergonomics_api(tmp_path):
+    api = ErgonomicsAPI(
         api_key="test_key",
         base_url="https://api.test.example.com/v1"
     )
+    # Start from an empty cache so answers saved by earlier runs are not served
+    api.cache_file = tmp_path / "ergonomics_cache.json"
+    api.cache = {}
+    return api
 
 class TestErgonomicsAPI:
     def test_initialization(self):
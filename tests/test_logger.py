@@ -0,0 +1,36 @@
+import logging
+from logging.handlers import QueueHandler
+from src.utils.logger import (
+    setup_logger, shutdown_logger, measure_logging_overhead, LOGGER_NAME
+)
+
+def test_setup_logger_is_idempotent():
+    logger = setup_logger()
+    handlers = list(logger.handlers)
+    
+    for _ in range(5):
+        assert setup_logger() is logger
+    assert logger.handlers == handlers
+
+def test_queue_mode(tmp_path):
+    logger = setup_logger(use_queue=True)
+    try:
+        assert len(logger.handlers) == 1
+        assert isinstance(logger.handlers[0], QueueHandler)
+        assert setup_logger() is logger
+        assert len(logger.handlers) == 1
+    finally:
+        shutdown_logger()
+        setup_logger()
+    
+    assert len(logging.getLogger(LOGGER_NAME).handlers) == 2
+
+def test_measure_logging_overhead():
+    logger = setup_logger()
+    with measure_logging_overhead(logger) as overhead:
+        for i in range(10):
+            logger.debug(f"record {i}")
+    
+    assert overhead.calls == 10
+    assert overhead.seconds_per_call > 0
+    assert "handle" not in vars(logger)